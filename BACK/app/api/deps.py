@@ -0,0 +1,26 @@
+from fastapi import Request
+from app.services.travel_service import TravelService
+from app.services.nearby_index import NearbyIndexRegistry
+from app.services.plan_store import PlanStore
+from app.services.job_queue import JobQueue
+from typing import Optional
+
+
+def get_travel_service(request: Request) -> TravelService:
+    """获取应用生命周期内共享的旅游服务实例"""
+    return request.app.state.travel_service
+
+
+def get_nearby_indexes(request: Request) -> NearbyIndexRegistry:
+    """获取启动时加载的附近景点索引"""
+    return request.app.state.nearby_indexes
+
+
+def get_plan_store(request: Request) -> Optional[PlanStore]:
+    """获取计划存储，未启用时为None"""
+    return request.app.state.plan_store
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """获取异步生成任务队列"""
+    return request.app.state.job_queue
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+import os
+
+router = APIRouter()
+
+
+@router.get("/healthz", include_in_schema=False)
+async def liveness():
+    """存活检查：事件循环能响应即为存活"""
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readiness(request: Request):
+    """
+    就绪检查：启动完成且未在关闭时返回200，否则返回503
+
+    上游大模型熔断不影响就绪状态，避免所有实例同时被摘除；熔断状态见 /api/travel/llm/stats。
+    """
+    state = request.app.state
+    ready = getattr(state, "ready", False)
+    job_queue = getattr(state, "job_queue", None)
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "pid": os.getpid(),
+        "queue_depth": job_queue.queue_depth if job_queue is not None else None
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
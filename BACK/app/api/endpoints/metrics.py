@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+from app.core.metrics import CONTENT_TYPE, JOB_BUSY_WORKERS, JOB_QUEUE_DEPTH, render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus文本格式的指标，任务队列的瞬时值在抓取时读取"""
+    job_queue = getattr(request.app.state, "job_queue", None)
+    if job_queue is not None:
+        # 使用任务表时为全部工作进程的数量，否则为本进程
+        stats = await job_queue.stats()
+        cluster = stats["cluster"]
+        JOB_QUEUE_DEPTH.set(cluster["queued"] if cluster else stats["queue_depth"])
+        JOB_BUSY_WORKERS.set(cluster["running"] if cluster else stats["busy_workers"])
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
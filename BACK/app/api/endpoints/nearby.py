@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.models.schemas import NearbyResponse, NearbyPoi
+from app.services.nearby_index import NearbyIndexRegistry
+from app.services.travel_service import TravelService
+from app.core.config import settings
+from app.core.security import verify_wx_request
+from app.api.deps import get_nearby_indexes, get_travel_service
+from typing import Optional
+
+router = APIRouter()
+
+
+@router.get("/nearby", response_model=NearbyResponse)
+async def get_nearby_pois(
+        city: str,
+        latitude: Optional[float] = Query(None, ge=-90, le=90),
+        longitude: Optional[float] = Query(None, ge=-180, le=180),
+        centerName: Optional[str] = None,
+        radius: float = Query(2000.0, gt=0),
+        k: Optional[int] = Query(None, ge=1, le=1000),
+        category: Optional[str] = None,
+        offset: int = Query(0, ge=0),
+        limit: int = Query(20, ge=1, le=100),
+        nearby_indexes: NearbyIndexRegistry = Depends(get_nearby_indexes),
+        travel_service: TravelService = Depends(get_travel_service),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """
+    查询中心位置附近的景点
+
+    传入经纬度，或传入centerName由本地景点目录解析坐标。
+    指定k时返回最近的k个景点，否则返回radius米内的全部景点；结果按距离升序分页。
+    """
+    index = nearby_indexes.get(city)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"暂无该城市的景点数据: {city}")
+
+    if latitude is None or longitude is None:
+        catalog = travel_service.poi_catalogs.get(city)
+        center = catalog.resolve(centerName) if catalog is not None and centerName else None
+        if center is None:
+            raise HTTPException(status_code=400, detail="需要提供经纬度或可识别的centerName")
+        latitude, longitude = center
+
+    radius = min(radius, settings.NEARBY_MAX_RADIUS)
+    if k is not None:
+        point_ids, distances = index.query_knn(latitude, longitude, k, settings.NEARBY_MAX_RADIUS, category)
+    else:
+        point_ids, distances = index.query_radius(latitude, longitude, radius, category)
+
+    page = slice(offset, offset + limit)
+    return NearbyResponse(
+        city=city,
+        latitude=latitude,
+        longitude=longitude,
+        total=len(point_ids),
+        offset=offset,
+        limit=limit,
+        items=[NearbyPoi(**item) for item in index.describe(point_ids[page], distances[page])]
+    )
@@ -1,46 +1,444 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.schemas import TravelPlanRequest, TravelPlanResponse
-from app.services.travel_service import TravelService
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.models.schemas import BatchPlanRequest, TravelPlanRequest, TravelPlanResponse
+from app.services.travel_service import TravelPlan, TravelService
+from app.core.config import settings
+from app.core.responses import json_dumps
 from app.core.security import verify_wx_request
+from app.services.plan_cache import build_plan_key
+from app.services.plan_store import PlanStore, etag_matches
+from app.services.job_queue import JobQueue, QueueFullError
+from app.services.llm_governor import UpstreamUnavailableError
+from app.api.deps import get_travel_service, get_plan_store, get_job_queue
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import math
+import os
+import time
 import uuid
 
 router = APIRouter()
 
 
+def _sse_event(event: str, data: Any) -> str:
+    """格式化一条SSE事件，data可以是已序列化的JSON"""
+    if not isinstance(data, str):
+        data = json_dumps(data).decode("utf-8")
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _cache_headers(travel_plan: TravelPlan) -> Dict[str, str]:
+    """
+    缓存状态响应头
+
+    X-Cache 为 PREWARMED / HIT / REUSED / MISS / COALESCED；复用相近请求的计划时，
+    X-Reuse-Distance 和 X-Reuse-Age 给出被复用计划的中心位置距离（米）和生成时长（秒）。
+    """
+    headers = {"X-Cache": travel_plan.cache_status}
+    if travel_plan.reuse is not None:
+        if travel_plan.reuse["distance_m"] is not None:
+            headers["X-Reuse-Distance"] = str(round(travel_plan.reuse["distance_m"]))
+        headers["X-Reuse-Age"] = str(round(travel_plan.reuse["age_seconds"]))
+    return headers
+
+
+def _cache_fields(travel_plan: TravelPlan) -> Dict[str, Any]:
+    """流式和批量结果中的缓存状态字段"""
+    fields = {"cache": travel_plan.cache_status}
+    if travel_plan.reuse is not None:
+        fields["reused_from"] = travel_plan.reuse
+    return fields
+
+
+async def _generate_plan_response(
+        request: TravelPlanRequest,
+        travel_days: int,
+        travel_service: TravelService,
+        plan_store: Optional[PlanStore]
+) -> Tuple[TravelPlanResponse, str, TravelPlan]:
+    """
+    生成并保存旅游计划，返回响应、序列化后的正文和生成的计划（含缓存状态）
+
+    日计划在转换时已经校验过，响应直接组装不再校验；正文只序列化一次，
+    同时用于保存和返回。
+    """
+    # 调用旅游服务生成计划
+    travel_plan = await travel_service.generate_plan(
+        city=request.city,
+        center_name=request.centerName,
+        scenic_spots=request.travelData.scenicSpots,
+        travel_days=travel_days,
+        travel_mode=request.travelData.travelMode,
+        generation_mode=request.travelData.generationMode,
+        start_date=request.travelData.startDate
+    )
+
+    # 生成计划ID
+    plan_id = str(uuid.uuid4())
+
+    # 构建响应
+    plan_response = TravelPlanResponse.model_construct(
+        plan_id=plan_id,
+        city=request.city,
+        center_name=request.centerName,
+        travel_days=travel_days,
+        travel_mode=request.travelData.travelMode,
+        daily_plans=travel_plan.daily_plans,
+        overview=travel_plan.overview,
+        warnings=travel_plan.warnings
+    )
+
+    body = plan_response.model_dump_json()
+
+    # 保存计划，数据库写入在后台批量进行
+    if plan_store is not None:
+        plan_store.save(plan_id, body)
+
+    return plan_response, body, travel_plan
+
+
 @router.post("/generate-plan", response_model=TravelPlanResponse)
 async def generate_travel_plan(
         request: TravelPlanRequest,
-        travel_service: TravelService = Depends(),
+        async_mode: bool = Query(False, alias="async"),
+        travel_service: TravelService = Depends(get_travel_service),
+        plan_store: Optional[PlanStore] = Depends(get_plan_store),
+        job_queue: JobQueue = Depends(get_job_queue),
         authenticated: bool = Depends(verify_wx_request)
 ):
-    """根据中心位置和计划天数生成旅游计划"""
+    """
+    根据中心位置和计划天数生成旅游计划
+
+    带 ?async=1 时立即返回202和任务ID，计划由后台工作池生成，
+    通过 GET /jobs/{job_id} 查询结果；队列已满时返回429和Retry-After。
+    """
     try:
         # 将字符串类型的旅行天数转换为整数
         travel_days = int(request.travelData.travelDays)
 
-        # 调用旅游服务生成计划
-        travel_plan = await travel_service.generate_plan(
-            city=request.city,
-            center_name=request.centerName,
-            scenic_spots=request.travelData.scenicSpots,
-            travel_days=travel_days,
-            travel_mode=request.travelData.travelMode
+        if async_mode:
+            async def run_job() -> Dict[str, Any]:
+                plan_response, _, _ = await _generate_plan_response(request, travel_days, travel_service, plan_store)
+                return plan_response.model_dump(mode="json")
+
+            job = await job_queue.submit(run_job)
+            status_url = f"{settings.API_PREFIX}/travel/jobs/{job.job_id}"
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job.job_id, "status": job.status, "status_url": status_url},
+                headers={"Location": status_url}
+            )
+
+        _, body, travel_plan = await _generate_plan_response(
+            request, travel_days, travel_service, plan_store
         )
 
-        # 生成计划ID
-        plan_id = str(uuid.uuid4())
-
-        # 构建响应
-        response = TravelPlanResponse(
-            plan_id=plan_id,
-            city=request.city,
-            center_name=request.centerName,
-            travel_days=travel_days,
-            travel_mode=request.travelData.travelMode,
-            daily_plans=travel_plan.daily_plans,
-            overview=travel_plan.overview
+        # 直接返回已序列化的正文，跳过response_model的校验和序列化；
+        # 通过响应头告知是否命中缓存、复用了相近请求的计划或合并了进行中的请求
+        return Response(content=body, media_type="application/json", headers=_cache_headers(travel_plan))
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail="生成任务过多，请稍后重试",
+            headers={"Retry-After": str(e.retry_after)}
         )
+    except UpstreamUnavailableError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"生成旅游计划失败: {str(e)}",
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成旅游计划失败: {str(e)}")
 
-        return response
+
+@router.post("/generate-plan/stream")
+async def stream_travel_plan(
+        request: TravelPlanRequest,
+        travel_service: TravelService = Depends(get_travel_service),
+        plan_store: Optional[PlanStore] = Depends(get_plan_store),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """
+    流式生成旅游计划（SSE）
+
+    概述生成后立即推送 overview 事件，每天的计划一完成就推送 day 事件，
+    最后推送携带 plan_id 和修复提示的 done 事件；失败时推送 error 事件。
+    """
+    try:
+        travel_days = int(request.travelData.travelDays)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"生成旅游计划失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"生成旅游计划失败: {str(e)}")
+
+    plan_id = str(uuid.uuid4())
+
+    async def event_stream():
+        try:
+            async for event, value in travel_service.stream_plan(
+                    city=request.city,
+                    center_name=request.centerName,
+                    scenic_spots=request.travelData.scenicSpots,
+                    travel_days=travel_days,
+                    travel_mode=request.travelData.travelMode,
+                    start_date=request.travelData.startDate
+            ):
+                if event == "overview":
+                    yield _sse_event("overview", {"overview": value})
+                elif event == "day":
+                    yield _sse_event("day", value.model_dump_json())
+                else:
+                    if plan_store is not None:
+                        plan_store.save(plan_id, TravelPlanResponse.model_construct(
+                            plan_id=plan_id,
+                            city=request.city,
+                            center_name=request.centerName,
+                            travel_days=travel_days,
+                            travel_mode=request.travelData.travelMode,
+                            daily_plans=value.daily_plans,
+                            overview=value.overview,
+                            warnings=value.warnings
+                        ).model_dump_json())
+                    yield _sse_event("done", {
+                        "plan_id": plan_id,
+                        "city": request.city,
+                        "center_name": request.centerName,
+                        "travel_days": travel_days,
+                        "travel_mode": request.travelData.travelMode,
+                        **_cache_fields(value),
+                        "warnings": value.warnings
+                    })
+        except UpstreamUnavailableError as e:
+            yield _sse_event("error", {
+                "detail": f"生成旅游计划失败: {str(e)}",
+                "retry_after": math.ceil(e.retry_after)
+            })
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"生成旅游计划失败: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _ndjson_line(entry: Dict[str, Any], plan_body: Optional[str] = None) -> bytes:
+    """格式化一行NDJSON，plan_body为已序列化的计划正文，直接拼入不再重复序列化"""
+    line = json_dumps(entry)
+    if plan_body is not None:
+        line = line[:-1] + b',"plan":' + plan_body.encode("utf-8") + b"}"
+    return line + b"\n"
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors())
+
+
+async def _run_batch(
+        items: List[Dict[str, Any]],
+        travel_service: TravelService,
+        plan_store: Optional[PlanStore]
+) -> AsyncIterator[bytes]:
+    """
+    批量生成旅游计划
+
+    逐项校验，规范化后相同的条目只生成一次，以 BATCH_MAX_CONCURRENCY 的并发调度；
+    每个计划完成即输出该计划对应的所有条目，单项失败只在该项的结果中报告。
+    """
+    started = time.perf_counter()
+    total = len(items)
+    completed = succeeded = failed = 0
+
+    # 规范化键 -> (请求, 旅行天数, 使用该计划的条目下标)
+    groups: Dict[str, Tuple[TravelPlanRequest, int, List[int]]] = {}
+    invalid: List[Tuple[int, str]] = []
+    for index, item in enumerate(items):
+        try:
+            request = TravelPlanRequest.model_validate(item)
+            travel_days = int(request.travelData.travelDays)
+        except ValidationError as e:
+            invalid.append((index, f"请求参数无效: {_validation_message(e)}"))
+            continue
+        except ValueError as e:
+            invalid.append((index, f"请求参数无效: {str(e)}"))
+            continue
+        # 出发日期不同的条目计划相同但日期不同，分开输出
+        key = build_plan_key(
+            request.city, request.centerName, request.travelData.scenicSpots,
+            travel_days, request.travelData.travelMode
+        ) + f"|{request.travelData.startDate}"
+        groups.setdefault(key, (request, travel_days, []))[2].append(index)
+
+    def result_line(index: int, entry: Dict[str, Any], plan_body: Optional[str] = None) -> bytes:
+        nonlocal completed, succeeded, failed
+        completed += 1
+        if entry["status"] == "ok":
+            succeeded += 1
+        else:
+            failed += 1
+        return _ndjson_line(
+            {"type": "result", "index": index, **entry, "completed": completed, "total": total}, plan_body
+        )
+
+    for index, error in invalid:
+        yield result_line(index, {"status": "error", "error": error})
+
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def generate(key: str) -> Tuple[str, Dict[str, Any], Optional[str]]:
+        request, travel_days, _ = groups[key]
+        try:
+            async with semaphore:
+                _, body, travel_plan = await _generate_plan_response(
+                    request, travel_days, travel_service, plan_store
+                )
+            return key, {"status": "ok", **_cache_fields(travel_plan)}, body
+        except UpstreamUnavailableError as e:
+            return key, {
+                "status": "error",
+                "error": f"生成旅游计划失败: {str(e)}",
+                "retry_after": math.ceil(e.retry_after)
+            }, None
+        except Exception as e:
+            return key, {"status": "error", "error": f"生成旅游计划失败: {str(e)}"}, None
+
+    tasks = [asyncio.create_task(generate(key)) for key in groups]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, entry, body = await next_done
+            for index in groups[key][2]:
+                yield result_line(index, entry, body)
+    finally:
+        # 客户端断开时取消尚未完成的条目
+        for task in tasks:
+            task.cancel()
+
+    yield _ndjson_line({
+        "type": "summary",
+        "total": total,
+        "unique": len(groups),
+        "succeeded": succeeded,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 3)
+    })
+
+
+@router.post("/generate-plans:batch")
+async def generate_travel_plans_batch(
+        batch: BatchPlanRequest,
+        travel_service: TravelService = Depends(get_travel_service),
+        plan_store: Optional[PlanStore] = Depends(get_plan_store),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """
+    批量生成旅游计划（NDJSON）
+
+    每个条目是一个 TravelPlanRequest。每完成一个计划立即输出一行
+    {"type": "result", "index", "status", "plan" 或 "error", "completed", "total"}，
+    相同条目共用同一个计划；全部完成后输出一行 {"type": "summary", ...}。
+    """
+    if len(batch.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"批次条目过多: {len(batch.items)}，最多{settings.BATCH_MAX_ITEMS}条"
+        )
+
+    return StreamingResponse(
+        _run_batch(batch.items, travel_service, plan_store),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+        travel_service: TravelService = Depends(get_travel_service),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """
+    查询旅游计划缓存的命中统计、并发合并统计、预生成计划和相近请求复用的命中统计
+
+    多进程部署时统计来自处理本次请求的工作进程（worker_pid）。
+    """
+    extra = {
+        "worker_pid": os.getpid(),
+        "coalescing": travel_service.single_flight.stats(),
+        "prewarmed": travel_service.prewarmed_plans.stats() if travel_service.prewarmed_plans is not None else None,
+        "reuse": travel_service.plan_reuse.stats() if travel_service.plan_reuse is not None else None
+    }
+    if travel_service.plan_cache is None:
+        return {"enabled": False, **extra}
+    return {"enabled": True, **travel_service.plan_cache.stats(), **extra}
+
+
+@router.get("/poi-catalog/stats")
+async def get_poi_catalog_stats(
+        travel_service: TravelService = Depends(get_travel_service),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """查询各城市景点目录的规模及坐标校验、修正统计"""
+    return travel_service.poi_catalogs.stats()
+
+
+@router.get("/plans/{plan_id}", response_model=TravelPlanResponse)
+async def get_travel_plan(
+        plan_id: str,
+        if_none_match: Optional[str] = Header(None),
+        plan_store: Optional[PlanStore] = Depends(get_plan_store),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """
+    查询已生成的旅游计划
+
+    返回保存时序列化的正文和ETag，客户端带If-None-Match重新验证时未变化则返回304。
+    """
+    stored = await plan_store.get(plan_id) if plan_store is not None else None
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"旅游计划不存在: {plan_id}")
+
+    etag, body = stored
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/jobs/stats")
+async def get_job_stats(
+        job_queue: JobQueue = Depends(get_job_queue),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """查询异步任务队列深度、等待时间和处理时间"""
+    return await job_queue.stats()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+        job_id: str,
+        wait: float = Query(0, ge=0),
+        job_queue: JobQueue = Depends(get_job_queue),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """
+    查询异步生成任务
+
+    wait大于0时长轮询：任务完成或等待wait秒（不超过JOB_MAX_WAIT）后返回当前状态。
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在或已过期: {job_id}")
+
+    job = await job_queue.wait(job, min(wait, settings.JOB_MAX_WAIT))
+    if job.status == "failed":
+        return {**job.to_dict(), "error": f"生成旅游计划失败: {job.error}"}
+    return job.to_dict()
+
+
+@router.get("/llm/stats")
+async def get_llm_stats(
+        travel_service: TravelService = Depends(get_travel_service),
+        authenticated: bool = Depends(verify_wx_request)
+):
+    """查询各大模型后端的延迟、成功率、对冲和熔断状态（处理本次请求的工作进程）"""
+    return {"worker_pid": os.getpid(), **travel_service.llm_service.backend_pool.stats()}
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List
 import os
 # 修改前
 
@@ -22,10 +22,123 @@ class Settings(BaseSettings):
 
     # 大模型API配置
     LLM_API_KEY: str = Field(default="")
-    LLM_API_URL: str = Field(default="https://api.openai.com/v1/chat/completions")
+    LLM_API_URL: str = Field(default="https://api.moonshot.cn/v1")  # OpenAI兼容接口的基础地址
+    LLM_MODEL: str = Field(default="moonshot-v1-auto")  # 没有档位放得下时使用
+    # 按提示词的预估令牌数（输入加预计输出）选择最小的上下文档位；使用其他模型时改为对应档位或置为{}
+    LLM_MODEL_TIERS: Dict[str, int] = Field(default_factory=lambda: {
+        "moonshot-v1-8k": 8192,
+        "moonshot-v1-32k": 32768,
+        "moonshot-v1-128k": 131072
+    })
+    # 多个后端时使用JSON列表配置，为空时使用上面的单个后端，例如：
+    # [{"name": "moonshot", "base_url": "https://api.moonshot.cn/v1", "api_key": "...", "model": "moonshot-v1-auto"},
+    #  {"name": "backup", "base_url": "...", "api_key": "...", "model": "...", "rpm_limit": 60,
+    #   "model_tiers": {"backup-8k": 8192, "backup-32k": 32768}}]
+    LLM_BACKENDS: List[Dict[str, Any]] = Field(default_factory=list)
+    LLM_HEDGE_DELAY: float = Field(default=15.0)  # 请求超过该时间未返回时向下一个后端发起对冲请求；0表示不对冲
 
-    # 数据库配置（如果需要）
-    DATABASE_URL: str = Field(default="")
+    # 大模型HTTP连接池配置（每个进程共享一个客户端）
+    LLM_MAX_CONNECTIONS: int = Field(default=100)
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20)
+    LLM_KEEPALIVE_EXPIRY: float = Field(default=30.0)  # 空闲连接保活时间（秒）
+    LLM_CONNECT_TIMEOUT: float = Field(default=10.0)
+    LLM_TIMEOUT: float = Field(default=120.0)  # 单次生成的总超时（秒）
+
+    # 大模型调用管控：并发上限、每分钟限额、重试和熔断（限额为0表示不限制）
+    LLM_MAX_CONCURRENCY: int = Field(default=16)  # 每个进程同时进行的大模型调用数
+    LLM_RPM_LIMIT: float = Field(default=0)  # 每分钟请求数
+    LLM_TPM_LIMIT: float = Field(default=0)  # 每分钟令牌数
+    LLM_MAX_RETRIES: int = Field(default=3)  # 只重试限流、超时和服务端错误
+    LLM_RETRY_BASE_DELAY: float = Field(default=0.5)  # 指数退避的基础延迟（秒）
+    LLM_RETRY_MAX_DELAY: float = Field(default=8.0)
+    LLM_BREAKER_FAILURE_THRESHOLD: int = Field(default=5)  # 连续失败多少次后熔断
+    LLM_BREAKER_RESET_TIMEOUT: float = Field(default=30.0)  # 熔断持续时间（秒）
+
+    # 旅游计划缓存配置
+    PLAN_CACHE_ENABLED: bool = Field(default=True)
+    PLAN_CACHE_MAX_ENTRIES: int = Field(default=1024)
+    PLAN_CACHE_TTL: float = Field(default=86400.0)  # 缓存有效期（秒）
+    PLAN_CACHE_DB_PATH: str = Field(default="")  # 为空时只使用内存缓存
+
+    # 相近请求复用：同城市、中心位置相近（按本地景点目录解析坐标）、天数和出行方式相同且景点兼容时复用近期计划
+    PLAN_REUSE_ENABLED: bool = Field(default=True)
+    PLAN_REUSE_RADIUS_M: float = Field(default=500.0)  # 中心位置相距不超过该值（米）时可复用
+    PLAN_REUSE_MAX_AGE: float = Field(default=3600.0)  # 只复用该时间（秒）以内生成的计划
+    PLAN_REUSE_MAX_ENTRIES: int = Field(default=2048)  # 每个进程保留的可复用计划数
+    CENTER_ALIAS_PATH: str = Field(default="data/center_aliases.json")  # 中心位置别名表，{"城市": {"规范名称": ["别名"]}}
+
+    # 按天并行生成配置
+    PLAN_PARALLEL_DAYS_THRESHOLD: int = Field(default=0)  # 未指定生成模式时，天数达到该值自动按天并行；0表示不自动启用
+    PLAN_PARALLEL_MAX_CONCURRENCY: int = Field(default=7)  # 单个计划同时进行的单日生成数
+    PLAN_DAY_MAX_RETRIES: int = Field(default=2)  # 单日生成失败后的重试次数
+
+    # 本地路线优化（按出行方式重排每天的景点顺序）
+    ROUTE_OPTIMIZATION_ENABLED: bool = Field(default=True)
+
+    # 本地日程安排：按建议游览时长和路程耗时排出每个景点的时刻，游览不完的景点移到较空闲的天
+    SCHEDULE_ENABLED: bool = Field(default=True)
+    SCHEDULE_DAY_START: str = Field(default="09:00")  # 每天的游览开始时刻
+    SCHEDULE_DAY_END: str = Field(default="18:00")  # 每天的游览结束时刻
+    SCHEDULE_DEFAULT_DURATION_MINUTES: int = Field(default=90)  # 建议游览时长缺失或无法解析时使用
+    SCHEDULE_UTC_OFFSET_HOURS: float = Field(default=8.0)  # 未指定出发日期时，按该时区的当天作为第1天
+
+    # 异步任务模式（?async=1）：进程内固定大小的工作池和有界队列
+    JOB_WORKERS: int = Field(default=4)
+    JOB_QUEUE_SIZE: int = Field(default=100)  # 队列满时新任务返回429
+    JOB_RESULT_TTL: float = Field(default=600.0)  # 完成的任务结果保留时间（秒）
+    JOB_MAX_WAIT: float = Field(default=30.0)  # 长轮询的最长等待时间（秒）
+    JOB_STORE_PATH: str = Field(default="data/jobs.db")  # 各工作进程共用的任务状态表（SQLite），为空时只保存在本进程
+    JOB_POLL_INTERVAL: float = Field(default=0.2)  # 长轮询其他工作进程的任务时查询任务表的间隔（秒）
+
+    # 批量生成（/generate-plans:batch）
+    BATCH_MAX_ITEMS: int = Field(default=500)  # 单个批次的最大条目数
+    BATCH_MAX_CONCURRENCY: int = Field(default=4)  # 单个批次同时进行的计划生成数
+
+    # 热门计划预生成（python -m app.prewarm），启动时以内存映射方式加载，命中时不调用大模型
+    PREWARM_ENABLED: bool = Field(default=True)
+    PREWARM_PACK_DIR: str = Field(default="data/prewarm")
+    PREWARM_TOP_N: int = Field(default=200)  # 预生成的热门请求数
+    PREWARM_MIN_COUNT: int = Field(default=3)  # 日志中至少出现多少次才预生成
+    PREWARM_REFRESH_AGE: float = Field(default=259200.0)  # 超过该时间（秒）的计划在下次运行时重新生成
+    PREWARM_MAX_AGE: float = Field(default=604800.0)  # 超过该时间（秒）的计划不再使用
+    PREWARM_RELOAD_INTERVAL: float = Field(default=60.0)  # 服务检查计划包是否更新的间隔（秒），0表示不检查
+    PREWARM_CONCURRENCY: int = Field(default=2)  # 预生成时同时进行的大模型调用数
+    PREWARM_RPM_LIMIT: float = Field(default=20)  # 预生成时的每分钟请求数，避免挤占线上配额
+    PREWARM_NICE: int = Field(default=10)  # 预生成进程降低的CPU调度优先级
+
+    # 本地景点目录（校验并修正大模型返回的坐标）
+    POI_DATA_DIR: str = Field(default="data/poi")  # 每个城市一个CSV或SQLite文件，文件名即城市名
+    POI_SNAP_ENABLED: bool = Field(default=True)
+    POI_SNAP_MAX_DISTANCE: float = Field(default=5000.0)  # 名称匹配的景点最多修正的距离（米）
+    POI_SNAP_TOLERANCE: float = Field(default=30.0)  # 偏差小于该值视为坐标正确（米）
+
+    # 附近景点查询（启动时从景点数据构建打包索引，以内存映射方式加载）
+    NEARBY_INDEX_DIR: str = Field(default="data/poi_index")
+    NEARBY_CELL_SIZE: float = Field(default=500.0)  # 网格单元边长（米）
+    NEARBY_MAX_RADIUS: float = Field(default=50000.0)  # 半径查询和k近邻搜索的最大半径（米）
+
+    # 数据库配置：保存生成的旅游计划，默认使用本地SQLite，其他数据库需安装sqlalchemy及驱动
+    DATABASE_URL: str = Field(default="sqlite:///data/plans.db")
+    PLAN_STORE_ENABLED: bool = Field(default=True)
+    PLAN_STORE_BATCH_SIZE: int = Field(default=50)  # 单次批量写入的最大计划数
+    PLAN_STORE_FLUSH_INTERVAL: float = Field(default=0.5)  # 合并写入的等待时间（秒）
+    PLAN_STORE_MAX_PENDING: int = Field(default=10000)  # 数据库持续写入失败时待写队列的上限，超出时丢弃最早的计划
+
+    # 监控：/metrics 输出Prometheus指标；安装opentelemetry后可为各处理阶段创建span
+    METRICS_ENABLED: bool = Field(default=True)
+    TRACING_ENABLED: bool = Field(default=False)
+
+    # 部署配置：gunicorn多进程模式见 gunicorn.conf.py
+    WEB_CONCURRENCY: int = Field(default=0)  # 工作进程数，0表示按CPU核数
+    SHUTDOWN_GRACE_PERIOD: float = Field(default=60.0)  # 关闭时等待进行中的请求和后台任务的最长时间（秒）
+
+    # 日志配置
+    LOG_LEVEL: str = Field(default="INFO")
+    LOG_FORMAT: str = Field(default="json")  # json：每行一条JSON；text：纯文本
+    LOG_FILE: str = Field(default="logs/app.log")
+    LOG_ASYNC: bool = Field(default=True)  # 文件和控制台写入放到后台线程，请求处理只负责入队
+    LOG_QUEUE_SIZE: int = Field(default=10000)  # 日志队列上限，写入跟不上时丢弃新日志并计数
+    LOG_MAX_MESSAGE_CHARS: int = Field(default=4000)  # 单条日志消息的最大字符数，超出部分截断，0表示不截断
 
     model_config = {
         "env_file": ".env",
@@ -0,0 +1,193 @@
+from app.core.config import settings
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import generate_latest, multiprocess
+from typing import Optional
+import functools
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace as _otel_trace
+except ImportError:  # 未安装时不支持链路追踪
+    _otel_trace = None
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# 各阶段耗时的直方图分桶（秒），覆盖微秒级的本地处理到分钟级的大模型生成
+STAGE_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0
+)
+
+# 多进程部署时（gunicorn.conf.py 设置 PROMETHEUS_MULTIPROC_DIR），各工作进程把指标写入该目录下的
+# 内存映射文件，/metrics 汇总全部工作进程；Gauge的multiprocess_mode指定跨进程的汇总方式
+
+# 请求
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP请求耗时", ("method", "route", "status"), buckets=STAGE_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "正在处理的HTTP请求数", multiprocess_mode="livesum")
+
+# 处理阶段：auth / prompt / parse / convert / snap / route / schedule
+STAGE_SECONDS = Histogram(
+    "travel_stage_duration_seconds", "计划生成各处理阶段的耗时", ("stage",), buckets=STAGE_BUCKETS
+)
+PARSE_STRATEGY = Counter(
+    "llm_parse_strategy_total", "大模型响应解析成功使用的策略（direct/fenced/brace/repaired/regex）及失败次数",
+    ("strategy",)
+)
+
+# 大模型上游
+UPSTREAM_TTFT_SECONDS = Histogram(
+    "llm_upstream_ttft_seconds", "流式调用收到第一个内容分片的耗时", ("backend",), buckets=STAGE_BUCKETS
+)
+UPSTREAM_SECONDS = Histogram(
+    "llm_upstream_duration_seconds", "单次上游调用的总耗时（不含排队和重试等待）", ("backend", "outcome"),
+    buckets=STAGE_BUCKETS
+)
+UPSTREAM_TOKENS = Counter("llm_tokens_total", "上游返回的令牌用量", ("backend", "type"))
+UPSTREAM_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight", "正在进行的上游调用数", ("backend",), multiprocess_mode="livesum"
+)
+
+# 任务队列（各工作进程共用的任务表中的数量，抓取时读取）和计划存储（各进程的待写队列之和）
+JOB_QUEUE_DEPTH = Gauge("job_queue_depth", "异步任务队列中等待的任务数", multiprocess_mode="livemostrecent")
+JOB_BUSY_WORKERS = Gauge("job_busy_workers", "正在执行任务的工作协程数", multiprocess_mode="livemostrecent")
+PLAN_STORE_PENDING = Gauge("plan_store_pending", "等待写入数据库的计划数", multiprocess_mode="livesum")
+PLAN_STORE_DROPPED = Counter("plan_store_dropped_total", "待写队列已满而丢弃的最早计划数")
+PLAN_GENERATIONS_IN_FLIGHT = Gauge(
+    "plan_generations_in_flight", "正在进行的计划生成数（并发合并后）", multiprocess_mode="livesum"
+)
+
+# 日志
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "日志队列已满而丢弃的日志数")
+LOG_MESSAGES_TRUNCATED = Counter("log_messages_truncated_total", "超长被截断的日志消息数")
+
+
+def render_metrics() -> bytes:
+    """Prometheus文本格式的指标；多进程部署时汇总全部工作进程"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def _tracer():
+    if _otel_trace is None or not settings.TRACING_ENABLED:
+        return None
+    return _otel_trace.get_tracer("travel")
+
+
+class stage:
+    """
+    计时一个处理阶段，记录到阶段直方图；启用链路追踪时同时创建同名span
+
+    用法:
+        with stage("prompt"):
+            ...
+    """
+
+    __slots__ = ("name", "_started", "_span")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._span = None
+
+    def __enter__(self) -> "stage":
+        tracer = _tracer()
+        if tracer is not None:
+            self._span = tracer.start_as_current_span(f"travel.{self.name}")
+            self._span.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        STAGE_SECONDS.labels(self.name).observe(time.perf_counter() - self._started)
+        if self._span is not None:
+            self._span.__exit__(exc_type, exc, tb)
+
+
+def span(name: str, **attributes):
+    """启用链路追踪时返回一个span上下文，否则返回None"""
+    tracer = _tracer()
+    if tracer is None:
+        return None
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def timed(stage_name: str):
+    """把整个函数作为一个处理阶段计时的装饰器"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _route_template(scope) -> str:
+    """
+    请求匹配到的路由模板
+
+    子路由中的路由只记录自身的路径（如 /plans/{plan_id}），前缀从实际请求路径中
+    按模板的层级数截取，拼成完整模板（如 /api/travel/plans/{plan_id}）。
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    parts = scope["path"].split("/")
+    prefix = "/".join(parts[:max(len(parts) - template.count("/"), 0)])
+    return prefix + template
+
+
+class MetricsMiddleware:
+    """
+    记录每个HTTP请求的耗时和并发数的ASGI中间件
+
+    路由标签使用路由模板（如 /api/travel/plans/{plan_id}），避免按具体路径产生大量时间序列。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        request_span = span(f"HTTP {scope['method']}", **{"http.target": scope["path"]})
+        if request_span is not None:
+            request_span.__enter__()
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUEST_SECONDS.labels(scope["method"], _route_template(scope), status).observe(
+                time.perf_counter() - started
+            )
+            if request_span is not None:
+                request_span.__exit__(None, None, None)
+
+
+def record_usage(backend: str, usage: Optional[object]) -> None:
+    """记录上游返回的 completion.usage"""
+    if usage is None:
+        return
+    UPSTREAM_TOKENS.labels(backend, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    UPSTREAM_TOKENS.labels(backend, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
@@ -0,0 +1,52 @@
+from contextvars import ContextVar
+import re
+import uuid
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# 客户端传入的请求ID只接受较短的字母数字串，避免把任意内容写进日志
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+
+def get_request_id() -> str:
+    """当前请求的ID，不在请求中时为 "-" """
+    return request_id_var.get()
+
+
+class RequestIdMiddleware:
+    """
+    为每个HTTP请求分配请求ID的ASGI中间件
+
+    优先使用请求头 X-Request-ID，否则生成新的ID；ID写入上下文变量供日志使用，
+    并通过响应头 X-Request-ID 返回给客户端。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode("latin-1"):
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        header = (REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1"))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,22 @@
+from fastapi.responses import JSONResponse
+from typing import Any
+import json
+
+try:
+    import orjson
+except ImportError:  # 未安装时使用标准库序列化
+    orjson = None
+
+
+def json_dumps(data: Any) -> bytes:
+    """序列化为UTF-8编码的JSON，中文不转义；安装了orjson时使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 json_dumps 序列化的JSON响应，作为应用的默认响应类"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
@@ -1,5 +1,6 @@
 from fastapi import Depends, HTTPException, Header, Request
 from app.core.config import settings
+from app.core.metrics import stage
 import hashlib
 import time
 from typing import Optional
@@ -15,16 +16,17 @@ async def verify_wx_request(
     验证请求是否来自微信小程序
     简化版，实际中需要使用适当的安全机制
     """
-    # 在开发环境中跳过验证
-    if settings.DEBUG:
-        return True
+    with stage("auth"):
+        # 在开发环境中跳过验证
+        if settings.DEBUG:
+            return True
 
-    # 实际生产中应该实现真正的请求验证
-    # 可以使用微信小程序的登录接口获取的session_key验证
-    # 或者使用自定义的token系统
+        # 实际生产中应该实现真正的请求验证
+        # 可以使用微信小程序的登录接口获取的session_key验证
+        # 或者使用自定义的token系统
 
-    # 这里只是示例，真实场景需要根据微信小程序开发文档实现
-    if not all([signature, timestamp, nonce]):
-        raise HTTPException(status_code=401, detail="未授权访问")
+        # 这里只是示例，真实场景需要根据微信小程序开发文档实现
+        if not all([signature, timestamp, nonce]):
+            raise HTTPException(status_code=401, detail="未授权访问")
 
-    return True
\ No newline at end of file
+        return True
\ No newline at end of file
@@ -4,19 +4,152 @@
 import logging_config
 
 # 然后导入其他必要的模块
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
+from app.api.endpoints import health, metrics
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.responses import FastJSONResponse
+from app.core.request_context import RequestIdMiddleware
+from app.services.llm_service import LLMService
+from app.services.plan_cache import PlanCache
+from app.services.poi_catalog import PoiCatalogRegistry
+from app.services.nearby_index import NearbyIndexRegistry
+from app.services.plan_store import PlanStore
+from app.services.plan_prewarm import PrewarmedPlans
+from app.services.plan_reuse import CenterAliases, PlanReuseIndex
+from app.services.job_queue import JobQueue
+from app.services.travel_service import TravelService
+import asyncio
 import logging
 
 # 获取logger实例
 logger = logging.getLogger(__name__)
 
+
+def load_static_data(app: FastAPI) -> None:
+    """加载只读的景点目录、中心位置别名表、附近景点索引和预生成计划"""
+    app.state.poi_catalogs = PoiCatalogRegistry.load(settings.POI_DATA_DIR)
+    app.state.center_aliases = CenterAliases.load(settings.CENTER_ALIAS_PATH)
+    app.state.nearby_indexes = NearbyIndexRegistry.load(
+        settings.POI_DATA_DIR, settings.NEARBY_INDEX_DIR, settings.NEARBY_CELL_SIZE
+    )
+    app.state.prewarmed_plans = None
+    if settings.PREWARM_ENABLED:
+        app.state.prewarmed_plans = PrewarmedPlans(settings.PREWARM_PACK_DIR, settings.PREWARM_MAX_AGE)
+
+
+def preload() -> None:
+    """
+    多进程部署时在主进程fork之前调用（见 gunicorn.conf.py）
+
+    只读数据加载一次，各工作进程以写时复制方式共享；lifespan中不再重复加载。
+    """
+    load_static_data(app)
+    app.state.preloaded = True
+
+
+async def drain(job_queue: JobQueue, travel_service: TravelService, timeout: float) -> None:
+    """关闭前等待后台任务和进行中的大模型调用完成，最多等待timeout秒"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    stats = await job_queue.stats()
+    pending_jobs = stats["queue_depth"] + stats["busy_workers"]
+    if pending_jobs:
+        logger.info(f"等待{pending_jobs}个后台任务完成")
+    if not await job_queue.drain(timeout):
+        logger.warning(f"等待后台任务超时（{timeout}秒），剩余任务将被取消")
+    unfinished = await travel_service.single_flight.drain(max(deadline - loop.time(), 0))
+    if unfinished:
+        logger.warning(f"{unfinished}个进行中的计划生成未能在关闭前完成")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期：每个工作进程启动时创建大模型客户端、缓存和任务队列，
+    关闭时先排空进行中的任务再释放连接池
+    """
+    logger.info(f"应用启动: {settings.PROJECT_NAME}")
+    logger.info(f"调试模式: {settings.DEBUG}")
+
+    preloaded = getattr(app.state, "preloaded", False)
+    if not preloaded:
+        load_static_data(app)
+
+    llm_service = LLMService()
+    plan_cache = None
+    if settings.PLAN_CACHE_ENABLED:
+        plan_cache = PlanCache(
+            max_entries=settings.PLAN_CACHE_MAX_ENTRIES,
+            ttl=settings.PLAN_CACHE_TTL,
+            db_path=settings.PLAN_CACHE_DB_PATH
+        )
+    plan_reuse = None
+    if settings.PLAN_REUSE_ENABLED:
+        plan_reuse = PlanReuseIndex(
+            app.state.poi_catalogs,
+            app.state.center_aliases,
+            radius_m=settings.PLAN_REUSE_RADIUS_M,
+            max_age=settings.PLAN_REUSE_MAX_AGE,
+            max_entries=settings.PLAN_REUSE_MAX_ENTRIES
+        )
+    prewarmed_plans = app.state.prewarmed_plans
+    travel_service = TravelService(llm_service, plan_cache, app.state.poi_catalogs, prewarmed_plans, plan_reuse)
+    app.state.travel_service = travel_service
+    # 定期检查预生成计划包，python -m app.prewarm 更新后切换到新包
+    prewarm_watcher = None
+    if prewarmed_plans is not None and settings.PREWARM_RELOAD_INTERVAL > 0:
+        prewarm_watcher = asyncio.create_task(prewarmed_plans.watch(settings.PREWARM_RELOAD_INTERVAL))
+    plan_store = None
+    if settings.PLAN_STORE_ENABLED:
+        plan_store = PlanStore(
+            settings.DATABASE_URL,
+            batch_size=settings.PLAN_STORE_BATCH_SIZE,
+            flush_interval=settings.PLAN_STORE_FLUSH_INTERVAL,
+            max_pending=settings.PLAN_STORE_MAX_PENDING
+        )
+        plan_store.start()
+    app.state.plan_store = plan_store
+    job_queue = JobQueue(
+        settings.JOB_WORKERS,
+        settings.JOB_QUEUE_SIZE,
+        settings.JOB_RESULT_TTL,
+        store_path=settings.JOB_STORE_PATH,
+        poll_interval=settings.JOB_POLL_INTERVAL
+    )
+    job_queue.start()
+    app.state.job_queue = job_queue
+    app.state.ready = True
+
+    yield
+
+    # 服务器已停止接受新连接并等待了进行中的请求，这里再等待后台任务
+    app.state.ready = False
+    await drain(job_queue, travel_service, settings.SHUTDOWN_GRACE_PERIOD)
+    if prewarm_watcher is not None:
+        prewarm_watcher.cancel()
+    await job_queue.close()
+    if plan_store is not None:
+        await plan_store.close()
+    await llm_service.aclose()
+    if not preloaded:
+        app.state.nearby_indexes.close()
+        if prewarmed_plans is not None:
+            prewarmed_plans.close()
+    if plan_cache is not None:
+        plan_cache.close()
+    logger.info(f"应用关闭: {settings.PROJECT_NAME}")
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="智能旅游微信小程序后端API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # 配置CORS
@@ -28,24 +161,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 注册路由
-app.include_router(router)
+# 请求耗时和并发数指标
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
+# 请求ID，写入日志并通过响应头返回
+app.add_middleware(RequestIdMiddleware)
 
-# 启动事件
-@app.on_event("startup")
-async def startup_event():
-    logger.info(f"应用启动: {settings.PROJECT_NAME}")
-    logger.info(f"调试模式: {settings.DEBUG}")
-
-
-# 关闭事件
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info(f"应用关闭: {settings.PROJECT_NAME}")
+# 注册路由
+app.include_router(router)
+app.include_router(health.router, tags=["health"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["metrics"])
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # 本地开发使用单进程，DEBUG时自动重载；生产环境使用 gunicorn -c gunicorn.conf.py app.main:app
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=settings.DEBUG,
+        timeout_graceful_shutdown=settings.SHUTDOWN_GRACE_PERIOD
+    )
\ No newline at end of file
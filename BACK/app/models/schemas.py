@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime, date, timedelta
+import datetime as dt
 
 
 class ScenicSpot(BaseModel):
@@ -14,6 +15,8 @@ class TravelData(BaseModel):
     scenicSpots: List[ScenicSpot]
     travelMode: str
     travelDays: str  # 注意这里是字符串类型，需要转换为整数
+    generationMode: Optional[Literal["single", "parallel"]] = None  # "single" 一次生成完整计划，"parallel" 按天并行生成
+    startDate: Optional[date] = None  # 第1天的日期，为空时为当天
 
 
 class TravelPlanRequest(BaseModel):
@@ -22,6 +25,11 @@ class TravelPlanRequest(BaseModel):
     travelData: TravelData
 
 
+class BatchPlanRequest(BaseModel):
+    # 每项是一个TravelPlanRequest，逐项校验，单项无效只在结果中报告该项的错误
+    items: List[Dict[str, Any]] = Field(..., min_length=1, description="TravelPlanRequest列表")
+
+
 class PointOfInterest(BaseModel):
     name: str
     address: str
@@ -29,13 +37,19 @@ class PointOfInterest(BaseModel):
     longitude: float
     description: str
     recommended_duration: Optional[str] = None
+    leg_distance_km: Optional[float] = None  # 距上一站的直线距离，第一站为距中心位置
+    leg_travel_minutes: Optional[int] = None  # 按出行方式估算的上一段行程耗时
+    start_time: Optional[str] = None  # 到达时刻，"HH:MM"
+    end_time: Optional[str] = None  # 离开时刻，"HH:MM"
 
 
 class DailyPlan(BaseModel):
     day: int  # 第几天
-    date: Optional[date] = None  # 可选日期，默认为None
+    date: Optional[dt.date] = None  # 该天的日期，按请求的出发日期计算；字段名与date类型同名，注解使用模块限定名
     poi_list: List[PointOfInterest]
     description: str
+    total_distance_km: Optional[float] = None  # 从中心出发游览并返回的总直线距离
+    repaired: bool = False  # 该天在原始响应中损坏或缺失，经单独重新生成
 
     # Pydantic v2 验证兼容性
     model_config = {
@@ -50,4 +64,24 @@ class TravelPlanResponse(BaseModel):
     travel_days: int
     travel_mode: str
     daily_plans: List[DailyPlan]
-    overview: str = Field(..., description="旅游计划概览")
\ No newline at end of file
+    overview: str = Field(..., description="旅游计划概览")
+    warnings: List[str] = Field(default_factory=list, description="本次生成的提示，如损坏的天已重新生成、行程超出游览时段")
+
+
+class NearbyPoi(BaseModel):
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    category: str
+    distance_m: float  # 距查询位置的直线距离（米）
+
+
+class NearbyResponse(BaseModel):
+    city: str
+    latitude: float  # 查询位置
+    longitude: float
+    total: int = Field(..., description="满足条件的景点总数")
+    offset: int
+    limit: int
+    items: List[NearbyPoi]
@@ -0,0 +1,135 @@
+"""
+热门计划预生成
+
+从请求日志中统计最常见的（城市、中心位置、天数、出行方式）组合，为其生成计划并写入
+预生成计划包（PREWARM_PACK_DIR）。服务启动时以内存映射方式加载该包，命中时不调用大模型；
+运行中的服务每 PREWARM_RELOAD_INTERVAL 秒检查一次，包更新后自动切换。
+
+已有且生成时间未超过 PREWARM_REFRESH_AGE 的计划直接沿用，其余重新生成。生成在单独的进程中
+以较低的CPU优先级、PREWARM_CONCURRENCY 的并发和 PREWARM_RPM_LIMIT 的每分钟请求数进行，
+避免挤占线上服务的资源和大模型配额。定时刷新可由cron定期执行 build，或使用 --every 常驻运行。
+
+用法（在 BACK 目录下执行）:
+    python -m app.prewarm mine [--logs "logs/app.log*"] [--top 200] [--min-count 3]
+    python -m app.prewarm build [--logs "logs/app.log*"] [--top 200] [--min-count 3] [--every 3600]
+"""
+from app.core.config import settings
+from app.core.responses import json_dumps
+from app.services.llm_service import LLMService
+from app.services.plan_prewarm import (
+    PopularRequest, build_entries, load_pack_entries, mine_popular_requests, write_pack
+)
+from app.services.poi_catalog import PoiCatalogRegistry
+from app.services.travel_service import TravelService
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger("app.prewarm")
+
+
+def _log_files(patterns: List[str]) -> List[str]:
+    return sorted({path for pattern in patterns for path in glob.glob(pattern)})
+
+
+def lower_priority() -> None:
+    """降低本进程的CPU调度优先级，并把大模型调用的并发和每分钟请求数限制在预生成配额内"""
+    try:
+        os.nice(settings.PREWARM_NICE)
+    except (AttributeError, OSError) as e:
+        logger.warning(f"无法降低进程优先级: {str(e)}")
+    settings.LLM_MAX_CONCURRENCY = settings.PREWARM_CONCURRENCY
+    if settings.PREWARM_RPM_LIMIT:
+        settings.LLM_RPM_LIMIT = settings.PREWARM_RPM_LIMIT
+
+
+async def build(args: argparse.Namespace, llm_service: Optional[LLMService] = None) -> Dict[str, int]:
+    """统计热门请求，生成缺失或过期的计划并写出新的预生成计划包"""
+    log_files = _log_files(args.logs)
+    requests = mine_popular_requests(log_files, args.top, args.min_count)
+    existing = load_pack_entries(args.pack_dir)
+    logger.info(f"从{len(log_files)}个日志文件中统计到{len(requests)}个热门请求，已有{len(existing)}个预生成计划")
+
+    travel_service = TravelService(
+        llm_service or LLMService(), None, PoiCatalogRegistry.load(settings.POI_DATA_DIR)
+    )
+
+    async def generate(request: PopularRequest) -> bytes:
+        city, center_name, travel_days, travel_mode = request
+        travel_plan = await travel_service.generate_plan(
+            city=city,
+            center_name=center_name,
+            scenic_spots=[],
+            travel_days=travel_days,
+            travel_mode=travel_mode
+        )
+        return json_dumps(travel_plan.to_cache_value())
+
+    try:
+        entries, counts = await build_entries(
+            requests,
+            existing,
+            generate,
+            top=args.top,
+            refresh_age=args.refresh_age,
+            max_age=settings.PREWARM_MAX_AGE,
+            concurrency=settings.PREWARM_CONCURRENCY
+        )
+    finally:
+        if llm_service is None:
+            await travel_service.llm_service.aclose()
+
+    write_pack(Path(args.pack_dir), entries)
+    logger.info(
+        f"预生成计划包已更新: {len(entries)}个计划（沿用{counts['reused']}，生成{counts['generated']}，"
+        f"失败{counts['failed']}，保留{counts['kept']}，丢弃{counts['dropped']}）"
+    )
+    return counts
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="热门计划预生成")
+    parser.add_argument("command", choices=("mine", "build"), help="mine：只统计热门请求；build：生成并写出计划包")
+    parser.add_argument("--logs", nargs="+", default=[f"{settings.LOG_FILE}*"], help="请求日志文件（支持通配符）")
+    parser.add_argument("--top", type=int, default=settings.PREWARM_TOP_N)
+    parser.add_argument("--min-count", type=int, default=settings.PREWARM_MIN_COUNT)
+    parser.add_argument("--refresh-age", type=float, default=settings.PREWARM_REFRESH_AGE,
+                        help="超过该时间（秒）的计划重新生成")
+    parser.add_argument("--pack-dir", default=settings.PREWARM_PACK_DIR)
+    parser.add_argument("--every", type=float, default=0, help="常驻运行，每隔该时间（秒）刷新一次")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # 只输出到控制台，预生成产生的请求日志不写入线上日志文件，避免被下次统计
+    logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "mine":
+        for (city, center_name, travel_days, travel_mode), count in mine_popular_requests(
+                _log_files(args.logs), args.top, args.min_count
+        ):
+            print(f"{count:>8}  {city} {center_name} {travel_days}天 {travel_mode}")
+        return 0
+
+    lower_priority()
+    while True:
+        try:
+            asyncio.run(build(args))
+        except Exception as e:
+            logger.error(f"预生成失败: {str(e)}")
+            if not args.every:
+                return 1
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
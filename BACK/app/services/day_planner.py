@@ -0,0 +1,130 @@
+from app.services.geo import project_local
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# 均衡聚类的最大迭代次数
+MAX_ITERATIONS = 10
+
+
+def assign_spots_to_days(
+        spots: List[Dict[str, Any]],
+        travel_days: int,
+        center: Optional[Tuple[float, float]] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    在本地按地理位置把用户选择的景点分成每天一组
+
+    使用球面距离做容量均衡的k聚类：每组最多 ceil(n/k) 个景点，
+    种子从距中心最远的景点开始按最远点依次选取，结果对相同输入是确定的。
+    各组按离中心由近到远排列为第1天、第2天……景点少于天数时部分天为空，
+    否则每天至少一个景点（坐标重复的景点也会分到不同的天）。
+
+    Args:
+        spots: 景点字典列表（包含latitude和longitude）
+        travel_days: 旅行天数
+        center: 中心位置坐标 (纬度, 经度)，为空时使用景点的几何中心
+
+    Returns:
+        长度为travel_days的列表，每个元素为当天的景点列表
+    """
+    days: List[List[Dict[str, Any]]] = [[] for _ in range(travel_days)]
+    if not spots or travel_days <= 0:
+        return days
+
+    lats = np.fromiter((spot["latitude"] for spot in spots), dtype=np.float64, count=len(spots))
+    lngs = np.fromiter((spot["longitude"] for spot in spots), dtype=np.float64, count=len(spots))
+    center_lat, center_lng = center if center is not None else (lats.mean(), lngs.mean())
+
+    # 投影到以中心位置为原点的平面坐标（米）
+    points = project_local(lats, lngs, center_lat, center_lng)
+
+    k = min(travel_days, len(spots))
+    labels, centroids = _balanced_clusters(points, k)
+
+    # 按聚类中心离中心位置的距离排序，近的安排在前面
+    order = np.argsort(np.hypot(centroids[:, 0], centroids[:, 1]), kind="stable")
+
+    for day, cluster in enumerate(order):
+        days[day] = [spots[i] for i in np.flatnonzero(labels == cluster)]
+    return days
+
+
+def _balanced_clusters(points: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """容量均衡的k聚类（k不超过景点数），返回每个景点所属的组号和各组中心"""
+    n = len(points)
+    capacity = -(-n // k)
+
+    # 最远点种子只从不同的位置中选取，第一个种子为离中心（原点）最远的位置；
+    # 不同位置少于k个时其余的组与已有种子重合，由容量限制把同一位置的景点分到不同的组
+    locations = np.unique(points, axis=0)
+    seeds = [int(np.argmax(np.hypot(locations[:, 0], locations[:, 1])))]
+    nearest = np.linalg.norm(locations - locations[seeds[0]], axis=1)
+    for _ in range(1, min(k, len(locations))):
+        seed = int(np.argmax(nearest))
+        seeds.append(seed)
+        nearest = np.minimum(nearest, np.linalg.norm(locations - locations[seed], axis=1))
+
+    centroids = locations[[seeds[i % len(seeds)] for i in range(k)]]
+    labels = np.full(n, -1)
+
+    for _ in range(MAX_ITERATIONS):
+        distances = np.linalg.norm(points[:, None, :] - centroids[None, :, :], axis=2)
+        new_labels = _assign_with_capacity(distances, capacity)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.column_stack((
+            np.bincount(labels, weights=points[:, 0], minlength=k),
+            np.bincount(labels, weights=points[:, 1], minlength=k)
+        ))
+        # 空组保留原来的中心
+        occupied = counts > 0
+        centroids = centroids.copy()
+        centroids[occupied] = sums[occupied] / counts[occupied, None]
+
+    _fill_empty_clusters(labels, distances, k)
+    return labels, centroids
+
+
+def _fill_empty_clusters(labels: np.ndarray, distances: np.ndarray, k: int) -> None:
+    """容量分配可能让某组为空，从景点多于一个的组中移入离该组中心最近的景点（原地修改labels）"""
+    counts = np.bincount(labels, minlength=k)
+    for cluster in np.flatnonzero(counts == 0):
+        movable = np.flatnonzero(counts[labels] > 1)
+        point = movable[np.argmin(distances[movable, cluster])]
+        counts[labels[point]] -= 1
+        counts[cluster] += 1
+        labels[point] = cluster
+
+
+def _assign_with_capacity(distances: np.ndarray, capacity: int) -> np.ndarray:
+    """
+    带容量限制的分配，每组不超过capacity个景点
+
+    第r轮让尚未分配的景点申请各自第r近的组，组内按距离从近到远接收直到满员，
+    最多k轮即可全部分配，每轮都是向量化运算。
+    """
+    n, k = distances.shape
+    labels = np.full(n, -1)
+    counts = np.zeros(k, dtype=np.int64)
+    preferences = np.argsort(distances, axis=1, kind="stable")
+
+    for rank in range(k):
+        pending = np.flatnonzero(labels == -1)
+        if pending.size == 0:
+            break
+        choices = preferences[pending, rank]
+
+        # 先按距离、再按组稳定排序，得到每个申请者在组内的名次
+        order = np.argsort(distances[pending, choices], kind="stable")
+        order = order[np.argsort(choices[order], kind="stable")]
+        pending, choices = pending[order], choices[order]
+        group_start = np.searchsorted(choices, choices, side="left")
+        position = np.arange(pending.size) - group_start
+
+        accepted = position < capacity - counts[choices]
+        labels[pending[accepted]] = choices[accepted]
+        counts += np.bincount(choices[accepted], minlength=k)
+
+    return labels
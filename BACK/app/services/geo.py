@@ -0,0 +1,102 @@
+from typing import List, Tuple, Union
+import math
+import numpy as np
+
+# 地球平均半径（米）
+EARTH_RADIUS_M = 6371008.8
+
+ArrayLike = Union[float, np.ndarray]
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine(lat1: ArrayLike, lng1: ArrayLike, lat2: ArrayLike, lng2: ArrayLike) -> np.ndarray:
+    """
+    计算两组坐标之间的球面距离（米），支持NumPy广播
+
+    例如传入形状为(n, 1)和(1, m)的数组即可得到n×m的距离矩阵。
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distance_matrix(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """计算一组坐标两两之间的距离矩阵（米）"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    return haversine(lats[:, None], lngs[:, None], lats[None, :], lngs[None, :])
+
+
+def project_local(lats: np.ndarray, lngs: np.ndarray, origin_lat: float, origin_lng: float) -> np.ndarray:
+    """
+    以origin为原点把坐标投影到局部平面（米），返回形状为(n, 2)的数组
+
+    等距圆柱投影在城市范围内误差很小，适合在迭代中反复计算距离。
+    """
+    x = np.radians(np.asarray(lngs, dtype=np.float64) - origin_lng) * np.cos(np.radians(origin_lat)) * EARTH_RADIUS_M
+    y = np.radians(np.asarray(lats, dtype=np.float64) - origin_lat) * EARTH_RADIUS_M
+    return np.column_stack((x, y))
+
+
+def geohash_encode(lat: float, lng: float, precision: int) -> str:
+    """计算坐标的geohash编码"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # 偶数位编码经度
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """指定精度的geohash单元大小（纬度跨度, 经度跨度），单位为度"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def geohash_precision(radius_m: float, max_latitude: float = 60.0) -> int:
+    """
+    单元边长不小于radius_m的最高geohash精度
+
+    按max_latitude处的经度方向边长计算，保证在该纬度以内，
+    以坐标所在单元及其8个相邻单元即可覆盖半径radius_m的范围。
+    """
+    meters_per_degree = math.radians(1) * EARTH_RADIUS_M
+    for precision in range(12, 0, -1):
+        lat_span, lng_span = geohash_cell_size(precision)
+        height = lat_span * meters_per_degree
+        width = lng_span * meters_per_degree * math.cos(math.radians(max_latitude))
+        if min(height, width) >= radius_m:
+            return precision
+    return 1
+
+
+def geohash_neighbors(lat: float, lng: float, precision: int) -> List[str]:
+    """坐标所在的geohash单元及其相邻单元（去重后最多9个）"""
+    lat_span, lng_span = geohash_cell_size(precision)
+    cells = []
+    for d_lat in (0, -lat_span, lat_span):
+        for d_lng in (0, -lng_span, lng_span):
+            neighbor_lat = min(max(lat + d_lat, -90.0), 90.0)
+            neighbor_lng = (lng + d_lng + 180.0) % 360.0 - 180.0
+            cell = geohash_encode(neighbor_lat, neighbor_lng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
@@ -0,0 +1,376 @@
+from app.core.request_context import get_request_id, request_id_var
+from app.core.responses import json_dumps
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# 统计等待时间和处理时间时保留的最近样本数
+_SAMPLE_SIZE = 1000
+
+# 已结束的任务状态
+_FINISHED = ("succeeded", "failed")
+
+# 清理任务表中过期任务的最短间隔（秒）
+_PURGE_INTERVAL = 60.0
+
+_CREATE_TABLE = (
+    "CREATE TABLE IF NOT EXISTS travel_jobs ("
+    "job_id VARCHAR(64) PRIMARY KEY, status VARCHAR(16) NOT NULL, result TEXT, error TEXT, "
+    "created_at FLOAT NOT NULL, started_at FLOAT, finished_at FLOAT)"
+)
+
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("任务队列已满")
+        self.retry_after = retry_after
+
+
+class Job:
+    """异步生成任务"""
+
+    def __init__(self, fn: Optional[Callable[[], Awaitable[Any]]] = None, job_id: Optional[str] = None):
+        self.job_id = job_id or str(uuid.uuid4())
+        self.fn = fn
+        self.request_id = get_request_id()  # 提交任务的请求，执行时的日志沿用该ID
+        self.status = "queued"  # queued / running / succeeded / failed
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.status == "succeeded":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class _JobTable:
+    """
+    各工作进程共用的任务状态表（SQLite，WAL模式）
+
+    任务在接受它的工作进程中执行，状态和结果写入该表，查询请求落到任一工作进程都能读到。
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_CREATE_TABLE)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS travel_jobs_status ON travel_jobs (status)")
+        self._conn.commit()
+
+    def put(self, row: Tuple[Any, ...]) -> None:
+        """写入任务状态，row为JobQueue在事件循环中取得的快照，结果在此处序列化"""
+        job_id, status, result, error, created_at, started_at, finished_at = row
+        result = json_dumps(result).decode("utf-8") if status == "succeeded" else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO travel_jobs "
+                "(job_id, status, result, error, created_at, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, status, result, error, created_at, started_at, finished_at)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error, created_at, started_at, finished_at FROM travel_jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = Job(job_id=job_id)
+        job.status, result, job.error, job.created_at, job.started_at, job.finished_at = row
+        job.result = json.loads(result) if result is not None else None
+        if job.status in _FINISHED:
+            job.done.set()
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        """全部工作进程中排队和正在执行的任务数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM travel_jobs WHERE status IN ('queued', 'running') GROUP BY status"
+            ).fetchall()
+        counts = dict(rows)
+        return {"queued": counts.get("queued", 0), "running": counts.get("running", 0)}
+
+    def purge(self, finished_before: float, created_before: float) -> None:
+        """删除过期的已结束任务，以及所在进程异常退出而一直未结束的任务"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM travel_jobs WHERE finished_at < ? OR (finished_at IS NULL AND created_at < ?)",
+                (finished_before, created_before)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    固定大小的进程内工作池
+
+    任务进入有界队列，由固定数量的工作协程依次取出执行；队列满时拒绝新任务，
+    并根据近期平均处理时间估算客户端应等待的秒数。完成的任务保留一段时间供查询。
+
+    指定store_path时任务状态同时写入各工作进程共用的任务表，多进程部署下查询请求
+    落到其他工作进程也能读到任务，长轮询按poll_interval检查任务表。任务表的读写都在
+    线程池中执行，写入按调用顺序依次进行，不会用旧状态覆盖新状态。
+    """
+
+    def __init__(
+            self,
+            workers: int = 4,
+            max_queue: int = 100,
+            result_ttl: float = 600,
+            store_path: str = "",
+            poll_interval: float = 0.2
+    ):
+        self.worker_count = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, Job] = {}
+        self._table = _JobTable(store_path) if store_path else None
+        self._write_lock = asyncio.Lock()
+        self._last_purge = 0.0
+        self._workers = []
+        self._busy = 0
+        self.draining = False  # 关闭前排空队列期间不再接受新任务
+
+        # 统计
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._wait_times: Deque[float] = deque(maxlen=_SAMPLE_SIZE)
+        self._service_times: Deque[float] = deque(maxlen=_SAMPLE_SIZE)
+
+    def start(self) -> None:
+        """启动工作协程"""
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def submit(self, fn: Callable[[], Awaitable[Any]]) -> Job:
+        """
+        提交任务，返回时任务已写入任务表
+
+        Raises:
+            QueueFullError: 队列已满或服务正在关闭
+        """
+        await self._purge()
+        if self.draining:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+        job = Job(fn)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+        self._jobs[job.job_id] = job
+        self.submitted += 1
+        await self._record(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """查询任务：先查本进程，再查共用的任务表"""
+        job = self._jobs.get(job_id)
+        if job is not None or self._table is None:
+            return job
+        return await asyncio.to_thread(self._table.get, job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """长轮询：等待任务完成或超时，返回任务当前状态"""
+        if timeout <= 0 or job.done.is_set():
+            return job
+        if self._jobs.get(job.job_id) is job:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return job
+
+        # 其他工作进程中的任务，定期查询任务表
+        deadline = time.monotonic() + timeout
+        while not job.done.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            job = await asyncio.to_thread(self._table.get, job.job_id) or job
+        return job
+
+    @property
+    def queue_depth(self) -> int:
+        """本工作进程中排队的任务数"""
+        return self._queue.qsize()
+
+    def retry_after(self) -> int:
+        """估算排队任务全部开始处理所需的秒数"""
+        service_time = self._average(self._service_times) or 1.0
+        return max(1, math.ceil(service_time * self._queue.qsize() / self.worker_count))
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            await self._record(job)
+            self._wait_times.append(job.started_at - job.created_at)
+            self._busy += 1
+            token = request_id_var.set(job.request_id)
+            try:
+                job.result = await job.fn()
+                job.status = "succeeded"
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "服务关闭，任务已取消"
+                raise
+            except Exception as e:
+                logger.error(f"异步任务执行失败 {job.job_id}: {str(e)}")
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                request_id_var.reset(token)
+                job.fn = None
+                job.finished_at = time.time()
+                self._service_times.append(job.finished_at - job.started_at)
+                self._busy -= 1
+                # 先写入任务表再通知本进程的等待者，其他进程查询时不会读到旧状态
+                await self._record(job)
+                job.done.set()
+                self._queue.task_done()
+
+    async def _record(self, job: Job) -> None:
+        """把任务状态写入共用的任务表，写入失败只影响其他工作进程的查询"""
+        if self._table is None:
+            return
+        # 在事件循环中取快照，asyncio.Lock按调用顺序依次写入
+        row = (job.job_id, job.status, job.result, job.error, job.created_at, job.started_at, job.finished_at)
+        async with self._write_lock:
+            try:
+                await asyncio.to_thread(self._table.put, row)
+            except sqlite3.Error as e:
+                logger.error(f"写入任务状态失败 {job.job_id}: {str(e)}")
+
+    async def _purge(self) -> None:
+        """清理超过保留时间的已完成任务"""
+        now = time.time()
+        deadline = now - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < deadline
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        if self._table is not None and now - self._last_purge >= _PURGE_INTERVAL:
+            self._last_purge = now
+            try:
+                await asyncio.to_thread(self._table.purge, deadline, now - max(self.result_ttl, 86400))
+            except sqlite3.Error as e:
+                logger.error(f"清理任务表失败: {str(e)}")
+
+    @staticmethod
+    def _average(samples: Deque[float]) -> float:
+        return sum(samples) / len(samples) if samples else 0.0
+
+    @staticmethod
+    def _percentile(samples: Deque[float], q: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    async def stats(self) -> Dict[str, Any]:
+        """
+        返回本工作进程的队列深度、等待时间和处理时间统计，用于确定每个节点的工作协程数；
+        使用任务表时cluster给出全部工作进程中排队和正在执行的任务数
+        """
+        cluster = None
+        if self._table is not None:
+            try:
+                cluster = await asyncio.to_thread(self._table.counts)
+            except sqlite3.Error as e:
+                logger.error(f"查询任务表失败: {str(e)}")
+        return {
+            "worker_pid": os.getpid(),
+            "workers": self.worker_count,
+            "busy_workers": self._busy,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "wait_time": {
+                "avg": self._average(self._wait_times),
+                "p50": self._percentile(self._wait_times, 0.5),
+                "p95": self._percentile(self._wait_times, 0.95)
+            },
+            "service_time": {
+                "avg": self._average(self._service_times),
+                "p50": self._percentile(self._service_times, 0.5),
+                "p95": self._percentile(self._service_times, 0.95)
+            },
+            "cluster": cluster
+        }
+
+    async def drain(self, timeout: float) -> bool:
+        """停止接受新任务，等待已排队和正在执行的任务完成，超时返回False"""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self) -> None:
+        """停止工作协程，未完成的任务标记为失败"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.status = "failed"
+            job.error = "服务关闭，任务已取消"
+            job.finished_at = time.time()
+            await self._record(job)
+            job.done.set()
+        if self._table is not None:
+            self._table.close()
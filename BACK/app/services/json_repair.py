@@ -0,0 +1,409 @@
+from typing import Any, List, Optional
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 字符串内部需要逐字符处理的字符：反斜杠、引号和控制字符
+_STRING_SPECIAL = re.compile(r"[\\\"'\x00-\x1f]")
+# 符合JSON规范的数字
+_JSON_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+# 可组成裸词（true/false/null、数字、未加引号的键）的字符
+_BARE_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+-._")
+_BARE_RUN = re.compile(r"[A-Za-z0-9+\-._]+")
+_WHITESPACE_RUN = re.compile(r"\s+")
+# 合法的双引号字符串及其后的第一个非空白字符，用于整段跳过无需修复的字符串
+_CLEAN_STRING = re.compile(r'"(?:[^"\\\x00-\x1f]|\\["\\/bfnrtu])*"\s*([,:}\]])')
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+# 快速路径：合法的双引号字符串（原样保留）或容器结尾前多余的逗号（删除）
+_STRING_OR_TRAILING_COMMA = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|,(?=\s*[}\]])')
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+_OBJECT = "{"
+_ARRAY = "["
+
+_DECODER = json.JSONDecoder()
+
+
+class ParseResult:
+    """容错解析结果"""
+
+    def __init__(self, value: Any, strategy: str, repairs: List[str]):
+        self.value = value
+        self.strategy = strategy  # direct / fenced / brace / repaired / regex
+        self.repairs = repairs
+
+
+class TolerantJSONParser:
+    """
+    单遍、可增量的容错JSON解析器
+
+    逐段输入大模型输出（可以是完整文本，也可以是流式token），
+    解析器在一次扫描中定位最外层对象，同时把常见的语法问题改写为合法JSON：
+    代码块和前后说明文字、单引号字符串、多余/缺失/重复的逗号、分号分隔、
+    Python字面量、未加引号的键、非法转义、字符串中的换行以及被截断的结尾。
+    改写后的文本交给 json.loads 完成最终解析，应用过的修复记录在 repairs 中。
+    """
+
+    def __init__(self):
+        self.repairs: List[str] = []
+        self._out: List[str] = []
+        self._stack: List[List[str]] = []  # [容器类型, 期望状态]
+        self._started = False
+        self._done = False
+        self._quote: Optional[str] = None  # 当前字符串的引号，None表示不在字符串中
+        self._string_role = "value"
+        self._escape = False
+        self._closing: Optional[List[str]] = None  # 候选结束引号之后缓存的空白
+        self._bare: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        """最外层对象是否已经闭合"""
+        return self._done
+
+    def feed(self, chunk: str) -> None:
+        """输入一段文本"""
+        i = 0
+        n = len(chunk)
+        out = self._out
+
+        while i < n:
+            if self._done:
+                if not chunk[i:].isspace():
+                    self._repair("stripped_suffix")
+                return
+
+            if self._closing is not None:
+                # 根据结束引号后的第一个非空白字符判断它是否真的结束了字符串
+                c = chunk[i]
+                if c.isspace():
+                    self._closing.append(c)
+                    i += 1
+                    continue
+                whitespace = "".join(_CONTROL_ESCAPES.get(w, w) for w in self._closing)
+                self._closing = None
+                if c in ",:;}]" or (c in "\"'" and "\\n" in whitespace):
+                    self._end_string()
+                else:
+                    out.append(('\\"' if self._quote == '"' else "'") + whitespace)
+                    self._repair("unescaped_quotes")
+                continue
+
+            if self._quote is not None:
+                # 整段复制字符串中的普通字符
+                match = _STRING_SPECIAL.search(chunk, i)
+                end = match.start() if match else n
+                if self._escape and end > i:
+                    self._handle_escape(chunk[i])
+                    i += 1
+                    continue
+                if end > i:
+                    out.append(chunk[i:end])
+                    i = end
+                    continue
+                self._string_char(chunk[i])
+                i += 1
+                continue
+
+            if not self._started:
+                start = chunk.find("{", i)
+                if chunk[i:start if start != -1 else n].strip():
+                    self._repair("stripped_prefix")
+                if start == -1:
+                    return
+                self._started = True
+                i = self._open_container(chunk, start)
+                continue
+
+            c = chunk[i]
+            if c in _BARE_CHARS:
+                # 裸词可能跨越多个输入片段，遇到分隔符时再统一处理
+                match = _BARE_RUN.match(chunk, i)
+                self._bare.append(match.group())
+                i = match.end()
+                continue
+            if self._bare:
+                self._flush_bare()
+            if c.isspace():
+                i = _WHITESPACE_RUN.match(chunk, i).end()
+                continue
+            i += 1
+
+            if c == '"':
+                match = _CLEAN_STRING.match(chunk, i - 1)
+                if match:
+                    role = self._begin_token(can_be_key=True)
+                    out.append(chunk[i - 1:match.start(1)].rstrip())
+                    self._token_ended(role)
+                    i = match.start(1)
+                    continue
+
+            if c == '"' or c == "'":
+                if c == "'":
+                    self._repair("single_quotes")
+                role = self._begin_token(can_be_key=True)
+                self._quote = c
+                self._string_role = role
+                out.append('"')
+            elif c == "{" or c == "[":
+                self._begin_token(can_be_key=False)
+                i = self._open_container(chunk, i - 1)
+            elif c == "}" or c == "]":
+                self._close_container(c)
+            elif c == ":":
+                top = self._stack[-1]
+                if top[0] == _OBJECT and top[1] == "colon":
+                    out.append(":")
+                    top[1] = "value"
+                else:
+                    self._repair("stray_chars")
+            elif c == "," or c == ";":
+                top = self._stack[-1]
+                if top[1] == "comma":
+                    out.append(",")
+                    top[1] = "key" if top[0] == _OBJECT else "value"
+                    if c == ";":
+                        self._repair("semicolon")
+                else:
+                    self._repair("duplicate_comma")
+            else:
+                self._repair("stray_chars")
+
+    def finish(self) -> Any:
+        """
+        结束输入并返回解析后的对象
+
+        Raises:
+            ValueError: 未找到JSON对象或修复后仍无法解析
+        """
+        if not self._started:
+            raise ValueError("响应中未找到JSON对象")
+
+        if not self._done:
+            self._repair("truncated")
+            if self._closing is not None:
+                self._closing = None
+                self._end_string()
+            elif self._quote is not None:
+                self._escape = False
+                self._end_string()
+            if self._bare:
+                self._flush_bare()
+            while self._stack:
+                self._close_container("}" if self._stack[-1][0] == _OBJECT else "]")
+
+        text = "".join(self._out)
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.debug(f"容错解析后的JSON: {text}")
+            raise ValueError(f"修复后的JSON仍然解析失败: {str(e)}")
+
+    def _open_container(self, chunk: str, start: int) -> int:
+        """
+        打开一个对象或数组，返回继续扫描的位置
+
+        先用C实现的解码器尝试整体解码，本身合法的子树（通常是大多数日计划）
+        原样复制，只有存在问题的容器才逐字符扫描。
+        """
+        try:
+            _, end = _DECODER.raw_decode(chunk, start)
+        except ValueError:
+            self._stack.append([_OBJECT, "key"] if chunk[start] == "{" else [_ARRAY, "value"])
+            self._out.append(chunk[start])
+            return start + 1
+
+        self._out.append(chunk[start:end])
+        if self._stack:
+            self._stack[-1][1] = "comma"
+        else:
+            self._done = True
+        return end
+
+    def _repair(self, name: str) -> None:
+        if name not in self.repairs:
+            self.repairs.append(name)
+
+    def _begin_token(self, can_be_key: bool) -> str:
+        """在当前容器中开始一个新的键或值，必要时补上缺失的逗号或冒号"""
+        top = self._stack[-1]
+        if top[1] == "comma":
+            self._out.append(",")
+            self._repair("missing_comma")
+            top[1] = "key" if top[0] == _OBJECT else "value"
+        if top[0] == _OBJECT:
+            if top[1] == "key":
+                if can_be_key:
+                    return "key"
+                # 对象中缺少键的值，补一个占位键
+                self._out.append('"":')
+                self._repair("missing_key")
+                top[1] = "value"
+            elif top[1] == "colon":
+                self._out.append(":")
+                self._repair("missing_colon")
+                top[1] = "value"
+        return "value"
+
+    def _token_ended(self, role: str) -> None:
+        top = self._stack[-1]
+        if role == "key":
+            top[1] = "colon"
+        else:
+            top[1] = "comma"
+
+    def _string_char(self, c: str) -> None:
+        out = self._out
+        if self._escape:
+            self._handle_escape(c)
+        elif c == "\\":
+            self._escape = True
+        elif c == self._quote:
+            self._closing = []
+        elif c == '"':
+            # 单引号字符串中的双引号需要转义
+            out.append('\\"')
+        elif c == "'":
+            out.append(c)
+        else:
+            out.append(_CONTROL_ESCAPES.get(c) or f"\\u{ord(c):04x}")
+            self._repair("control_chars")
+
+    def _end_string(self) -> None:
+        self._quote = None
+        self._out.append('"')
+        self._token_ended(self._string_role)
+
+    def _handle_escape(self, c: str) -> None:
+        self._escape = False
+        if c == "'":
+            self._out.append("'")
+            self._repair("invalid_escape")
+        elif c in _VALID_ESCAPES:
+            self._out.append("\\" + c)
+        else:
+            self._out.append(c)
+            self._repair("invalid_escape")
+
+    def _flush_bare(self) -> None:
+        token = "".join(self._bare)
+        self._bare.clear()
+        role = self._begin_token(can_be_key=True)
+
+        if role == "key":
+            self._out.append(json.dumps(token))
+            self._repair("unquoted_keys")
+            self._stack[-1][1] = "colon"
+            return
+
+        if token in ("true", "false", "null") or _JSON_NUMBER.fullmatch(token):
+            self._out.append(token)
+        elif token in _PYTHON_LITERALS:
+            self._out.append(_PYTHON_LITERALS[token])
+            self._repair("python_literals")
+        else:
+            try:
+                self._out.append(json.dumps(float(token)))
+                self._repair("number_format")
+            except ValueError:
+                self._out.append(json.dumps(token))
+                self._repair("bare_string")
+        self._stack[-1][1] = "comma"
+
+    def _close_container(self, c: str) -> None:
+        top = self._stack[-1]
+        expected = "}" if top[0] == _OBJECT else "]"
+        if c != expected:
+            self._repair("mismatched_bracket")
+
+        if self._out[-1] == "," and top[1] in ("key", "value"):
+            self._out.pop()
+            self._repair("trailing_comma")
+        elif top[1] == "colon":
+            self._out.append(":null")
+            self._repair("missing_value")
+        elif top[0] == _OBJECT and top[1] == "value":
+            self._out.append("null")
+            self._repair("missing_value")
+
+        self._stack.pop()
+        self._out.append(expected)
+        if self._stack:
+            self._stack[-1][1] = "comma"
+        else:
+            self._done = True
+
+
+def repair_json(content: str) -> ParseResult:
+    """
+    对完整文本执行一次容错解析
+
+    先走快速路径，只需去掉前后说明文字或多余逗号的文本直接交给 json.loads，
+    快速路径失败时才逐字符扫描。
+    """
+    result = _quick_parse(content)
+    if result is not None:
+        return result
+    parser = TolerantJSONParser()
+    parser.feed(content)
+    value = parser.finish()
+    return ParseResult(value, _classify(content, parser.repairs), parser.repairs)
+
+
+def parse_json_response(content: str) -> ParseResult:
+    """
+    解析大模型返回的JSON文本
+
+    先尝试标准解析，失败时进行单遍容错解析。
+
+    Raises:
+        ValueError: 无法解析出JSON对象
+    """
+    try:
+        return ParseResult(json.loads(content), "direct", [])
+    except json.JSONDecodeError:
+        return repair_json(content)
+
+
+def _quick_parse(content: str) -> Optional[ParseResult]:
+    """
+    截取最外层花括号之间的文本直接解析，首个错误是多余的逗号时删除多余的逗号再试一次
+
+    Returns:
+        解析结果，需要逐字符扫描时返回None
+    """
+    start = content.find("{")
+    end = content.rfind("}") + 1
+    if start == -1 or end <= start:
+        return None
+
+    repairs = []
+    if content[:start].strip():
+        repairs.append("stripped_prefix")
+    text = content[start:end]
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError as e:
+        if text[e.pos:e.pos + 1] not in ("}", "]") or not text[:e.pos].rstrip().endswith(","):
+            return None
+        fixed = _STRING_OR_TRAILING_COMMA.sub(r"\1", text)
+        try:
+            value = json.loads(fixed)
+        except json.JSONDecodeError:
+            return None
+        repairs.append("trailing_comma")
+    if content[end:].strip():
+        repairs.append("stripped_suffix")
+    return ParseResult(value, _classify(content, repairs), repairs)
+
+
+def _classify(content: str, repairs: List[str]) -> str:
+    """根据应用的修复判断解析策略"""
+    if any(r not in ("stripped_prefix", "stripped_suffix") for r in repairs):
+        return "repaired"
+    if "```" in content:
+        return "fenced"
+    return "brace"
@@ -0,0 +1,368 @@
+from openai import AsyncOpenAI
+from app.core.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_SECONDS, UPSTREAM_TTFT_SECONDS, record_usage
+from app.services.llm_governor import LLMGovernor, UpstreamUnavailableError
+from app.services.prompt_builder import Prompt
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypeVar
+import asyncio
+import httpx
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 统计指标的指数滑动平均系数
+_EWMA_ALPHA = 0.2
+# 选择上下文档位时只使用其中的这一比例，给本地令牌估算的误差留余量
+_CONTEXT_HEADROOM = 0.9
+
+
+def create_llm_client(api_key: str, base_url: str, settings) -> AsyncOpenAI:
+    """
+    创建带连接池的异步大模型客户端
+
+    每个后端只应创建一个客户端并在所有请求间复用，
+    这样HTTP连接可以保活并复用，而不是每个请求重新握手。
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+    )
+    if not api_key:
+        # 允许未配置密钥时启动服务（如本地开发），调用时由上游返回鉴权错误
+        logger.warning(f"大模型后端 {base_url} 未配置API Key")
+        api_key = "unset"
+    # 重试由LLMGovernor统一处理，关闭SDK自带的重试
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+def _base_url(url: str) -> str:
+    """兼容配置成完整接口地址的写法，SDK需要的是基础地址"""
+    url = url.rstrip("/")
+    suffix = "/chat/completions"
+    return url[:-len(suffix)] if url.endswith(suffix) else url
+
+
+class LLMBackend:
+    """一个OpenAI兼容的大模型服务端点，带独立的调用管控和延迟、成功率统计"""
+
+    def __init__(
+            self,
+            name: str,
+            client: AsyncOpenAI,
+            model: str,
+            governor: LLMGovernor,
+            model_tiers: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            model: 默认模型，未配置上下文档位或没有档位放得下时使用
+            model_tiers: 模型名到上下文长度（令牌）的映射，按提示词长度选择最小的档位
+        """
+        self.name = name
+        self.client = client
+        self.model = model
+        self.governor = governor
+        self.model_tiers = sorted((model_tiers or {}).items(), key=lambda item: item[1])
+
+        # 统计
+        self.latency: Optional[float] = None  # 成功调用耗时的滑动平均（秒）
+        self.success_rate = 1.0  # 成功率的滑动平均
+        self.successes = 0
+        self.failures = 0
+        self.cancelled = 0  # 对冲落败后被取消的调用
+
+    def select_model(self, prompt: Prompt) -> str:
+        """选择能容纳输入和预计输出的最小上下文档位"""
+        for model, context_tokens in self.model_tiers:
+            if prompt.total_tokens <= context_tokens * _CONTEXT_HEADROOM:
+                return model
+        return self.model
+
+    async def complete(self, prompt: Prompt, temperature: float) -> str:
+        """在本后端的管控下发送一次非流式请求"""
+        model = self.select_model(prompt)
+
+        async def request():
+            # 每次尝试单独计时，不含排队和重试等待
+            started = time.perf_counter()
+            outcome = "error"
+            UPSTREAM_IN_FLIGHT.labels(self.name).inc()
+            try:
+                result = await self.client.chat.completions.create(
+                    model=model,
+                    messages=prompt.messages,
+                    temperature=temperature,
+                )
+                outcome = "success"
+                return result
+            finally:
+                UPSTREAM_IN_FLIGHT.labels(self.name).dec()
+                UPSTREAM_SECONDS.labels(self.name, outcome).observe(time.perf_counter() - started)
+
+        completion = await self.governor.call(request, prompt.total_tokens)
+        usage = completion.usage
+        self.governor.record_usage(prompt.total_tokens, usage.total_tokens if usage else None)
+        record_usage(self.name, usage)
+        log_token_usage(self.name, model, prompt, usage)
+        return completion.choices[0].message.content
+
+    async def stream(self, prompt: Prompt, temperature: float) -> AsyncIterator[str]:
+        """在本后端的管控下发送一次流式请求，逐段产出内容，整个流期间占用一个并发名额"""
+        model = self.select_model(prompt)
+        started = time.monotonic()
+        try:
+            async with self.governor.permit(prompt.total_tokens):
+                upstream_started = time.perf_counter()
+                first_chunk = True
+                outcome = "error"
+                UPSTREAM_IN_FLIGHT.labels(self.name).inc()
+                try:
+                    stream = await self.client.chat.completions.create(
+                        model=model,
+                        messages=prompt.messages,
+                        temperature=temperature,
+                        stream=True,
+                    )
+                    async for chunk in stream:
+                        if not chunk.choices or not chunk.choices[0].delta.content:
+                            continue
+                        if first_chunk:
+                            first_chunk = False
+                            UPSTREAM_TTFT_SECONDS.labels(self.name).observe(time.perf_counter() - upstream_started)
+                        yield chunk.choices[0].delta.content
+                    outcome = "success"
+                finally:
+                    UPSTREAM_IN_FLIGHT.labels(self.name).dec()
+                    UPSTREAM_SECONDS.labels(self.name, outcome).observe(time.perf_counter() - upstream_started)
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        self.record(True, time.monotonic() - started)
+        log_token_usage(self.name, model, prompt, None)
+
+    def record(self, success: bool, elapsed: float) -> None:
+        if success:
+            self.successes += 1
+            self.latency = elapsed if self.latency is None else (
+                (1 - _EWMA_ALPHA) * self.latency + _EWMA_ALPHA * elapsed
+            )
+        else:
+            self.failures += 1
+        self.success_rate = (1 - _EWMA_ALPHA) * self.success_rate + _EWMA_ALPHA * (1.0 if success else 0.0)
+
+    def score(self) -> float:
+        """路由评分，越小越优先：熔断中的后端排最后，从未调用过的后端优先试用"""
+        if self.governor.breaker.state == "open":
+            return float("inf")
+        if self.latency is None:
+            # 只失败过、没有成功记录的后端排在其他可用后端之后
+            return 1e9 if self.failures else 0.0
+        return self.latency / max(self.success_rate, 0.05)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "success_rate": round(self.success_rate, 3),
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "governor": self.governor.stats()
+        }
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+def log_token_usage(backend: str, model: str, prompt: Prompt, usage: Any) -> None:
+    """记录一次调用的预估和实际令牌数"""
+    actual = f"，实际输入{usage.prompt_tokens}/输出{usage.completion_tokens}" if usage else ""
+    logger.info(
+        f"大模型调用 {backend}/{model} {prompt.kind}: "
+        f"预估输入{prompt.input_tokens}/输出{prompt.output_tokens}令牌{actual}"
+    )
+
+
+class BackendPool:
+    """
+    多后端路由
+
+    按延迟和成功率排序选择后端；请求超过hedge_delay仍未返回时向下一个后端发起对冲请求，
+    先得到有效解析结果的请求胜出，其余请求被取消；某个后端失败时立即切换到下一个后端。
+    流式请求不对冲，只在产出第一段内容前失败时切换到下一个后端。
+    """
+
+    def __init__(self, backends: List[LLMBackend], hedge_delay: float = 0):
+        if not backends:
+            raise ValueError("至少需要配置一个大模型后端")
+        self.backends = backends
+        self.hedge_delay = hedge_delay
+
+        # 统计
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def ranked(self) -> List[LLMBackend]:
+        return sorted(self.backends, key=lambda backend: backend.score())
+
+    async def complete(self, prompt: Prompt, parse: Callable[[str], T], temperature: float = 0.7) -> T:
+        """
+        发送请求并返回第一个有效的解析结果
+
+        Args:
+            prompt: 提示词
+            parse: 解析函数，抛出异常表示响应无效
+            temperature: 采样温度
+
+        Raises:
+            UpstreamUnavailableError: 全部后端都不可用
+        """
+        candidates = self.ranked()
+        pending: Dict[asyncio.Task, LLMBackend] = {}
+        errors: List[Exception] = []
+        next_index = 0
+        hedged = False
+
+        def launch() -> None:
+            nonlocal next_index
+            backend = candidates[next_index]
+            next_index += 1
+            task = asyncio.create_task(self._attempt(backend, prompt, parse, temperature))
+            pending[task] = backend
+
+        launch()
+        try:
+            while pending:
+                can_hedge = self.hedge_delay > 0 and next_index < len(candidates)
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    logger.info(f"大模型请求超过{self.hedge_delay}秒未返回，向{candidates[next_index].name}发起对冲请求")
+                    self.hedges += 1
+                    hedged = True
+                    launch()
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged and backend is not candidates[0]:
+                            self.hedge_wins += 1
+                        return task.result()
+                    errors.append(task.exception())
+                    logger.warning(f"大模型后端{backend.name}调用失败: {str(task.exception())}")
+
+                # 失败后立即切换到下一个后端
+                if next_index < len(candidates):
+                    self.failovers += 1
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise self._final_error(errors)
+
+    async def stream(self, prompt: Prompt, temperature: float = 0.7) -> AsyncIterator[str]:
+        """
+        发送流式请求并逐段产出内容
+
+        按排序依次尝试后端，熔断打开或在产出第一段内容前失败时切换到下一个后端；
+        已经开始输出后无法透明重试，之后的错误直接抛出。
+
+        Raises:
+            UpstreamUnavailableError: 全部后端都不可用
+        """
+        errors: List[Exception] = []
+        for backend in self.ranked():
+            if errors:
+                self.failovers += 1
+            started = False
+            try:
+                async with aclosing(backend.stream(prompt, temperature)) as chunks:
+                    async for content in chunks:
+                        started = True
+                        yield content
+                return
+            except Exception as e:
+                if started:
+                    raise
+                errors.append(e)
+                logger.warning(f"大模型后端{backend.name}流式调用失败: {str(e)}")
+        raise self._final_error(errors)
+
+    @staticmethod
+    def _final_error(errors: List[Exception]) -> Exception:
+        """全部后端失败时：都是不可用错误则合并为一个，按最短的重试时间提示；否则抛出最后一个错误"""
+        unavailable = [e for e in errors if isinstance(e, UpstreamUnavailableError)]
+        if len(unavailable) == len(errors):
+            return UpstreamUnavailableError(
+                f"全部大模型后端不可用: {str(errors[-1])}", min(e.retry_after for e in unavailable)
+            )
+        return errors[-1]
+
+    @staticmethod
+    async def _attempt(backend: LLMBackend, prompt: Prompt, parse: Callable[[str], T], temperature: float) -> T:
+        started = time.monotonic()
+        try:
+            value = parse(await backend.complete(prompt, temperature))
+        except asyncio.CancelledError:
+            backend.cancelled += 1
+            raise
+        except Exception:
+            backend.record(False, time.monotonic() - started)
+            raise
+        backend.record(True, time.monotonic() - started)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_delay": self.hedge_delay,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "backends": [backend.stats() for backend in self.ranked()]
+        }
+
+    async def aclose(self) -> None:
+        for backend in self.backends:
+            await backend.aclose()
+
+
+def create_backends(settings) -> List[LLMBackend]:
+    """
+    根据配置创建后端列表
+
+    LLM_BACKENDS为空时使用 LLM_API_URL / LLM_API_KEY / LLM_MODEL / LLM_MODEL_TIERS 作为唯一后端；
+    每个后端可以单独指定 max_concurrency、rpm_limit、tpm_limit，未指定时使用全局配置，
+    指定 model_tiers 时按提示词长度选择模型。
+    """
+    configs = settings.LLM_BACKENDS or [{
+        "name": "default",
+        "base_url": settings.LLM_API_URL,
+        "api_key": settings.LLM_API_KEY,
+        "model": settings.LLM_MODEL,
+        "model_tiers": settings.LLM_MODEL_TIERS
+    }]
+
+    backends = []
+    for i, config in enumerate(configs):
+        overrides = {key: config[key] for key in ("max_concurrency", "rpm_limit", "tpm_limit") if key in config}
+        backends.append(LLMBackend(
+            name=config.get("name") or f"backend-{i + 1}",
+            client=create_llm_client(config.get("api_key", ""), _base_url(config["base_url"]), settings),
+            model=config.get("model", settings.LLM_MODEL),
+            governor=LLMGovernor.from_settings(settings, **overrides),
+            model_tiers=config.get("model_tiers")
+        ))
+    return backends
@@ -0,0 +1,297 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailableError(Exception):
+    """大模型服务暂时不可用（限流或故障），客户端应稍后重试"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """熔断器打开，请求被直接拒绝"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """只有超时、连接错误、限流和服务端错误值得重试，参数错误等客户端错误不重试"""
+    if isinstance(error, openai.APIConnectionError):  # 包含超时
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, (asyncio.TimeoutError, httpx.TransportError))
+
+
+def _retry_after_header(error: BaseException) -> Optional[float]:
+    """读取上游响应中的Retry-After（秒）"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    每分钟配额的令牌桶
+
+    桶容量为一分钟的配额，按速率连续补充；取不到足够令牌时按缺口计算等待时间。
+    等待方按先来后到排队。配额为0表示不限制。
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0  # 累计等待秒数
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        if self.capacity <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                delay = (amount - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    def adjust(self, amount: float) -> None:
+        """按实际用量修正预估扣除的令牌，amount为正表示补扣，可以透支"""
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开，在reset_timeout内直接拒绝请求；
+    之后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"  # closed / open / half_open
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+
+    def check(self) -> None:
+        """
+        快速检查，熔断期间直接拒绝，不占用探测名额
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        if self.state == "open":
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError("大模型服务暂时不可用，请稍后重试", remaining)
+
+    def before_call(self) -> None:
+        """
+        请求前检查
+
+        Raises:
+            CircuitOpenError: 熔断器打开，或半开状态下已有探测请求
+        """
+        if self.state == "open":
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError("大模型服务暂时不可用，请稍后重试", remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError("大模型服务正在恢复，请稍后重试", self.reset_timeout)
+            self._probing = True
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("大模型服务已恢复，熔断器关闭")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def release(self) -> None:
+        """调用被取消时归还半开状态的探测名额"""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            logger.warning(f"大模型服务连续失败{self.failures}次，熔断{self.reset_timeout}秒")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class LLMGovernor:
+    """
+    大模型调用的统一管控
+
+    依次经过熔断检查、每分钟请求数和令牌数限额、全局并发信号量，
+    可重试的错误按带抖动的指数退避重试，重试耗尽后抛出 UpstreamUnavailableError。
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 16,
+            rpm_limit: float = 0,
+            tpm_limit: float = 0,
+            max_retries: int = 3,
+            retry_base_delay: float = 0.5,
+            retry_max_delay: float = 8.0,
+            failure_threshold: int = 5,
+            reset_timeout: float = 30.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.in_flight = 0
+
+        # 统计
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    @classmethod
+    def from_settings(cls, settings, **overrides) -> "LLMGovernor":
+        """按全局配置创建，overrides可覆盖单个后端的并发和限额"""
+        options = {
+            "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+            "rpm_limit": settings.LLM_RPM_LIMIT,
+            "tpm_limit": settings.LLM_TPM_LIMIT,
+            "max_retries": settings.LLM_MAX_RETRIES,
+            "retry_base_delay": settings.LLM_RETRY_BASE_DELAY,
+            "retry_max_delay": settings.LLM_RETRY_MAX_DELAY,
+            "failure_threshold": settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            "reset_timeout": settings.LLM_BREAKER_RESET_TIMEOUT
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    @asynccontextmanager
+    async def permit(self, estimated_tokens: int) -> AsyncIterator[None]:
+        """
+        获取一次调用的许可，退出时按结果更新熔断器
+
+        流式调用在整个流的生命周期内持有许可。
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        # 排队前先快速检查一次，拿到并发名额后再正式检查，排队期间熔断的请求不会再打到上游
+        self.breaker.check()
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+        async with self._semaphore:
+            self.breaker.before_call()
+            try:
+                self.in_flight += 1
+                self.calls += 1
+                yield
+            except BaseException as e:
+                if isinstance(e, Exception) and is_retryable(e):
+                    self.failures += 1
+                    self.breaker.record_failure()
+                elif isinstance(e, Exception):
+                    # 参数错误等客户端错误说明上游仍在正常响应
+                    self.breaker.record_success()
+                else:
+                    # 调用被取消，不影响熔断状态
+                    self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+            finally:
+                self.in_flight -= 1
+
+    async def call(self, fn: Callable[[], Awaitable[T]], estimated_tokens: int) -> T:
+        """
+        在管控下执行一次调用，可重试的错误自动重试
+
+        Raises:
+            UpstreamUnavailableError: 熔断打开或重试耗尽
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self.permit(estimated_tokens):
+                    return await fn()
+            except UpstreamUnavailableError:
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt >= self.max_retries or self.breaker.state == "open":
+                    retry_after = self.breaker.reset_timeout if self.breaker.state == "open" else self._backoff(attempt, e)
+                    raise UpstreamUnavailableError(
+                        f"大模型服务繁忙，重试{attempt}次后仍失败: {str(e)}", retry_after
+                    ) from e
+                delay = self._backoff(attempt, e)
+                self.retries += 1
+                logger.warning(f"大模型调用失败，{delay:.2f}秒后第{attempt + 1}次重试: {str(e)}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """优先使用上游给出的Retry-After，否则使用全抖动指数退避"""
+        retry_after = _retry_after_header(error)
+        if retry_after is not None:
+            return min(retry_after, self.retry_max_delay)
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """用响应中的实际令牌数修正令牌桶"""
+        if actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.state,
+            "circuit_rejected": self.breaker.rejected,
+            "rpm_wait_seconds": round(self.requests.waited, 3),
+            "tpm_wait_seconds": round(self.tokens.waited, 3)
+        }
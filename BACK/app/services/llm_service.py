@@ -1,20 +1,117 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from app.core.config import settings
-from typing import Dict, Any
+from app.models.schemas import PointOfInterest
+from app.core.metrics import PARSE_STRATEGY, stage
+from app.services.plan_stream import PlanStreamExtractor
+from app.services.json_repair import ParseResult, parse_json_response
+from app.services.llm_governor import LLMGovernor, UpstreamUnavailableError
+from app.services.llm_backends import BackendPool, LLMBackend, create_backends
+from app.services.prompt_builder import (
+    Prompt, build_day_prompt, build_outline_prompt, build_repair_prompt, build_travel_prompt
+)
+from pydantic import ValidationError
+from contextlib import aclosing
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple, Callable
 import logging
-import json
 import re
 
 logger = logging.getLogger(__name__)
 
+# 正则兜底提取使用的模式
+_STRING_VALUE = r'"((?:[^"\\]|\\.)*)"'
+_OVERVIEW_PATTERN = re.compile(r'"overview"\s*:\s*' + _STRING_VALUE)
+_DAY_PATTERN = re.compile(r'"day"\s*:\s*(\d+)')
+_DESCRIPTION_PATTERN = re.compile(r'"description"\s*:\s*' + _STRING_VALUE)
+_POI_LIST_PATTERN = re.compile(r'"poi_list"\s*:\s*\[(.*?)\]', re.DOTALL)
+_POI_ITEM_PATTERN = re.compile(r'{(.*?)}', re.DOTALL)
+_NAME_PATTERN = re.compile(r'"name"\s*:\s*' + _STRING_VALUE)
+_ADDRESS_PATTERN = re.compile(r'"address"\s*:\s*' + _STRING_VALUE)
+_LATITUDE_PATTERN = re.compile(r'"latitude"\s*:\s*([\d\.]+)')
+_LONGITUDE_PATTERN = re.compile(r'"longitude"\s*:\s*([\d\.]+)')
+_DURATION_PATTERN = re.compile(r'"recommended_duration"\s*:\s*' + _STRING_VALUE)
+
+_POI_TEXT_FIELDS = ("name", "address", "description")
+
+
+def _valid_coordinate(value: Any, limit: float) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 < abs(value) <= limit
+
+
+def validate_day_plan(day_plan: Any, travel_days: int) -> Optional[int]:
+    """
+    检查单日计划是否完整可用
+
+    Returns:
+        有效时返回天数（1..travel_days），字段缺失、类型不符、坐标无效或天数越界时返回None
+    """
+    if not isinstance(day_plan, dict) or not isinstance(day_plan.get("description"), str):
+        return None
+    day = day_plan.get("day")
+    if isinstance(day, str) and day.isdigit():
+        day = int(day)
+    if not isinstance(day, int) or isinstance(day, bool) or not 1 <= day <= travel_days:
+        return None
+
+    poi_list = day_plan.get("poi_list")
+    if not isinstance(poi_list, list) or not poi_list:
+        return None
+    for poi in poi_list:
+        if not isinstance(poi, dict):
+            return None
+        if not all(isinstance(poi.get(field), str) and poi[field] for field in _POI_TEXT_FIELDS):
+            return None
+        if not _valid_coordinate(poi.get("latitude"), 90) or not _valid_coordinate(poi.get("longitude"), 180):
+            return None
+        # 其余字段（建议游览时长等）按响应模型校验，避免转换为DailyPlan时才失败
+        try:
+            PointOfInterest.model_validate(poi)
+        except ValidationError:
+            return None
+    return day
+
+
+def split_daily_plans(daily_plans: Any, travel_days: int) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    区分完整的日计划和损坏或缺失的天
+
+    Returns:
+        (按天排序的有效日计划, 需要重新生成的天数列表)
+    """
+    valid: Dict[int, Dict[str, Any]] = {}
+    for day_plan in daily_plans if isinstance(daily_plans, list) else []:
+        day = validate_day_plan(day_plan, travel_days)
+        if day is not None and day not in valid:
+            day_plan["day"] = day
+            valid[day] = day_plan
+    broken = [day for day in range(1, travel_days + 1) if day not in valid]
+    return [valid[day] for day in sorted(valid)], broken
+
 
 class LLMService:
     """大模型API调用服务"""
 
-    def __init__(self):
-        self.api_key = "*******"  # 从配置中获取 API Key
-        self.api_url = "https://api.moonshot.cn/v1"  # Kimi API的基础URL
-        self.client = OpenAI(api_key=self.api_key, base_url=self.api_url)
+    def __init__(
+            self,
+            client: Optional[AsyncOpenAI] = None,
+            governor: Optional[LLMGovernor] = None,
+            backends: Optional[List[LLMBackend]] = None
+    ):
+        """
+        Args:
+            client: 直接指定客户端时作为唯一后端（用于测试和基准）
+            governor: 配合client使用的调用管控
+            backends: 后端列表，为空时按配置创建（LLM_BACKENDS 或 LLM_API_URL/LLM_API_KEY）
+        """
+        if backends is None:
+            if client is not None:
+                backends = [LLMBackend("default", client, settings.LLM_MODEL, governor or LLMGovernor.from_settings(settings))]
+            else:
+                backends = create_backends(settings)
+        self.backend_pool = BackendPool(backends, settings.LLM_HEDGE_DELAY)
+
+    async def aclose(self) -> None:
+        """关闭所有后端的HTTP连接池"""
+        await self.backend_pool.aclose()
 
     async def generate_travel_plan(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -28,22 +125,17 @@ class LLMService:
         """
         try:
             # 构建提示词
-            prompt = self._build_travel_prompt(input_data)
-
-            # 调用Kimi API的completion请求
-            completion = self.client.chat.completions.create(
-                model="moonshot-v1-auto",  # 选择合适的模型
-                messages=[
-                    {"role": "system",
-                     "content": "你是一个专业的旅游规划助手，能够合理的帮助用户规划具体的旅游方案。你的回答必须是纯JSON格式，不要添加任何额外的解释文字。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-            )
+            prompt = build_travel_prompt(input_data)
+            travel_days = int(input_data["travel_days"])
+
+            # 通过 API 获得模型回复消息并解析，没有任何可用日计划时换一个后端
+            travel_plan = await self._complete(prompt, lambda content: self._parse_travel_plan(content, travel_days))
 
-            # 通过 API 获得模型回复消息
-            result = completion.choices[0].message.content  # 直接获取字符串内容
-            travel_plan = self._parse_llm_response(result)  # 传入字符串
+            # 只有部分天损坏或缺失时，用一次短调用单独重新生成这几天
+            if travel_plan["broken_days"]:
+                travel_plan["daily_plans"] = await self.repair_days(
+                    input_data, travel_plan["daily_plans"], travel_plan["broken_days"]
+                )
 
             return travel_plan
 
@@ -51,223 +143,313 @@ class LLMService:
             logger.error(f"调用Kimi API失败: {str(e)}")
             raise
 
-    def _build_travel_prompt(self, input_data: Dict[str, Any]) -> str:
-        """构建旅游计划的提示词"""
-        city = input_data["city"]
-        center_name = input_data["center_name"]
-        travel_days = input_data["travel_days"]
-        travel_mode = input_data["travel_mode"]
-
-        # 处理已有的景点列表
-        scenic_spots_text = ""
-        if input_data.get("scenic_spots") and len(input_data["scenic_spots"]) > 0:
-            scenic_spots_text = "用户已选择的景点:\n"
-            for i, spot in enumerate(input_data["scenic_spots"], 1):
-                # 使用字典访问值并确保正确的 JSON 格式
-                scenic_spots_text += f"{i}. {spot['name']}, 地址: {spot['address']}, 坐标: ({spot['latitude']}, {spot['longitude']})\n"
-
-        # 构建提示词
-        prompt = f"""
-        请为我生成一份详细的旅游计划，遵循以下要求：
-
-        城市: {city}
-        中心位置: {center_name}
-        旅行天数: {travel_days}天
-        出行方式: {travel_mode}
-        {scenic_spots_text}
-
-        请根据以下要求制定一个合理的旅游行程:
-        1. 以中心位置为基础，规划{travel_days}天的行程
-        2. 考虑到用户的出行方式是{travel_mode}，规划合理的游览路线
-        3. 每天安排2-4个景点，考虑景点之间的距离和游览时间
-        4. 若用户已选择景点，请确保将这些景点合理地融入到行程中
-
-        你必须严格按照下面的JSON格式返回完整的旅游计划，不要添加任何额外的解释文本：
-
-        {{
-          "overview": "旅游计划概述",
-          "daily_plans": [
-            {{
-              "day": 1,
-              "description": "第一天概述",
-              "poi_list": [
-                {{
-                  "name": "景点名称",
-                  "address": "景点地址",
-                  "latitude": 39.123456,
-                  "longitude": 116.123456,
-                  "description": "景点描述",
-                  "recommended_duration": "2小时"
-                }}
-              ]
-            }}
-          ]
-        }}
-
-        请确保：
-        1. 返回的是纯JSON格式，不包含```json标记或任何说明文字
-        2. 所有JSON语法必须准确无误（如引号、逗号等）
-        3. 坐标信息尽量准确
-        4. 只返回这个JSON对象，不要有任何其他内容
+    async def generate_day_outline(self, input_data: Dict[str, Any], day_spots: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
         """
+        按天并行生成的第一步：生成计划概述和每天的主题
 
-        return prompt
+        输出很短，耗时远低于一次性生成完整计划。
 
-    def _parse_llm_response(self, content: str) -> Dict[str, Any]:
-        """解析并处理大模型的响应，能够处理各种可能的格式问题"""
+        Args:
+            input_data: 包含位置和旅行天数信息的字典
+            day_spots: 每天分配到的用户景点列表
+
+        Returns:
+            {"overview": 概述, "days": [{"day": 1, "theme": 主题}, ...]}
+        """
         try:
-            # 记录原始响应以便调试
-            logger.debug(f"原始响应内容: {content}")
+            outline = await self._complete(build_outline_prompt(input_data, day_spots), self._parse_llm_response)
 
-            # 1. 首先尝试直接解析整个内容（如果是纯JSON）
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                logger.debug("直接解析失败，尝试提取JSON部分")
+            themes = {item.get("day"): item.get("theme", "") for item in outline.get("days", []) if isinstance(item, dict)}
+            return {
+                "overview": outline.get("overview", ""),
+                "days": [{"day": day, "theme": themes.get(day, "")} for day in range(1, len(day_spots) + 1)]
+            }
 
-            # 2. 尝试查找JSON代码块
-            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
-            if json_match:
-                try:
-                    return json.loads(json_match.group(1).strip())
-                except json.JSONDecodeError:
-                    logger.debug("从代码块提取的JSON解析失败")
+        except Exception as e:
+            logger.error(f"生成行程大纲失败: {str(e)}")
+            raise
+
+    async def generate_day_plan(
+            self,
+            input_data: Dict[str, Any],
+            day: int,
+            theme: str,
+            spots: List[Dict[str, Any]],
+            other_days: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        按天并行生成的第二步：单独生成某一天的计划
+
+        Args:
+            input_data: 包含位置和旅行天数信息的字典
+            day: 第几天
+            theme: 当天主题
+            spots: 当天必须包含的用户景点
+            other_days: 其他天的主题，用于避免重复安排
 
-            # 3. 尝试寻找大括号对
-            json_start = content.find("{")
-            json_end = content.rfind("}")
+        Returns:
+            单日计划字典
+        """
+        try:
+            day_plan = await self._complete(
+                build_day_prompt(input_data, day, theme, spots, other_days), self._parse_llm_response
+            )
+            day_plan["day"] = day
+            return day_plan
 
-            if json_start != -1 and json_end != -1 and json_end > json_start:
-                json_str = content[json_start:json_end + 1]
+        except Exception as e:
+            logger.error(f"生成第{day}天计划失败: {str(e)}")
+            raise
+
+    async def repair_days(
+            self,
+            input_data: Dict[str, Any],
+            valid_days: List[Dict[str, Any]],
+            broken_days: List[int]
+    ) -> List[Dict[str, Any]]:
+        """
+        单独重新生成损坏或缺失的天，已有的天作为上下文
+
+        Returns:
+            合并后按天排序的日计划，重新生成的天带有 "repaired": True
+
+        Raises:
+            ValueError: 重新生成的结果仍不完整
+        """
+        logger.warning(f"大模型响应中第{'、'.join(map(str, broken_days))}天损坏或缺失，单独重新生成")
+        prompt = build_repair_prompt(input_data, valid_days, broken_days)
+        repaired = await self._complete(prompt, lambda content: self._parse_repaired_days(content, broken_days))
+        for day_plan in repaired:
+            day_plan["repaired"] = True
+        return sorted(valid_days + repaired, key=lambda day_plan: day_plan["day"])
+
+    async def _complete(self, prompt: Prompt, parse: Callable[[str], Any]) -> Any:
+        """发送一次非流式的completion请求并返回解析结果，由后端池负责选路、对冲和故障切换"""
+        return await self.backend_pool.complete(prompt, parse, temperature=0.7)
+
+    async def stream_travel_plan(self, input_data: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        以流式方式调用Kimi的API，边生成边产出计划片段
+
+        Args:
+            input_data: 包含位置和旅行天数信息的字典
+
+        Yields:
+            ("overview", 概述) 和 ("day", 日计划字典) 事件，
+            最后产出 ("complete", {"overview", "daily_plans", "warnings"})
+        """
+        try:
+            prompt = build_travel_prompt(input_data)
+            travel_days = int(input_data["travel_days"])
+
+            extractor = PlanStreamExtractor()
+            overview = None
+            days: Dict[int, Dict[str, Any]] = {}
+            warnings = []
+
+            # 第一段内容产出前失败时后端池会切换到下一个后端；已经开始输出后无法透明重试或对冲
+            async with aclosing(self.backend_pool.stream(prompt, temperature=0.7)) as chunks:
+                async for content in chunks:
+                    for event, value in extractor.feed(content):
+                        if event == "overview":
+                            overview = value
+                            yield event, value
+                            continue
+                        # 不完整的日计划不下发，流结束后单独重新生成
+                        day = validate_day_plan(value, travel_days)
+                        if day is None or day in days:
+                            warnings.append(f"流中第{extractor.emitted_days}个日计划不完整，已跳过")
+                            continue
+                        value["day"] = day
+                        days[day] = value
+                        yield event, value
+
+            # 流结束后用完整内容兜底，补齐增量解析未能产出的部分
+            warnings = extractor.warnings + warnings
+            if overview is None or not extractor.finished or len(days) < travel_days:
+                travel_plan = {}
+                try:
+                    parse_result = self._parse_llm_response_result(extractor.buffer)
+                    travel_plan = parse_result.value
+                    if parse_result.repairs:
+                        warnings.append(f"完整响应经过修复: {', '.join(parse_result.repairs)}")
+                except ValueError as e:
+                    if not days:
+                        raise
+                    warnings.append(f"完整响应无法解析: {str(e)}")
+                if overview is None:
+                    overview = travel_plan.get("overview", "")
+                    yield "overview", overview
+                    warnings.append("概述未能在流中解析，已从完整响应中提取")
+                for day_plan in split_daily_plans(travel_plan.get("daily_plans"), travel_days)[0]:
+                    if day_plan["day"] not in days:
+                        days[day_plan["day"]] = day_plan
+                        warnings.append(f"第{day_plan['day']}天未能在流中解析，已从完整响应中修复")
+                        yield "day", day_plan
+
+            # 仍然缺失的天单独重新生成
+            broken_days = [day for day in range(1, travel_days + 1) if day not in days]
+            if broken_days:
                 try:
-                    return json.loads(json_str)
-                except json.JSONDecodeError:
-                    logger.debug("从大括号提取的JSON解析失败")
+                    repaired = await self.repair_days(input_data, [days[day] for day in sorted(days)], broken_days)
+                except UpstreamUnavailableError:
+                    raise
+                except Exception as e:
+                    warnings.append(f"第{'、'.join(map(str, broken_days))}天重新生成失败: {str(e)}")
+                else:
+                    for day_plan in repaired:
+                        if day_plan.get("repaired"):
+                            days[day_plan["day"]] = day_plan
+                            warnings.append(f"第{day_plan['day']}天响应损坏，已单独重新生成")
+                            yield "day", day_plan
+
+            daily_plans = [days[day] for day in sorted(days)]
+            yield "complete", {"overview": overview, "daily_plans": daily_plans, "warnings": warnings}
 
-            # 4. 尝试清理和修复常见问题后再解析
-            if json_start != -1 and json_end != -1:
-                json_str = content[json_start:json_end + 1]
+        except Exception as e:
+            logger.error(f"流式调用Kimi API失败: {str(e)}")
+            raise
 
-                # 尝试修复常见JSON语法错误
-                # 替换单引号为双引号（但不替换已转义的引号）
-                fixed_json = re.sub(r"(?<!\\)'", '"', json_str)
+    def _parse_travel_plan(self, content: str, travel_days: int) -> Dict[str, Any]:
+        """
+        解析完整计划并找出损坏或缺失的天
 
-                # 修复错误的转义序列
-                fixed_json = fixed_json.replace('\\"', '"')
-                fixed_json = fixed_json.replace('\\\'', "'")
+        Returns:
+            {"overview", "daily_plans": 有效日计划, "broken_days": 需要重新生成的天}
 
-                # 修复重复的逗号
-                fixed_json = re.sub(r',\s*,', ',', fixed_json)
-                fixed_json = re.sub(r',\s*}', '}', fixed_json)
-                fixed_json = re.sub(r',\s*]', ']', fixed_json)
+        Raises:
+            ValueError: 响应中没有任何可用的日计划
+        """
+        travel_plan = self._parse_llm_response(content)
+        daily_plans, broken_days = split_daily_plans(travel_plan.get("daily_plans"), travel_days)
+        if not daily_plans:
+            raise ValueError("无法解析大模型响应为有效的旅游计划: 没有完整的日计划")
+        overview = travel_plan.get("overview")
+        return {
+            "overview": overview if isinstance(overview, str) else "",
+            "daily_plans": daily_plans,
+            "broken_days": broken_days
+        }
+
+    def _parse_repaired_days(self, content: str, broken_days: List[int]) -> List[Dict[str, Any]]:
+        """解析重新生成的日计划，要求每个损坏的天都完整"""
+        result = self._parse_llm_response(content)
+        daily_plans = result.get("daily_plans")
+        if daily_plans is None and "poi_list" in result:
+            # 只重新生成一天时模型可能直接返回单日计划
+            daily_plans = [result]
+        valid, _ = split_daily_plans(daily_plans, max(broken_days))
+        repaired = [day_plan for day_plan in valid if day_plan["day"] in broken_days]
+        missing = sorted(set(broken_days) - {day_plan["day"] for day_plan in repaired})
+        if missing:
+            raise ValueError(f"重新生成的第{'、'.join(map(str, missing))}天仍不完整")
+        return repaired
 
-                # 修复缺失的逗号
-                fixed_json = re.sub(r'"\s*{', '",{', fixed_json)
-                fixed_json = re.sub(r'}\s*"', '},"', fixed_json)
+    def _parse_llm_response(self, content: str) -> Dict[str, Any]:
+        """解析并处理大模型的响应，能够处理各种可能的格式问题"""
+        return self._parse_llm_response_result(content).value
 
-                # 替换误写的分号为逗号
-                fixed_json = fixed_json.replace(';', ',')
+    def _parse_llm_response_result(self, content: str) -> ParseResult:
+        """
+        解析大模型的响应并报告使用的策略和修复
 
-                logger.debug(f"修复后的JSON: {fixed_json}")
+        先进行标准解析，失败时用单遍容错解析器处理代码块、多余逗号、单引号等问题，
+        仍然失败时才使用正则表达式逐日提取。
+        """
+        try:
+            # 记录原始响应以便调试
+            logger.debug(f"原始响应内容: {content}")
 
+            with stage("parse"):
                 try:
-                    return json.loads(fixed_json)
-                except json.JSONDecodeError as e:
-                    logger.error(f"修复后的JSON仍然解析失败: {str(e)}")
-
-                    # 尝试进一步分析错误位置
-                    error_msg = str(e)
-                    line_match = re.search(r'line (\d+)', error_msg)
-                    col_match = re.search(r'column (\d+)', error_msg)
-
-                    if line_match and col_match:
-                        line = int(line_match.group(1))
-                        col = int(col_match.group(1))
-
-                        # 获取错误行及其上下文
-                        lines = fixed_json.split('\n')
-                        error_line = lines[line - 1] if line <= len(lines) else ""
-                        error_context = f"问题行: {error_line}\n"
-                        error_context += f"位置: {' ' * (col - 1)}^"
-
-                        logger.error(f"JSON错误位置: {error_context}")
-
-            # 5. 如果所有方法都失败，则进行更激进的修复尝试
-            try:
-                # 尝试使用正则表达式提取JSON结构
-                # 此方法风险较高，可能会产生与原意不符的结果
-                overview_match = re.search(r'"overview"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', content)
-                overview = overview_match.group(1) if overview_match else "未能提取旅游计划概述"
-
-                # 提取daily_plans部分
-                daily_plans = []
-                day_matches = re.finditer(r'"day"\s*:\s*(\d+)', content)
-
-                for day_match in day_matches:
-                    day_num = int(day_match.group(1))
-                    desc_match = re.search(fr'"day"\s*:\s*{day_num}[^{{]*"description"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"',
-                                           content)
-                    description = desc_match.group(1) if desc_match else f"第{day_num}天行程"
-
-                    pois = []
-                    poi_matches = re.finditer(fr'"day"\s*:\s*{day_num}[^{{]*"poi_list"\s*:\s*\[(.*?)\]', content,
-                                              re.DOTALL)
-
-                    for poi_match in poi_matches:
-                        poi_block = poi_match.group(1)
-                        for poi_item in re.finditer(r'{(.*?)}', poi_block, re.DOTALL):
-                            poi_content = poi_item.group(1)
-                            name_match = re.search(r'"name"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
-                            name = name_match.group(1) if name_match else "景点"
-
-                            address_match = re.search(r'"address"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
-                            address = address_match.group(1) if address_match else "地址未提供"
-
-                            lat_match = re.search(r'"latitude"\s*:\s*([\d\.]+)', poi_content)
-                            lat = float(lat_match.group(1)) if lat_match else 0.0
-
-                            lng_match = re.search(r'"longitude"\s*:\s*([\d\.]+)', poi_content)
-                            lng = float(lng_match.group(1)) if lng_match else 0.0
-
-                            desc_match = re.search(r'"description"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
-                            desc = desc_match.group(1) if desc_match else "没有描述"
-
-                            dur_match = re.search(r'"recommended_duration"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
-                            duration = dur_match.group(1) if dur_match else "1小时"
-
-                            pois.append({
-                                "name": name,
-                                "address": address,
-                                "latitude": lat,
-                                "longitude": lng,
-                                "description": desc,
-                                "recommended_duration": duration
-                            })
-
-                    daily_plans.append({
-                        "day": day_num,
-                        "description": description,
-                        "poi_list": pois
-                    })
-
-                if not daily_plans:
-                    raise ValueError("无法提取日程计划")
-
-                # 组装最终的旅游计划
-                travel_plan = {
-                    "overview": overview,
-                    "daily_plans": daily_plans
-                }
-
-                logger.warning("使用正则表达式提取了旅游计划，可能不完整或有误")
-                return travel_plan
-
-            except Exception as regex_error:
-                logger.error(f"正则表达式提取失败: {str(regex_error)}")
-
-            # 如果所有方法都失败，抛出异常
-            raise ValueError("无法解析大模型响应为有效的旅游计划")
+                    result = parse_json_response(content)
+                except ValueError as e:
+                    logger.error(f"容错解析失败，尝试正则表达式提取: {str(e)}")
+                    result = self._extract_with_regex(content)
+
+                if not isinstance(result.value, dict):
+                    raise ValueError("响应的顶层不是JSON对象")
+
+            if result.repairs:
+                logger.warning(f"大模型响应经修复后解析成功（{result.strategy}）: {', '.join(result.repairs)}")
+
+            PARSE_STRATEGY.labels(result.strategy).inc()
+            return result
 
         except Exception as e:
+            PARSE_STRATEGY.labels("failed").inc()
             logger.error(f"解析大模型响应失败: {str(e)}")
-            raise ValueError(f"无法解析大模型响应为有效的旅游计划: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"无法解析大模型响应为有效的旅游计划: {str(e)}")
+
+    def _extract_with_regex(self, content: str) -> ParseResult:
+        """
+        最后的兜底：用正则表达式逐日提取计划
+
+        此方法风险较高，可能会产生与原意不符的结果。缺失的字段不填默认值，
+        对应的天会被识别为损坏并单独重新生成。
+        内容按 "day" 出现的位置切分成片段，每个片段只扫描一次，整体为线性复杂度。
+        """
+        overview_match = _OVERVIEW_PATTERN.search(content)
+        overview = overview_match.group(1) if overview_match else ""
+
+        day_matches = list(_DAY_PATTERN.finditer(content))
+        daily_plans = []
+
+        for index, day_match in enumerate(day_matches):
+            day_num = int(day_match.group(1))
+            end = day_matches[index + 1].start() if index + 1 < len(day_matches) else len(content)
+            segment = content[day_match.end():end]
+
+            # 日描述位于POI列表之前或之后，避免误取POI的描述
+            first_brace = segment.find("{")
+            last_brace = segment.rfind("}")
+            desc_match = _DESCRIPTION_PATTERN.search(segment[:first_brace] if first_brace != -1 else segment)
+            if desc_match is None and last_brace != -1:
+                desc_match = _DESCRIPTION_PATTERN.search(segment, last_brace)
+            description = desc_match.group(1) if desc_match else None
+
+            pois = []
+            poi_list_match = _POI_LIST_PATTERN.search(segment)
+            if poi_list_match:
+                for poi_item in _POI_ITEM_PATTERN.finditer(poi_list_match.group(1)):
+                    pois.append(self._extract_poi_with_regex(poi_item.group(1)))
+
+            day_plan = {"day": day_num, "poi_list": pois}
+            if description is not None:
+                day_plan["description"] = description
+            daily_plans.append(day_plan)
+
+        if not daily_plans:
+            raise ValueError("无法提取日程计划")
+
+        logger.warning("使用正则表达式提取了旅游计划，可能不完整或有误")
+        return ParseResult({"overview": overview, "daily_plans": daily_plans}, "regex", ["regex_fallback"])
+
+    @staticmethod
+    def _extract_poi_with_regex(poi_content: str) -> Dict[str, Any]:
+        """
+        用正则表达式提取单个景点的字段
+
+        缺失的字段不填默认值，所在的天会被识别为损坏并单独重新生成。
+        """
+        patterns = {
+            "name": _NAME_PATTERN,
+            "address": _ADDRESS_PATTERN,
+            "latitude": _LATITUDE_PATTERN,
+            "longitude": _LONGITUDE_PATTERN,
+            "description": _DESCRIPTION_PATTERN,
+            "recommended_duration": _DURATION_PATTERN
+        }
+        poi = {}
+        for field, pattern in patterns.items():
+            match = pattern.search(poi_content)
+            if match is None:
+                continue
+            if field in ("latitude", "longitude"):
+                try:
+                    poi[field] = float(match.group(1))
+                except ValueError:
+                    continue
+            else:
+                poi[field] = match.group(1)
+        return poi
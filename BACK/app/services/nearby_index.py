@@ -0,0 +1,250 @@
+from app.services.poi_catalog import load_records, normalize_city
+from app.services.spatial_index import GridIndex
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 索引文件格式版本，格式变化时旧文件会被重建
+INDEX_VERSION = 1
+# 名称和地址在文本块中的分隔符
+_FIELD_SEPARATOR = "\x1f"
+_ARRAYS = ("keys", "lats", "lngs", "categories", "text_offsets")
+
+
+def build_packed_index(source: Path, target: Path, cell_size_m: float) -> None:
+    """
+    从城市景点数据文件构建打包索引目录
+
+    记录按网格单元编号排序后分别保存为 .npy 数组，名称和地址编码为UTF-8文本块，
+    加载时全部使用内存映射，多个进程共享同一份页缓存。
+    目录先写到临时位置再原子替换，并发启动的进程不会读到不完整的索引。
+    """
+    records = load_records(source)
+    lats = np.array([float(record["latitude"]) for record in records], dtype=np.float64)
+    lngs = np.array([float(record["longitude"]) for record in records], dtype=np.float64)
+    origin = (float(lats.mean()), float(lngs.mean())) if len(records) else (0.0, 0.0)
+    grid = GridIndex(lats, lngs, cell_size_m, origin)
+    order = grid.order
+
+    category_names = sorted({record.get("category") or "" for record in records})
+    category_codes = {name: code for code, name in enumerate(category_names)}
+    categories = np.array(
+        [category_codes[records[i].get("category") or ""] for i in order.tolist()], dtype=np.int16
+    )
+
+    texts = [
+        f"{records[i]['name']}{_FIELD_SEPARATOR}{records[i].get('address') or ''}".encode("utf-8")
+        for i in order.tolist()
+    ]
+    text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+
+    stat = source.stat()
+    meta = {
+        "version": INDEX_VERSION,
+        "source_mtime": stat.st_mtime,
+        "source_size": stat.st_size,
+        "cell_size_m": cell_size_m,
+        "origin": origin,
+        "categories": category_names,
+        "count": len(records)
+    }
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{target.name}.", dir=target.parent))
+    try:
+        np.save(staging / "keys.npy", grid.sorted_keys)
+        np.save(staging / "lats.npy", lats[order])
+        np.save(staging / "lngs.npy", lngs[order])
+        np.save(staging / "categories.npy", categories)
+        np.save(staging / "text_offsets.npy", text_offsets)
+        with open(staging / "text.bin", "wb") as f:
+            f.write(b"".join(texts))
+        with open(staging / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        if target.exists():
+            shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.replace(staging, target)
+        except OSError:
+            # 其他进程已经抢先构建好了同一个索引
+            if not _is_fresh(source, target, cell_size_m):
+                raise
+            shutil.rmtree(staging, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _is_fresh(source: Path, target: Path, cell_size_m: float) -> bool:
+    """索引目录是否与数据文件一致"""
+    try:
+        with open(target / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    stat = source.stat()
+    return (
+        meta.get("version") == INDEX_VERSION
+        and meta.get("source_mtime") == stat.st_mtime
+        and meta.get("source_size") == stat.st_size
+        and meta.get("cell_size_m") == cell_size_m
+    )
+
+
+class NearbyIndex:
+    """
+    单个城市的只读附近景点索引
+
+    全部数组以内存映射方式打开，只有查询结果页中的名称和地址会被解码。
+    """
+
+    def __init__(self, city: str, path: Path):
+        self.city = city
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.category_names: List[str] = meta["categories"]
+        self._category_codes = {name: code for code, name in enumerate(self.category_names)}
+
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        self.lats = arrays["lats"]
+        self.lngs = arrays["lngs"]
+        self.categories = arrays["categories"]
+        self._text_offsets = arrays["text_offsets"]
+        self.grid = GridIndex.presorted(
+            self.lats, self.lngs, arrays["keys"], meta["cell_size_m"], tuple(meta["origin"])
+        )
+
+        with open(path / "text.bin", "rb") as f:
+            self._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._text_offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _category_mask(self, point_ids: np.ndarray, category: Optional[str]) -> Optional[np.ndarray]:
+        if not category:
+            return None
+        code = self._category_codes.get(category)
+        if code is None:
+            return np.zeros(len(point_ids), dtype=bool)
+        return self.categories[point_ids] == code
+
+    def query_radius(
+            self,
+            lat: float,
+            lng: float,
+            radius_m: float,
+            category: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        半径查询
+
+        Returns:
+            (按距离升序的景点下标, 对应距离米)
+        """
+        _, point_ids, distances = self.grid.query_radius_batch([lat], [lng], radius_m)
+        mask = self._category_mask(point_ids, category)
+        if mask is not None:
+            point_ids, distances = point_ids[mask], distances[mask]
+        order = np.argsort(distances, kind="stable")
+        return point_ids[order], distances[order]
+
+    def query_knn(
+            self,
+            lat: float,
+            lng: float,
+            k: int,
+            max_radius_m: float,
+            category: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k近邻查询
+
+        从一个网格单元的半径开始逐步扩大搜索范围，直到找到k个满足条件的景点
+        或达到max_radius_m。找到k个时第k个的距离不超过搜索半径，结果是精确的。
+
+        Returns:
+            (按距离升序的最多k个景点下标, 对应距离米)
+        """
+        radius = self.grid.cell_size_m
+        while True:
+            radius = min(radius, max_radius_m)
+            point_ids, distances = self.query_radius(lat, lng, radius, category)
+            if len(point_ids) >= k or radius >= max_radius_m:
+                return point_ids[:k], distances[:k]
+            radius *= 2
+
+    def describe(self, point_ids: np.ndarray, distances: np.ndarray) -> List[Dict[str, Any]]:
+        """把查询结果转换为字典列表"""
+        results = []
+        for i, distance in zip(point_ids.tolist(), distances.tolist()):
+            text = self._text[self._text_offsets[i]:self._text_offsets[i + 1]].decode("utf-8")
+            name, _, address = text.partition(_FIELD_SEPARATOR)
+            results.append({
+                "name": name,
+                "address": address,
+                "latitude": float(self.lats[i]),
+                "longitude": float(self.lngs[i]),
+                "category": self.category_names[self.categories[i]],
+                "distance_m": round(distance, 1)
+            })
+        return results
+
+    def close(self) -> None:
+        if isinstance(self._text, mmap.mmap):
+            self._text.close()
+
+
+class NearbyIndexRegistry:
+    """按城市管理附近景点索引，启动时构建（如有必要）并以内存映射方式加载"""
+
+    SUFFIXES = (".csv", ".db", ".sqlite", ".sqlite3")
+
+    def __init__(self, indexes: Optional[Dict[str, NearbyIndex]] = None):
+        self._indexes = indexes or {}
+
+    @classmethod
+    def load(cls, data_dir: str, index_dir: str, cell_size_m: float = 500.0) -> "NearbyIndexRegistry":
+        """
+        为数据目录中的每个城市文件加载索引
+
+        索引目录中的文件与数据文件不一致（修改时间、大小或网格大小变化）时重新构建。
+        """
+        indexes = {}
+        directory = Path(data_dir)
+        if not directory.is_dir():
+            logger.warning(f"景点数据目录不存在，附近景点查询不可用: {data_dir}")
+            return cls()
+
+        for source in sorted(directory.iterdir()):
+            if source.suffix not in cls.SUFFIXES:
+                continue
+            city = normalize_city(source.stem)
+            target = Path(index_dir) / city
+            try:
+                if not _is_fresh(source, target, cell_size_m):
+                    logger.info(f"构建附近景点索引: {city}")
+                    build_packed_index(source, target, cell_size_m)
+                indexes[city] = NearbyIndex(city, target)
+            except Exception as e:
+                logger.error(f"加载附近景点索引失败 {source}: {str(e)}")
+                continue
+            logger.info(f"已加载附近景点索引: {city}，{len(indexes[city])}个景点")
+
+        return cls(indexes)
+
+    def get(self, city: str) -> Optional[NearbyIndex]:
+        return self._indexes.get(normalize_city(city))
+
+    def close(self) -> None:
+        for index in self._indexes.values():
+            index.close()
@@ -0,0 +1,160 @@
+from app.models.schemas import ScenicSpot
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 坐标保留的小数位数（4位约等于11米）
+COORDINATE_PRECISION = 4
+
+
+def build_plan_key(
+        city: str,
+        center_name: str,
+        scenic_spots: List[ScenicSpot],
+        travel_days: int,
+        travel_mode: str
+) -> str:
+    """
+    根据规范化后的请求参数构建缓存键
+
+    景点按名称和坐标排序，名称去除首尾空白，坐标按固定精度取整，
+    保证同一组输入无论景点顺序如何都得到相同的键。
+    """
+    spots = sorted(
+        (
+            spot.name.strip(),
+            round(spot.latitude, COORDINATE_PRECISION),
+            round(spot.longitude, COORDINATE_PRECISION)
+        )
+        for spot in scenic_spots or []
+    )
+    canonical = [city.strip(), center_name.strip(), travel_days, travel_mode.strip(), spots]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _SQLiteTier:
+    """缓存的磁盘层，保证服务重启后缓存条目仍然可用；使用WAL模式，多个工作进程可共用同一文件"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM plan_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                self._conn.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return row[1], json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PlanCache:
+    """
+    旅游计划精确匹配缓存
+
+    内存层为有界LRU并带TTL；配置了数据库路径时再加一层SQLite磁盘缓存。
+    磁盘读写放在线程池中执行，避免阻塞事件循环。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400, db_path: str = ""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._disk = _SQLiteTier(db_path) if db_path else None
+
+        # 命中率统计
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，未命中或已过期时返回None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._entries[key]
+
+        if self._disk is not None:
+            try:
+                entry = await asyncio.to_thread(self._disk.get, key)
+            except sqlite3.Error as e:
+                logger.error(f"读取磁盘缓存失败: {str(e)}")
+                entry = None
+            if entry is not None:
+                self._remember(key, *entry)
+                self.disk_hits += 1
+                return entry[1]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """写入缓存"""
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.set, key, value, expires_at)
+            except sqlite3.Error as e:
+                logger.error(f"写入磁盘缓存失败: {str(e)}")
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / total if total else 0.0
+        }
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
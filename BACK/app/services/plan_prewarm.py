@@ -0,0 +1,362 @@
+from app.services.plan_cache import build_plan_key
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 预生成计划包的格式版本，格式变化时旧包不再加载
+PACK_VERSION = 1
+_ARRAYS = ("prefixes", "digests", "offsets", "generated_at")
+
+# 热门请求：(城市, 中心位置, 旅行天数, 出行方式)，不带用户所选景点
+PopularRequest = Tuple[str, str, int, str]
+
+
+def request_plan_key(request: PopularRequest) -> str:
+    """热门请求对应的计划缓存键，与不带景点的线上请求一致"""
+    city, center_name, travel_days, travel_mode = request
+    return build_plan_key(city, center_name, [], travel_days, travel_mode)
+
+
+def _split_key(plan_key: str) -> Tuple[int, bytes]:
+    """把十六进制缓存键拆成用于二分查找的前8字节整数和完整摘要"""
+    digest = bytes.fromhex(plan_key)
+    return int.from_bytes(digest[:8], "big"), digest
+
+
+def mine_popular_requests(
+        paths: Iterable[str],
+        top: int,
+        min_count: int = 1
+) -> List[Tuple[PopularRequest, int]]:
+    """
+    从JSON格式的请求日志中统计最常见的计划请求
+
+    读取旅游服务每次生成计划时记录的 plan_request 字段。带用户所选景点的请求
+    缓存键各不相同，不参与预生成；无法解析的行（如文本格式的日志）直接跳过。
+
+    Returns:
+        按出现次数降序的 (请求, 次数) 列表，最多top个
+    """
+    counts: Dict[PopularRequest, int] = {}
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    if '"plan_request"' not in line:
+                        continue
+                    try:
+                        fields = json.loads(line)["plan_request"]
+                        if fields.get("spots"):
+                            continue
+                        request = (
+                            fields["city"].strip(),
+                            fields["center_name"].strip(),
+                            int(fields["travel_days"]),
+                            fields["travel_mode"].strip()
+                        )
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        continue
+                    counts[request] = counts.get(request, 0) + 1
+        except OSError as e:
+            logger.warning(f"读取请求日志失败 {path}: {str(e)}")
+
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [(request, count) for request, count in ranked if count >= min_count][:top]
+
+
+def write_pack(target: Path, entries: List[Dict[str, Any]]) -> None:
+    """
+    写出预生成计划包目录
+
+    每个条目为 {"request", "count", "generated_at", "body"}，body是与计划缓存相同的
+    计划字典序列化后的UTF-8 JSON。缓存键按前8字节排序后与生成时间、正文偏移分别保存为
+    .npy 数组，正文依次拼接为一个文本块，加载时全部使用内存映射。
+
+    每个版本写到同级的隐藏目录中，target是指向当前版本的符号链接，写完后用rename原子地
+    替换该链接：任何时刻target都指向一个完整的包，正在运行的服务在下次检查时切换到新包。
+    旧版本目录随后删除，已映射旧包的进程不受影响。
+    """
+    keyed = sorted(
+        ((_split_key(request_plan_key(entry["request"])), entry) for entry in entries),
+        key=lambda item: item[0]
+    )
+    prefixes = np.array([prefix for (prefix, _), _ in keyed], dtype=np.uint64)
+    digests = np.frombuffer(b"".join(digest for (_, digest), _ in keyed), dtype=np.uint8).reshape(-1, 32)
+    offsets = np.zeros(len(keyed) + 1, dtype=np.int64)
+    np.cumsum([len(entry["body"]) for _, entry in keyed], out=offsets[1:])
+    generated_at = np.array([entry["generated_at"] for _, entry in keyed], dtype=np.float64)
+
+    meta = {
+        "version": PACK_VERSION,
+        "created_at": time.time(),
+        "count": len(keyed),
+        "entries": [
+            {
+                "city": entry["request"][0],
+                "center_name": entry["request"][1],
+                "travel_days": entry["request"][2],
+                "travel_mode": entry["request"][3],
+                "count": entry["count"]
+            }
+            for _, entry in keyed
+        ]
+    }
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{target.name}.", dir=target.parent))
+    link = target.with_name(f"{staging.name}.link")
+    try:
+        np.save(staging / "prefixes.npy", prefixes)
+        np.save(staging / "digests.npy", digests)
+        np.save(staging / "offsets.npy", offsets)
+        np.save(staging / "generated_at.npy", generated_at)
+        with open(staging / "bodies.bin", "wb") as f:
+            f.write(b"".join(entry["body"] for _, entry in keyed))
+        with open(staging / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        if target.is_dir() and not target.is_symlink():
+            # 之前直接写成目录的包：移到版本目录并改为链接，只有这一次切换存在短暂的空档
+            legacy = target.with_name(f".{target.name}.legacy")
+            shutil.rmtree(legacy, ignore_errors=True)
+            os.replace(target, legacy)
+            os.symlink(legacy.name, target)
+
+        retired = target.parent / os.readlink(target) if target.is_symlink() else None
+        os.symlink(staging.name, link)
+        os.replace(link, target)
+    except Exception:
+        if link.is_symlink():
+            link.unlink()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # 已映射旧包的进程仍可读取，文件删除后映射依然有效
+    if retired is not None and retired != staging:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+class _Pack:
+    """一个已加载的预生成计划包"""
+
+    def __init__(self, path: Path):
+        with open(path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != PACK_VERSION:
+            raise ValueError(f"预生成计划包版本不匹配: {self.meta.get('version')}")
+
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        self.prefixes = arrays["prefixes"]
+        self.digests = arrays["digests"]
+        self.offsets = arrays["offsets"]
+        self.generated_at = arrays["generated_at"]
+
+        with open(path / "bodies.bin", "rb") as f:
+            self._bodies = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    def find(self, plan_key: str) -> Optional[int]:
+        prefix, digest = _split_key(plan_key)
+        index = int(np.searchsorted(self.prefixes, np.uint64(prefix)))
+        while index < len(self.prefixes) and int(self.prefixes[index]) == prefix:
+            if self.digests[index].tobytes() == digest:
+                return index
+            index += 1
+        return None
+
+    def body(self, index: int) -> bytes:
+        return self._bodies[self.offsets[index]:self.offsets[index + 1]]
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """全部条目，格式与 write_pack 的输入一致"""
+        return [
+            {
+                "request": (item["city"], item["center_name"], item["travel_days"], item["travel_mode"]),
+                "count": item["count"],
+                "generated_at": float(self.generated_at[index]),
+                "body": self.body(index)
+            }
+            for index, item in enumerate(self.meta["entries"])
+        ]
+
+    def close(self) -> None:
+        if isinstance(self._bodies, mmap.mmap):
+            self._bodies.close()
+
+
+def load_pack_entries(path: str) -> List[Dict[str, Any]]:
+    """读取已有预生成计划包的全部条目，包不存在或无法读取时返回空列表"""
+    try:
+        pack = _Pack(Path(path))
+    except (OSError, ValueError) as e:
+        logger.info(f"没有可用的预生成计划包 {path}: {str(e)}")
+        return []
+    try:
+        return pack.entries()
+    finally:
+        pack.close()
+
+
+class PrewarmedPlans:
+    """
+    预生成的热门旅游计划，只读、以内存映射方式加载
+
+    查询只做一次二分查找并解码一段正文，不调用大模型；生成时间超过max_age的计划不再使用。
+    包目录被 python -m app.prewarm 更新后，由 reload_if_changed 切换到新包；包目录暂时
+    读不到时继续使用已加载的包。
+    """
+
+    def __init__(self, path: str, max_age: float = 7 * 86400):
+        self.path = Path(path)
+        self.max_age = max_age
+        self._pack: Optional[_Pack] = None
+        self._signature: Optional[Tuple[int, int]] = None
+
+        # 查询统计
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.reloads = 0
+
+        self.reload_if_changed()
+
+    def __len__(self) -> int:
+        return len(self._pack) if self._pack is not None else 0
+
+    def _current_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (self.path / "meta.json").stat()
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def reload_if_changed(self) -> bool:
+        """包目录变化时重新加载，返回是否切换了包"""
+        signature = self._current_signature()
+        if signature == self._signature:
+            return False
+        if signature is None:
+            # 包目录被移走：保留上一个可用的包，重新出现后再加载
+            if self._pack is not None:
+                logger.warning(f"预生成计划包不存在，继续使用已加载的包: {self.path}")
+            self._signature = None
+            return False
+
+        try:
+            pack = _Pack(self.path)
+        except Exception as e:
+            logger.error(f"加载预生成计划包失败 {self.path}: {str(e)}")
+            return False
+
+        # 旧包不主动关闭：查询可能正在读取，没有引用后由垃圾回收释放映射
+        self._pack, self._signature = pack, signature
+        self.reloads += 1
+        logger.info(f"已加载预生成计划: {len(pack)}个")
+        return True
+
+    async def watch(self, interval: float) -> None:
+        """定期检查包目录是否被更新"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                logger.error(f"检查预生成计划包失败: {str(e)}")
+
+    def get(self, plan_key: str) -> Optional[Dict[str, Any]]:
+        """查询预生成计划，未命中或已过期时返回None"""
+        pack = self._pack
+        index = pack.find(plan_key) if pack is not None else None
+        if index is None:
+            self.misses += 1
+            return None
+        if time.time() - float(pack.generated_at[index]) > self.max_age:
+            self.stale += 1
+            return None
+        self.hits += 1
+        return json.loads(pack.body(index))
+
+    def stats(self) -> Dict[str, Any]:
+        pack = self._pack
+        return {
+            "entries": len(self),
+            "created_at": pack.meta.get("created_at") if pack is not None else None,
+            "oldest_generated_at": float(pack.generated_at.min()) if pack is not None and len(pack) else None,
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "reloads": self.reloads
+        }
+
+    def close(self) -> None:
+        if self._pack is not None:
+            self._pack.close()
+            self._pack = None
+
+
+async def build_entries(
+        requests: List[Tuple[PopularRequest, int]],
+        existing: List[Dict[str, Any]],
+        generate: Callable[[PopularRequest], Awaitable[bytes]],
+        top: int,
+        refresh_age: float,
+        max_age: float,
+        concurrency: int = 2
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    根据热门请求和已有的包条目生成新包的条目
+
+    热门请求中已有且生成时间未超过refresh_age的计划直接沿用，其余调用generate重新生成，
+    生成失败时保留未超过max_age的旧计划。已不在热门请求中的旧条目在未超过max_age时保留
+    （日志轮转后统计变少也不会立即丢弃），总数不超过top。
+
+    Returns:
+        (条目列表, 沿用/生成/失败/保留/丢弃数量)
+    """
+    now = time.time()
+    previous = {entry["request"]: entry for entry in existing}
+    counts = {"reused": 0, "generated": 0, "failed": 0, "kept": 0, "dropped": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def refresh(request: PopularRequest, count: int) -> Optional[Dict[str, Any]]:
+        old = previous.get(request)
+        if old is not None and now - old["generated_at"] <= refresh_age:
+            counts["reused"] += 1
+            return {**old, "count": count}
+        try:
+            async with semaphore:
+                body = await generate(request)
+        except Exception as e:
+            counts["failed"] += 1
+            logger.error(f"预生成计划失败 {request}: {str(e)}")
+            if old is not None and now - old["generated_at"] <= max_age:
+                return {**old, "count": count}
+            return None
+        counts["generated"] += 1
+        return {"request": request, "count": count, "generated_at": time.time(), "body": body}
+
+    results = await asyncio.gather(*[refresh(request, count) for request, count in requests[:top]])
+    entries = [entry for entry in results if entry is not None]
+
+    mined = {request for request, _ in requests[:top]}
+    for entry in sorted(existing, key=lambda item: -item["count"]):
+        if entry["request"] in mined:
+            continue
+        if len(entries) < top and now - entry["generated_at"] <= max_age:
+            entries.append(entry)
+            counts["kept"] += 1
+        else:
+            counts["dropped"] += 1
+    return entries, counts
@@ -0,0 +1,240 @@
+from app.models.schemas import ScenicSpot
+from app.services.geo import geohash_encode, geohash_neighbors, geohash_precision, haversine
+from app.services.poi_catalog import PoiCatalogRegistry, normalize_city, normalize_name
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 用户所选景点与计划中景点的坐标相距不超过该值（米）时视为同一景点
+SPOT_MATCH_DISTANCE_M = 150.0
+
+
+class CenterAliases:
+    """
+    中心位置别名表
+
+    按城市把同一地点的常见叫法（如"故宫"、"紫禁城"）映射到规范名称，
+    规范名称应与景点目录中的名称一致，才能在本地解析出坐标。
+    """
+
+    def __init__(self, table: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self._aliases: Dict[str, Dict[str, str]] = {}
+        for city, entries in (table or {}).items():
+            mapping = self._aliases.setdefault(normalize_city(city), {})
+            for canonical, aliases in entries.items():
+                for name in [canonical, *aliases]:
+                    mapping[normalize_name(name)] = canonical
+
+    @classmethod
+    def load(cls, path: str) -> "CenterAliases":
+        """从JSON文件加载：{"城市": {"规范名称": ["别名", ...]}}，文件不存在时返回空表"""
+        if not path or not Path(path).is_file():
+            logger.warning(f"中心位置别名表不存在: {path}")
+            return cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                table = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"加载中心位置别名表失败 {path}: {str(e)}")
+            return cls()
+        aliases = cls(table)
+        logger.info(f"已加载中心位置别名表: {sum(len(mapping) for mapping in aliases._aliases.values())}个名称")
+        return aliases
+
+    def canonical(self, city: str, center_name: str) -> str:
+        """返回规范名称，别名表中没有时返回去除首尾空白的原名称"""
+        mapping = self._aliases.get(normalize_city(city), {})
+        return mapping.get(normalize_name(center_name), center_name.strip())
+
+
+class _ReusableEntry:
+    """一个可复用的近期计划"""
+
+    __slots__ = ("bucket", "center_name", "canonical", "point", "spot_names", "poi_names", "poi_points",
+                 "value", "created_at")
+
+    def __init__(
+            self,
+            bucket: Tuple[str, str, int, str],
+            center_name: str,
+            canonical: str,
+            point: Optional[Tuple[float, float]],
+            spot_names: frozenset,
+            value: Dict[str, Any]
+    ):
+        self.bucket = bucket
+        self.center_name = center_name
+        self.canonical = canonical
+        self.point = point
+        self.spot_names = spot_names
+        pois = [poi for plan in value["daily_plans"] for poi in plan["poi_list"]]
+        self.poi_names = {normalize_name(poi["name"]) for poi in pois}
+        self.poi_points = [(poi["latitude"], poi["longitude"]) for poi in pois]
+        self.value = value
+        self.created_at = time.time()
+
+
+class PlanReuseIndex:
+    """
+    近似请求的计划复用
+
+    请求按 (城市, 中心位置坐标的geohash, 天数, 出行方式) 分桶。中心名称先按别名表规范化，
+    再在本地景点目录中解析坐标；查询时检查所在单元及相邻单元，复用radius_m以内、
+    max_age以内、景点兼容的最近一个计划。无法解析坐标的中心只复用规范名称相同的计划。
+
+    景点兼容：所选景点集合（按规范化名称）相同，或所选景点都已包含在该计划中。
+    未选景点的请求只复用同样未选景点的计划。
+    """
+
+    def __init__(
+            self,
+            poi_catalogs: PoiCatalogRegistry,
+            aliases: Optional[CenterAliases] = None,
+            radius_m: float = 500.0,
+            max_age: float = 3600.0,
+            max_entries: int = 2048
+    ):
+        self.poi_catalogs = poi_catalogs
+        self.aliases = aliases or CenterAliases()
+        self.radius_m = radius_m
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.precision = geohash_precision(radius_m)
+        self._buckets: Dict[Tuple[str, str, int, str], List[_ReusableEntry]] = {}
+        self._entries: "OrderedDict[str, _ReusableEntry]" = OrderedDict()
+
+        # 复用统计
+        self.hits = 0
+        self.misses = 0
+
+    def _locate(self, city: str, center_name: str) -> Tuple[str, Optional[Tuple[float, float]]]:
+        """规范化中心名称并在本地解析坐标"""
+        canonical = self.aliases.canonical(city, center_name)
+        catalog = self.poi_catalogs.get(city)
+        point = None
+        if catalog is not None:
+            point = catalog.resolve(canonical) or catalog.resolve(center_name)
+        return canonical, point
+
+    def _bucket(self, city: str, cell: str, travel_days: int, travel_mode: str) -> Tuple[str, str, int, str]:
+        return normalize_city(city), cell, travel_days, travel_mode.strip()
+
+    @staticmethod
+    def _spot_names(scenic_spots: List[ScenicSpot]) -> frozenset:
+        return frozenset(normalize_name(spot.name) for spot in scenic_spots or [])
+
+    @staticmethod
+    def _compatible(scenic_spots: List[ScenicSpot], spot_names: frozenset, entry: _ReusableEntry) -> bool:
+        if spot_names == entry.spot_names:
+            return True
+        if not spot_names:
+            return False
+        # 计划已经包含用户所选的全部景点（名称相同或坐标相近）
+        for spot in scenic_spots:
+            if normalize_name(spot.name) in entry.poi_names:
+                continue
+            if not entry.poi_points:
+                return False
+            lats, lngs = zip(*entry.poi_points)
+            if float(haversine(spot.latitude, spot.longitude, lats, lngs).min()) > SPOT_MATCH_DISTANCE_M:
+                return False
+        return True
+
+    def find(
+            self,
+            city: str,
+            center_name: str,
+            scenic_spots: List[ScenicSpot],
+            travel_days: int,
+            travel_mode: str
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        查找可复用的近期计划
+
+        Returns:
+            (计划字典, 复用信息 {"center_name", "distance_m", "age_seconds"})，没有时返回None
+        """
+        canonical, point = self._locate(city, center_name)
+        spot_names = self._spot_names(scenic_spots)
+        cells = geohash_neighbors(point[0], point[1], self.precision) if point is not None else [""]
+        now = time.time()
+
+        best: Optional[Tuple[float, float, _ReusableEntry]] = None
+        for cell in cells:
+            for entry in self._buckets.get(self._bucket(city, cell, travel_days, travel_mode), ()):
+                age = now - entry.created_at
+                if age > self.max_age:
+                    continue
+                if point is None:
+                    if entry.canonical != canonical:
+                        continue
+                    distance = 0.0
+                else:
+                    distance = float(haversine(point[0], point[1], entry.point[0], entry.point[1]))
+                    if distance > self.radius_m:
+                        continue
+                if not self._compatible(scenic_spots, spot_names, entry):
+                    continue
+                if best is None or (distance, age) < best[:2]:
+                    best = (distance, age, entry)
+
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        distance, age, entry = best
+        return entry.value, {
+            "center_name": entry.center_name,
+            "distance_m": round(distance, 1) if point is not None else None,
+            "age_seconds": round(age, 1)
+        }
+
+    def remember(
+            self,
+            plan_key: str,
+            city: str,
+            center_name: str,
+            scenic_spots: List[ScenicSpot],
+            travel_days: int,
+            travel_mode: str,
+            value: Dict[str, Any]
+    ) -> None:
+        """记录新生成的计划，超过max_entries时淘汰最早的计划"""
+        canonical, point = self._locate(city, center_name)
+        cell = geohash_encode(point[0], point[1], self.precision) if point is not None else ""
+        bucket = self._bucket(city, cell, travel_days, travel_mode)
+
+        self._discard(plan_key)
+        entry = _ReusableEntry(bucket, center_name.strip(), canonical, point, self._spot_names(scenic_spots), value)
+        self._entries[plan_key] = entry
+        self._buckets.setdefault(bucket, []).append(entry)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, plan_key: str) -> None:
+        entry = self._entries.pop(plan_key, None)
+        if entry is None:
+            return
+        bucket = self._buckets[entry.bucket]
+        bucket.remove(entry)
+        if not bucket:
+            del self._buckets[entry.bucket]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "max_entries": self.max_entries,
+            "radius_m": self.radius_m,
+            "max_age": self.max_age,
+            "geohash_precision": self.precision,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
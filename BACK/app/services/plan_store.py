@@ -0,0 +1,236 @@
+from app.core.metrics import PLAN_STORE_DROPPED, PLAN_STORE_PENDING
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_CREATE_TABLE = (
+    "CREATE TABLE IF NOT EXISTS travel_plans ("
+    "plan_id VARCHAR(64) PRIMARY KEY, etag VARCHAR(64) NOT NULL, "
+    "body TEXT NOT NULL, created_at FLOAT NOT NULL)"
+)
+
+
+def compute_etag(body: str) -> str:
+    """根据响应正文计算强ETag"""
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断If-None-Match请求头是否匹配当前ETag（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+class _SQLiteBackend:
+    """默认的SQLite存储，使用WAL模式支持多个进程同时读写"""
+
+    def __init__(self, path: str):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_CREATE_TABLE)
+        self._conn.commit()
+
+    def get(self, plan_id: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, body FROM travel_plans WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_many(self, rows: List[Tuple[str, str, str, float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO travel_plans (plan_id, etag, body, created_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _SQLAlchemyBackend:
+    """其他数据库（PostgreSQL、MySQL等）通过SQLAlchemy访问，需要另行安装sqlalchemy和对应驱动"""
+
+    def __init__(self, url: str):
+        try:
+            import sqlalchemy
+        except ImportError:
+            raise RuntimeError(f"使用数据库 {url.split(':', 1)[0]} 需要安装 sqlalchemy 及对应的数据库驱动")
+
+        self._text = sqlalchemy.text
+        self._engine = sqlalchemy.create_engine(url, pool_pre_ping=True)
+        with self._engine.begin() as conn:
+            conn.execute(self._text(_CREATE_TABLE))
+
+    def get(self, plan_id: str) -> Optional[Tuple[str, str]]:
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                self._text("SELECT etag, body FROM travel_plans WHERE plan_id = :plan_id"),
+                {"plan_id": plan_id}
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_many(self, rows: List[Tuple[str, str, str, float]]) -> None:
+        # plan_id为随机UUID，不会与已有记录冲突，使用普通INSERT兼容各数据库
+        with self._engine.begin() as conn:
+            conn.execute(
+                self._text(
+                    "INSERT INTO travel_plans (plan_id, etag, body, created_at) "
+                    "VALUES (:plan_id, :etag, :body, :created_at)"
+                ),
+                [{"plan_id": r[0], "etag": r[1], "body": r[2], "created_at": r[3]} for r in rows]
+            )
+
+    def close(self) -> None:
+        self._engine.dispose()
+
+
+def _create_backend(database_url: str):
+    """根据DATABASE_URL选择存储后端，sqlite:///相对路径、sqlite:////绝对路径"""
+    if database_url.startswith("sqlite:///"):
+        return _SQLiteBackend(database_url[len("sqlite:///"):] or ":memory:")
+    if database_url == "sqlite://":
+        return _SQLiteBackend(":memory:")
+    return _SQLAlchemyBackend(database_url)
+
+
+class PlanStore:
+    """
+    旅游计划持久化存储
+
+    save() 只把计划放入待写队列并立即返回，后台任务按批量和时间间隔合并写入数据库，
+    写入不在请求路径上。尚未落盘的计划直接从待写队列读取，保证保存后立即可查。
+    数据库持续写入失败时待写队列最多保留max_pending个计划，超出时丢弃最早的计划。
+    """
+
+    def __init__(self, database_url: str, batch_size: int = 50, flush_interval: float = 0.5, max_pending: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._backend = _create_backend(database_url)
+        self._pending: Dict[str, Tuple[str, str, str, float]] = {}
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+        # 写入统计
+        self.saved = 0
+        self.flushed = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        """启动后台写入任务"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+
+    def save(self, plan_id: str, body: str) -> str:
+        """
+        保存计划（异步落盘）
+
+        Args:
+            plan_id: 计划ID
+            body: 序列化后的计划响应JSON
+
+        Returns:
+            计划的ETag
+        """
+        etag = compute_etag(body)
+        if plan_id not in self._pending and len(self._pending) >= self.max_pending:
+            # 字典按插入顺序排列，第一个即最早保存的计划
+            del self._pending[next(iter(self._pending))]
+            if not self.dropped:
+                logger.warning(f"待写入的计划超过{self.max_pending}个，开始丢弃最早的计划")
+            self.dropped += 1
+            PLAN_STORE_DROPPED.inc()
+        self._pending[plan_id] = (plan_id, etag, body, time.time())
+        self.saved += 1
+        PLAN_STORE_PENDING.set(len(self._pending))
+        self._wakeup.set()
+        return etag
+
+    async def get(self, plan_id: str) -> Optional[Tuple[str, str]]:
+        """
+        查询计划
+
+        Returns:
+            (ETag, 计划JSON)，不存在时返回None
+        """
+        pending = self._pending.get(plan_id)
+        if pending is not None:
+            return pending[1], pending[2]
+        return await asyncio.to_thread(self._backend.get, plan_id)
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # 凑满一批或等待一个刷新间隔后再写，合并并发请求产生的写入
+            if len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            if not await self.flush():
+                await asyncio.sleep(self.flush_interval)
+                self._wakeup.set()
+
+    async def flush(self) -> bool:
+        """把待写队列写入数据库，返回是否成功"""
+        if not self._pending:
+            return True
+
+        rows = list(self._pending.values())
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                await asyncio.to_thread(self._backend.put_many, batch)
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"保存旅游计划失败，稍后重试: {str(e)}")
+                return False
+
+            for row in batch:
+                # 写入期间同一计划被再次保存时保留新版本
+                if self._pending.get(row[0]) is row:
+                    del self._pending[row[0]]
+            self.batches += 1
+            self.flushed += len(batch)
+            PLAN_STORE_PENDING.set(len(self._pending))
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "saved": self.saved,
+            "flushed": self.flushed,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "dropped": self.dropped
+        }
+
+    async def close(self) -> None:
+        """停止后台任务并写入剩余的计划"""
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        await self.flush()
+        self._backend.close()
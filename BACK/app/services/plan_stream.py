@@ -0,0 +1,124 @@
+from app.services.json_repair import repair_json
+from typing import Any, List, Optional, Tuple
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PlanStreamExtractor:
+    """
+    从大模型的流式输出中增量提取旅游计划
+
+    逐字符扫描收到的token，跟踪字符串、转义和嵌套层级：
+    顶层的 "overview" 字符串一结束就产出概述，
+    "daily_plans" 数组中的每个对象一闭合就产出该日计划，无需等待整个JSON完成。
+    代码块标记和JSON前的说明文字会被跳过。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.warnings: List[str] = []
+        self.emitted_days = 0
+        self.finished = False
+
+        self._pos = 0
+        self._started = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = True
+        self._key: Optional[str] = None
+        self._in_daily_plans = False
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        输入一段token，返回新完成的事件列表
+
+        事件为 ("overview", 概述字符串) 或 ("day", 日计划字典)
+        """
+        self.buffer += chunk
+        events = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            if self.finished:
+                break
+            c = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._on_string_end(i, events)
+                continue
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append(c)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                depth = len(self._stack)
+                if depth == 1 and c == "[" and self._key == "daily_plans":
+                    self._in_daily_plans = True
+                elif depth == 2 and c == "{" and self._in_daily_plans:
+                    self._element_start = i
+                self._stack.append(c)
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                depth = len(self._stack)
+                if depth == 2 and c == "}" and self._element_start is not None:
+                    self._emit_day(buffer[self._element_start:i + 1], events)
+                    self._element_start = None
+                elif depth == 1 and c == "]" and self._in_daily_plans:
+                    self._in_daily_plans = False
+                elif depth == 0:
+                    self.finished = True
+            elif len(self._stack) == 1:
+                if c == ":":
+                    self._expect_key = False
+                elif c == ",":
+                    self._expect_key = True
+
+        self._pos = len(buffer)
+        return events
+
+    def _on_string_end(self, end: int, events: List[Tuple[str, Any]]) -> None:
+        # 只关心根对象上的键和值
+        if len(self._stack) != 1:
+            return
+        try:
+            value = json.loads(self.buffer[self._string_start:end + 1])
+        except json.JSONDecodeError:
+            return
+
+        if self._expect_key:
+            self._key = value
+        elif self._key == "overview":
+            events.append(("overview", value))
+
+    def _emit_day(self, text: str, events: List[Tuple[str, Any]]) -> None:
+        try:
+            day_plan = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                result = repair_json(text)
+            except ValueError as e:
+                self.warnings.append(f"第{self.emitted_days + 1}个日计划JSON格式错误，已跳过: {str(e)}")
+                logger.debug(f"流式日计划解析失败: {text}")
+                return
+            day_plan = result.value
+            self.warnings.append(f"第{self.emitted_days + 1}个日计划JSON已修复: {', '.join(result.repairs)}")
+        self.emitted_days += 1
+        events.append(("day", day_plan))
@@ -0,0 +1,252 @@
+from app.models.schemas import PointOfInterest
+from app.services.geo import haversine
+from app.services.spatial_index import GridIndex
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import csv
+import logging
+import re
+import sqlite3
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 名称规范化时去掉的字符（空白和常见标点）
+_NAME_NOISE = re.compile(r"[\s·•\-—_()（）【】\[\]「」\"'“”‘’,，.。]+")
+
+
+def normalize_name(name: str) -> str:
+    """规范化景点名称，用于名称匹配"""
+    return _NAME_NOISE.sub("", name or "").lower()
+
+
+def normalize_city(city: str) -> str:
+    """规范化城市名称，例如"北京市"与"北京"视为同一城市"""
+    city = (city or "").strip()
+    return city[:-1] if len(city) > 2 and city.endswith("市") else city
+
+
+def _bigrams(name: str) -> set:
+    if len(name) < 2:
+        return {name} if name else set()
+    return {name[i:i + 2] for i in range(len(name) - 1)}
+
+
+class PoiCatalog:
+    """
+    单个城市的本地景点目录
+
+    包含基于网格的空间索引和基于二元字串倒排表的模糊名称索引，
+    用于校验并修正大模型返回的景点坐标和地址。
+    """
+
+    def __init__(self, city: str, records: List[Dict[str, Any]], cell_size_m: float = 250.0):
+        self.city = city
+        self.names = [record["name"] for record in records]
+        self.addresses = [record.get("address") or "" for record in records]
+        self.categories = [record.get("category") or "" for record in records]
+        self.lats = np.array([float(record["latitude"]) for record in records], dtype=np.float64)
+        self.lngs = np.array([float(record["longitude"]) for record in records], dtype=np.float64)
+        self.index = GridIndex(self.lats, self.lngs, cell_size_m)
+
+        self._normalized = [normalize_name(name) for name in self.names]
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._bigram_index: Dict[str, List[int]] = defaultdict(list)
+        for i, name in enumerate(self._normalized):
+            self._exact[name].append(i)
+            for bigram in _bigrams(name):
+                self._bigram_index[bigram].append(i)
+
+        # 校验统计
+        self.checked = 0
+        self.corrected = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def match_names(self, name: str, min_score: float) -> Dict[int, float]:
+        """
+        模糊匹配名称
+
+        完全匹配得分为1；否则按二元字串的包含度（共同字串数 / 较短名称的字串数）打分。
+
+        Returns:
+            {目录下标: 得分}
+        """
+        normalized = normalize_name(name)
+        if normalized in self._exact:
+            return {i: 1.0 for i in self._exact[normalized]}
+
+        query = _bigrams(normalized)
+        if not query:
+            return {}
+        shared: Dict[int, int] = defaultdict(int)
+        for bigram in query:
+            for i in self._bigram_index.get(bigram, ()):
+                shared[i] += 1
+
+        scores = {}
+        for i, count in shared.items():
+            score = count / min(len(query), len(_bigrams(self._normalized[i])))
+            if score >= min_score:
+                scores[i] = score
+        return scores
+
+    def resolve(self, name: str) -> Optional[Tuple[float, float]]:
+        """按名称查找地点坐标，只接受完全匹配"""
+        matches = self._exact.get(normalize_name(name))
+        if not matches:
+            return None
+        return float(self.lats[matches[0]]), float(self.lngs[matches[0]])
+
+    def snap(
+            self,
+            pois: List[PointOfInterest],
+            search_radius_m: float = 300.0,
+            max_distance_m: float = 5000.0,
+            tolerance_m: float = 30.0,
+            min_score: float = 0.6
+    ) -> int:
+        """
+        批量校验景点并修正到目录中的坐标和地址
+
+        候选来自名称索引和坐标附近的空间查询，所有候选的距离一次性向量化计算。
+        名称相似度最高、其次距离最近的候选胜出；模型给出坐标时，
+        候选必须在max_distance_m内，避免把连锁店等同名地点修正到别处。
+
+        Args:
+            pois: 待校验的景点列表，原地修改
+            search_radius_m: 按坐标查找附近候选的半径
+            max_distance_m: 接受名称匹配的最大偏移距离
+            tolerance_m: 偏移小于该值时视为坐标正确
+            min_score: 名称相似度阈值
+
+        Returns:
+            被修正的景点数量
+        """
+        if not pois or len(self) == 0:
+            return 0
+
+        lats = np.array([poi.latitude for poi in pois], dtype=np.float64)
+        lngs = np.array([poi.longitude for poi in pois], dtype=np.float64)
+        has_coordinates = (lats != 0) & (lngs != 0)
+
+        # 名称候选
+        candidates: Dict[Tuple[int, int], float] = {}
+        for p, poi in enumerate(pois):
+            for i, score in self.match_names(poi.name, min_score).items():
+                candidates[(p, i)] = score
+
+        # 坐标附近的空间候选，名称需要同样满足相似度阈值
+        located = np.flatnonzero(has_coordinates)
+        query_ids, point_ids, _ = self.index.query_radius_batch(lats[located], lngs[located], search_radius_m)
+        for q, i in zip(located[query_ids].tolist(), point_ids.tolist()):
+            if (q, i) not in candidates:
+                score = self._pair_score(pois[q].name, i)
+                if score >= min_score:
+                    candidates[(q, i)] = score
+
+        self.checked += len(pois)
+        if not candidates:
+            return 0
+
+        pairs = np.array(list(candidates.keys()), dtype=np.int64)
+        scores = np.array(list(candidates.values()))
+        distances = haversine(lats[pairs[:, 0]], lngs[pairs[:, 0]], self.lats[pairs[:, 1]], self.lngs[pairs[:, 1]])
+
+        # 有坐标的景点只接受附近的候选；没有坐标的只接受规范化后名称完全相同的候选
+        # （包含关系的得分同样为1，如"公园"会匹配到任意一个公园）
+        names = [normalize_name(poi.name) for poi in pois]
+        exact = np.array([self._normalized[i] == names[p] for p, i in pairs.tolist()], dtype=bool)
+        valid = np.where(has_coordinates[pairs[:, 0]], distances <= max_distance_m, exact)
+        pairs, scores, distances = pairs[valid], scores[valid], distances[valid]
+
+        # 每个景点取名称得分最高、距离最近的候选
+        order = np.lexsort((distances, -scores, pairs[:, 0]))
+        corrected = 0
+        seen = set()
+        for k in order.tolist():
+            p, i = int(pairs[k, 0]), int(pairs[k, 1])
+            if p in seen:
+                continue
+            seen.add(p)
+            if has_coordinates[p] and distances[k] <= tolerance_m:
+                continue
+            poi = pois[p]
+            poi.latitude = float(self.lats[i])
+            poi.longitude = float(self.lngs[i])
+            if self.addresses[i]:
+                poi.address = self.addresses[i]
+            corrected += 1
+
+        self.corrected += corrected
+        return corrected
+
+    def _pair_score(self, name: str, i: int) -> float:
+        query = _bigrams(normalize_name(name))
+        target = _bigrams(self._normalized[i])
+        if not query or not target:
+            return 0.0
+        return len(query & target) / min(len(query), len(target))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pois": len(self), "checked": self.checked, "corrected": self.corrected}
+
+
+def load_records(path: Path) -> List[Dict[str, Any]]:
+    """
+    从CSV或SQLite文件读取景点记录
+
+    CSV需包含 name,address,latitude,longitude 列（category可选）；
+    SQLite需包含同名列的 poi 表。
+    """
+    if path.suffix in (".db", ".sqlite", ".sqlite3"):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(
+                "SELECT name, address, latitude, longitude, category FROM poi"
+            )]
+        finally:
+            conn.close()
+
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        return [row for row in csv.DictReader(f) if row.get("name") and row.get("latitude") and row.get("longitude")]
+
+
+class PoiCatalogRegistry:
+    """按城市管理景点目录，启动时从数据目录加载"""
+
+    SUFFIXES = (".csv", ".db", ".sqlite", ".sqlite3")
+
+    def __init__(self, catalogs: Optional[Dict[str, PoiCatalog]] = None):
+        self._catalogs = catalogs or {}
+
+    @classmethod
+    def load(cls, data_dir: str, cell_size_m: float = 250.0) -> "PoiCatalogRegistry":
+        """加载数据目录中的全部城市文件，文件名即城市名（如 北京.csv）"""
+        catalogs = {}
+        directory = Path(data_dir)
+        if not directory.is_dir():
+            logger.warning(f"景点目录数据不存在: {data_dir}")
+            return cls()
+
+        for path in sorted(directory.iterdir()):
+            if path.suffix not in cls.SUFFIXES:
+                continue
+            city = normalize_city(path.stem)
+            try:
+                catalogs[city] = PoiCatalog(city, load_records(path), cell_size_m)
+            except (OSError, sqlite3.Error, KeyError, ValueError) as e:
+                logger.error(f"加载景点目录失败 {path}: {str(e)}")
+                continue
+            logger.info(f"已加载景点目录: {city}，{len(catalogs[city])}个景点")
+
+        return cls(catalogs)
+
+    def get(self, city: str) -> Optional[PoiCatalog]:
+        return self._catalogs.get(normalize_city(city))
+
+    def stats(self) -> Dict[str, Any]:
+        return {city: catalog.stats() for city, catalog in self._catalogs.items()}
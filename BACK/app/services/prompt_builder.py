@@ -0,0 +1,190 @@
+from app.core.metrics import timed
+from typing import Any, Dict, List
+import json
+import math
+
+# 每条消息的角色标记等固定开销（令牌）
+_MESSAGE_OVERHEAD = 8
+# 输出长度预估：每天的计划（约4个景点）和整体概述
+_OUTPUT_TOKENS_PER_DAY = 700
+_OUTPUT_TOKENS_BASE = 150
+_OUTLINE_TOKENS_PER_DAY = 40
+
+# 返回格式示例，紧凑序列化，避免缩进占用令牌
+_POI_SCHEMA = {
+    "name": "景点名称",
+    "address": "景点地址",
+    "latitude": 39.123456,
+    "longitude": 116.123456,
+    "description": "景点描述",
+    "recommended_duration": "2小时"
+}
+_DAY_SCHEMA = {"day": 1, "description": "当天概述", "poi_list": [_POI_SCHEMA]}
+_PLAN_SCHEMA = {"overview": "旅游计划概述", "daily_plans": [_DAY_SCHEMA]}
+_OUTLINE_SCHEMA = {"overview": "旅游计划概述", "days": [{"day": 1, "theme": "当天的主题和游览区域"}]}
+_REPAIR_SCHEMA = {"daily_plans": [_DAY_SCHEMA]}
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+# 系统提示词全部由常量拼成，逐字节稳定，同类请求共享前缀，便于服务端的上下文缓存命中；
+# 随请求变化的内容只出现在用户消息中
+_ROLE = (
+    "你是专业的旅游规划助手，为用户合理规划具体的旅游方案。\n"
+    "只返回一个JSON对象，不加```标记、解释或任何其他文字；JSON语法必须准确，坐标尽量准确。\n"
+    "景点表每行格式为：名称|地址|纬度,经度。\n"
+)
+SYSTEM_PROMPTS = {
+    "plan": _ROLE + (
+        "规划要求：以中心位置为基础规划每天的行程；结合出行方式规划合理的游览路线；"
+        "每天2-4个景点，考虑景点间的距离和游览时间；用户已选景点必须融入行程，已分配到某天的必须安排在那一天。\n"
+        "返回格式：" + _compact_json(_PLAN_SCHEMA)
+    ),
+    "outline": _ROLE + (
+        "任务：为行程规划整体概述和每天的主题。\n"
+        "返回格式：" + _compact_json(_OUTLINE_SCHEMA)
+    ),
+    "day": _ROLE + (
+        "任务：为多日行程中的某一天生成详细计划；安排2-4个景点，考虑景点间的距离和游览时间；"
+        "必须包含当天的用户景点，不要重复其他天的景点。\n"
+        "返回格式：" + _compact_json(_DAY_SCHEMA)
+    ),
+    "repair": _ROLE + (
+        "任务：行程中部分天的计划损坏或缺失，只重新生成指定的天；每天2-4个景点，考虑景点间的距离和游览时间；"
+        "必须包含分配到这些天的用户景点，不要重复其他天已安排的景点。\n"
+        "返回格式：" + _compact_json(_REPAIR_SCHEMA)
+    )
+}
+
+
+def count_tokens(text: str) -> int:
+    """
+    本地估算文本的令牌数
+
+    偏保守的上界估计：中文等非ASCII字符按每字一个令牌，ASCII字符（字母、数字、标点）按每3个一个令牌。
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (len(text) - ascii_chars) + math.ceil(ascii_chars / 3)
+
+
+class Prompt:
+    """构建好的提示词及令牌预估"""
+
+    def __init__(self, kind: str, user: str, output_tokens: int):
+        self.kind = kind  # plan / outline / day / repair
+        self.system = SYSTEM_PROMPTS[kind]
+        self.user = user
+        self.input_tokens = count_tokens(self.system) + count_tokens(user) + 2 * _MESSAGE_OVERHEAD
+        self.output_tokens = output_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user}
+        ]
+
+
+def _cell(text: str) -> str:
+    """表格单元格内容：竖线替换为全角竖线，换行替换为空格，避免打乱分隔"""
+    return text.replace("|", "｜").replace("\r", " ").replace("\n", " ")
+
+
+def _spot_row(spot: Dict[str, Any]) -> str:
+    return f"{_cell(spot['name'])}|{_cell(spot.get('address') or '')}|{spot['latitude']},{spot['longitude']}"
+
+
+def _trip_lines(input_data: Dict[str, Any], *keys: str) -> List[str]:
+    labels = {
+        "city": ("城市", ""),
+        "center_name": ("中心位置", ""),
+        "travel_days": ("旅行天数", "天"),
+        "travel_mode": ("出行方式", "")
+    }
+    return [f"{labels[key][0]}:{input_data[key]}{labels[key][1]}" for key in keys]
+
+
+@timed("prompt")
+def build_travel_prompt(input_data: Dict[str, Any]) -> Prompt:
+    """一次性生成完整计划的提示词"""
+    lines = _trip_lines(input_data, "city", "center_name", "travel_days", "travel_mode")
+
+    if input_data.get("day_assignments") and input_data.get("scenic_spots"):
+        # 景点已在本地按地理位置分好天，模型只需按分配安排
+        lines.append("用户已选景点（已按地理位置分配到每天）:")
+        for day, spots in enumerate(input_data["day_assignments"], 1):
+            if spots:
+                lines.append(f"第{day}天")
+                lines.extend(_spot_row(spot) for spot in spots)
+    elif input_data.get("scenic_spots"):
+        lines.append("用户已选景点:")
+        lines.extend(_spot_row(spot) for spot in input_data["scenic_spots"])
+
+    output_tokens = _OUTPUT_TOKENS_BASE + _OUTPUT_TOKENS_PER_DAY * int(input_data["travel_days"])
+    return Prompt("plan", "\n".join(lines), output_tokens)
+
+
+@timed("prompt")
+def build_outline_prompt(input_data: Dict[str, Any], day_spots: List[List[Dict[str, Any]]]) -> Prompt:
+    """行程大纲（概述和每日主题）的提示词"""
+    lines = _trip_lines(input_data, "city", "center_name", "travel_days", "travel_mode")
+    lines.append("每天已分配的用户景点:")
+    for day, spots in enumerate(day_spots, 1):
+        names = "、".join(spot["name"] for spot in spots) if spots else "无指定景点"
+        lines.append(f"第{day}天:{names}")
+
+    output_tokens = _OUTPUT_TOKENS_BASE + _OUTLINE_TOKENS_PER_DAY * len(day_spots)
+    return Prompt("outline", "\n".join(lines), output_tokens)
+
+
+@timed("prompt")
+def build_day_prompt(
+        input_data: Dict[str, Any],
+        day: int,
+        theme: str,
+        spots: List[Dict[str, Any]],
+        other_days: List[Dict[str, Any]]
+) -> Prompt:
+    """单日计划的提示词"""
+    lines = [f"第{day}天（共{input_data['travel_days']}天）"]
+    lines.extend(_trip_lines(input_data, "city", "center_name", "travel_mode"))
+    lines.append(f"当天主题:{theme or '自行安排'}")
+    if spots:
+        lines.append("当天必须包含的用户景点:")
+        lines.extend(_spot_row(spot) for spot in spots)
+    other_text = "；".join(f"第{item['day']}天:{item['theme']}" for item in other_days) or "无"
+    lines.append(f"其他天的安排:{other_text}")
+
+    return Prompt("day", "\n".join(lines), _OUTPUT_TOKENS_PER_DAY)
+
+
+@timed("prompt")
+def build_repair_prompt(
+        input_data: Dict[str, Any],
+        valid_days: List[Dict[str, Any]],
+        broken_days: List[int]
+) -> Prompt:
+    """只重新生成损坏或缺失的天，已有的天只提供概述和景点名称作为上下文"""
+    lines = _trip_lines(input_data, "city", "center_name", "travel_days", "travel_mode")
+    lines.append("需要重新生成:" + "、".join(f"第{day}天" for day in broken_days))
+
+    assignments = input_data.get("day_assignments") or []
+    for day in broken_days:
+        spots = assignments[day - 1] if day <= len(assignments) else []
+        if spots:
+            lines.append(f"第{day}天必须包含的用户景点:")
+            lines.extend(_spot_row(spot) for spot in spots)
+
+    if valid_days:
+        lines.append("其他天已安排:")
+        for day_plan in valid_days:
+            names = "、".join(_cell(poi["name"]) for poi in day_plan["poi_list"])
+            lines.append(f"第{day_plan['day']}天:{_cell(day_plan['description'])}|{names}")
+
+    return Prompt("repair", "\n".join(lines), _OUTPUT_TOKENS_PER_DAY * len(broken_days))
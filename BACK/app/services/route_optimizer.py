@@ -0,0 +1,186 @@
+from app.models.schemas import DailyPlan, PointOfInterest
+from app.services.geo import distance_matrix
+from typing import List, Optional, Tuple
+import logging
+import math
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TravelModeProfile:
+    """出行方式对应的路程估算参数"""
+
+    def __init__(self, speed_kmh: float, detour_factor: float, leg_overhead_minutes: float,
+                 comfortable_leg_km: float = math.inf, long_leg_penalty_per_km: float = 0.0):
+        self.speed_kmh = speed_kmh
+        self.detour_factor = detour_factor  # 实际路程相对直线距离的放大系数
+        self.leg_overhead_minutes = leg_overhead_minutes  # 每段行程的固定耗时（候车、停车等）
+        self.comfortable_leg_km = comfortable_leg_km  # 超过该直线距离的单段行程额外惩罚
+        self.long_leg_penalty_per_km = long_leg_penalty_per_km
+
+    def travel_minutes(self, distance_km: float) -> float:
+        """估算一段行程的耗时（分钟）"""
+        return self.leg_overhead_minutes + distance_km * self.detour_factor / self.speed_kmh * 60
+
+    def leg_cost(self, distance_km: float) -> float:
+        """路线优化使用的单段代价：耗时加上过长单段的惩罚"""
+        cost = distance_km * self.detour_factor / self.speed_kmh * 60
+        if distance_km > self.comfortable_leg_km:
+            cost += (distance_km - self.comfortable_leg_km) * self.long_leg_penalty_per_km
+        return cost
+
+
+WALKING = TravelModeProfile(speed_kmh=4.5, detour_factor=1.3, leg_overhead_minutes=0,
+                            comfortable_leg_km=2.0, long_leg_penalty_per_km=30)
+TRANSIT = TravelModeProfile(speed_kmh=20, detour_factor=1.4, leg_overhead_minutes=10)
+DRIVING = TravelModeProfile(speed_kmh=30, detour_factor=1.3, leg_overhead_minutes=5)
+CYCLING = TravelModeProfile(speed_kmh=12, detour_factor=1.3, leg_overhead_minutes=2,
+                            comfortable_leg_km=6.0, long_leg_penalty_per_km=10)
+
+# 出行方式关键字到参数的映射，按顺序匹配
+_MODE_KEYWORDS: List[Tuple[Tuple[str, ...], TravelModeProfile]] = [
+    (("步行", "徒步", "walk"), WALKING),
+    (("骑行", "自行车", "单车", "cycl", "bike"), CYCLING),
+    (("驾", "开车", "打车", "出租", "taxi", "driv", "car"), DRIVING),
+    (("公交", "地铁", "公共交通", "transit", "bus", "subway", "metro"), TRANSIT),
+]
+
+
+def get_travel_mode_profile(travel_mode: str) -> TravelModeProfile:
+    """根据出行方式文本获取估算参数，无法识别时按公共交通处理"""
+    mode = (travel_mode or "").strip().lower()
+    for keywords, profile in _MODE_KEYWORDS:
+        if any(keyword in mode for keyword in keywords):
+            return profile
+    return TRANSIT
+
+
+def optimize_plan(
+        daily_plans: List[DailyPlan],
+        travel_mode: str,
+        center: Optional[Tuple[float, float]] = None
+) -> List[DailyPlan]:
+    """
+    在本地重新排列每天的景点顺序，并补充每段行程的距离和耗时
+
+    每天的路线从中心位置出发并回到中心位置附近：先用最近邻构造初始路线，
+    再用2-opt和Or-opt改进。整份计划只计算一次距离矩阵，各天共用。
+    坐标缺失（为0）的景点保持原有相对顺序排在最后。
+
+    Args:
+        daily_plans: 日计划列表，原地修改
+        travel_mode: 出行方式
+        center: 中心位置坐标 (纬度, 经度)，为空时使用全部景点的几何中心
+
+    Returns:
+        修改后的日计划列表
+    """
+    profile = get_travel_mode_profile(travel_mode)
+    located = [[poi for poi in plan.poi_list if _has_coordinates(poi)] for plan in daily_plans]
+    all_pois = [poi for pois in located for poi in pois]
+    if not all_pois:
+        return daily_plans
+
+    if center is None:
+        center = (
+            sum(poi.latitude for poi in all_pois) / len(all_pois),
+            sum(poi.longitude for poi in all_pois) / len(all_pois)
+        )
+
+    # 索引0为中心位置，其余依次为各天的景点
+    lats = np.array([center[0]] + [poi.latitude for poi in all_pois])
+    lngs = np.array([center[1]] + [poi.longitude for poi in all_pois])
+    distances_km = (distance_matrix(lats, lngs) / 1000).tolist()
+
+    offset = 1
+    for plan, pois in zip(daily_plans, located):
+        nodes = [0] + list(range(offset, offset + len(pois)))
+        offset += len(pois)
+        if not pois:
+            continue
+
+        # 当天的子矩阵及代价矩阵
+        day_distances = [[distances_km[a][b] for b in nodes] for a in nodes]
+        costs = [[profile.leg_cost(d) for d in row] for row in day_distances]
+        tour = _improve_tour(_nearest_neighbour_tour(costs), costs)
+
+        ordered = [pois[i - 1] for i in tour[1:]]
+        previous = 0
+        total_km = 0.0
+        for i, poi in zip(tour[1:], ordered):
+            leg_km = day_distances[previous][i]
+            poi.leg_distance_km = round(leg_km, 2)
+            poi.leg_travel_minutes = round(profile.travel_minutes(leg_km))
+            total_km += leg_km
+            previous = i
+        total_km += day_distances[previous][0]
+
+        unlocated = [poi for poi in plan.poi_list if not _has_coordinates(poi)]
+        plan.poi_list = ordered + unlocated
+        plan.total_distance_km = round(total_km, 2)
+
+    return daily_plans
+
+
+def _has_coordinates(poi: PointOfInterest) -> bool:
+    return bool(poi.latitude) and bool(poi.longitude)
+
+
+def _tour_cost(tour: List[int], costs: List[List[float]]) -> float:
+    return sum(costs[tour[i]][tour[(i + 1) % len(tour)]] for i in range(len(tour)))
+
+
+def _nearest_neighbour_tour(costs: List[List[float]]) -> List[int]:
+    """从中心位置（节点0）出发的最近邻路线"""
+    tour = [0]
+    remaining = set(range(1, len(costs)))
+    while remaining:
+        last = tour[-1]
+        nearest = min(remaining, key=lambda node: (costs[last][node], node))
+        tour.append(nearest)
+        remaining.remove(nearest)
+    return tour
+
+
+def _improve_tour(tour: List[int], costs: List[List[float]]) -> List[int]:
+    """
+    交替执行2-opt和Or-opt直到没有改进，节点0固定在起点
+
+    代价矩阵对称，每个候选只计算被替换的几条边的代价差，不重新计算整条路线的代价。
+    """
+    n = len(tour)
+    improved = True
+    while improved:
+        improved = False
+
+        # 2-opt：反转 tour[i..j]，边 (a, b)、(c, d) 换成 (a, c)、(b, d)
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b, c, d = tour[i - 1], tour[i], tour[j], tour[(j + 1) % n]
+                if costs[a][c] + costs[b][d] - costs[a][b] - costs[c][d] < -1e-9:
+                    tour = tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+                    improved = True
+
+        # Or-opt：把长度1-3的片段移动到其他位置，代价差为移出片段的差加上插入位置的差
+        for length in (1, 2, 3):
+            for i in range(1, n - length + 1):
+                segment = tour[i:i + length]
+                rest = tour[:i] + tour[i + length:]
+                first, last = segment[0], segment[-1]
+                before, after = tour[i - 1], tour[(i + length) % n]
+                removal = costs[before][after] - costs[before][first] - costs[last][after]
+                for j in range(1, len(rest) + 1):
+                    if j == i:
+                        continue
+                    p, q = rest[j - 1], rest[j % len(rest)]
+                    if removal + costs[p][first] + costs[last][q] - costs[p][q] < -1e-9:
+                        tour = rest[:j] + segment + rest[j:]
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+
+    return tour
@@ -0,0 +1,237 @@
+from app.models.schemas import DailyPlan, PointOfInterest
+from app.services.geo import EARTH_RADIUS_M
+from app.services.route_optimizer import TravelModeProfile, get_travel_mode_profile
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import math
+import re
+
+# 中文数字（建议游览时长中常见的写法）
+_CHINESE_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CHINESE_NUMBER = re.compile(r"[零一二两三四五六七八九十]+")
+_CHINESE_HALF = re.compile(r"([零一二两三四五六七八九十\d]+)个?半")
+_HALF = re.compile(r"(?<![\d.])半")
+_RANGE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-|~|～|—|至|到)\s*(\d+(?:\.\d+)?)")
+_COMPONENT = re.compile(r"(\d+(?:\.\d+)?)\s*(小时|钟头|hours?|hrs?|h|分钟|分|minutes?|mins?|m|天|days?)")
+# 单位对应的分钟数，一天按8小时游览计
+_UNIT_MINUTES = {
+    "小时": 60, "钟头": 60, "hour": 60, "hours": 60, "hr": 60, "hrs": 60, "h": 60,
+    "分钟": 1, "分": 1, "minute": 1, "minutes": 1, "min": 1, "mins": 1, "m": 1,
+    "天": 480, "day": 480, "days": 480
+}
+
+
+def _chinese_to_number(text: str) -> int:
+    """把一百以内的中文数字转换为整数，如"四十五"转换为45"""
+    if "十" not in text:
+        return int("".join(str(_CHINESE_DIGITS[char]) for char in text))
+    tens, _, ones = text.partition("十")
+    return (_CHINESE_DIGITS.get(tens, 1) if tens else 1) * 10 + (_CHINESE_DIGITS.get(ones, 0) if ones else 0)
+
+
+@lru_cache(maxsize=1024)
+def parse_duration_minutes(text: Optional[str]) -> Optional[int]:
+    """
+    把建议游览时长解析为分钟数
+
+    支持"2小时"、"1.5小时"、"90分钟"、"1小时30分钟"、"一个半小时"、"半天"、"全天"、"1-2小时"（取中间值）、
+    "2h"、"45 min"等写法，无法解析时返回None。
+    """
+    if not text:
+        return None
+    value = text.strip().lower().replace("个", "").replace("左右", "").replace("约", "")
+    value = value.replace("全天", "1天").replace("整天", "1天")
+    value = _CHINESE_HALF.sub(
+        lambda m: str((int(m.group(1)) if m.group(1).isdigit() else _chinese_to_number(m.group(1))) + 0.5), value
+    )
+    value = _CHINESE_NUMBER.sub(lambda m: str(_chinese_to_number(m.group(0))), value)
+    value = _HALF.sub("0.5", value)
+    value = _RANGE.sub(lambda m: str((float(m.group(1)) + float(m.group(2))) / 2), value)
+
+    total = sum(float(number) * _UNIT_MINUTES[unit] for number, unit in _COMPONENT.findall(value))
+    return round(total) if total > 0 else None
+
+
+@lru_cache(maxsize=16)
+def parse_clock(text: str) -> int:
+    """把"09:00"形式的时刻转换为当天的分钟数"""
+    hours, _, minutes = text.strip().partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def format_clock(minutes: float) -> str:
+    """把当天的分钟数格式化为"HH:MM"，超过24点时按次日的时刻显示"""
+    hours, minutes = divmod(int(round(minutes)), 60)
+    return f"{hours % 24:02d}:{minutes:02d}"
+
+
+def local_today(utc_offset_hours: float) -> date:
+    """指定时区的当天日期"""
+    return datetime.now(timezone(timedelta(hours=utc_offset_hours))).date()
+
+
+def plan_date(start_date: date, day: int) -> date:
+    """第day天的日期"""
+    return start_date + timedelta(days=day - 1)
+
+
+def assign_dates(daily_plans: List[DailyPlan], start_date: date) -> List[DailyPlan]:
+    """返回填入日期的日计划副本（浅拷贝，景点列表共享）"""
+    return [plan.model_copy(update={"date": plan_date(start_date, plan.day)}) for plan in daily_plans]
+
+
+def _located(poi: PointOfInterest) -> bool:
+    return bool(poi.latitude) and bool(poi.longitude)
+
+
+def _distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """两点间的球面距离（公里），逐段计算时比NumPy版本开销小"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0))) / 1000
+
+
+class _DayScheduler:
+    """按出行方式和游览时段计算一天的时间线，游览时长和每段行程按景点对象缓存"""
+
+    def __init__(
+            self,
+            profile: TravelModeProfile,
+            center: Optional[Tuple[float, float]],
+            day_start: int,
+            day_end: int,
+            default_minutes: int
+    ):
+        self.profile = profile
+        self.center = center
+        self.day_start = day_start
+        self.day_end = day_end
+        self.default_minutes = default_minutes
+        self._durations: Dict[int, int] = {}
+        self._legs: Dict[Tuple[int, int], Tuple[Optional[float], float]] = {}
+
+    def duration(self, poi: PointOfInterest) -> int:
+        minutes = self._durations.get(id(poi))
+        if minutes is None:
+            minutes = self._durations[id(poi)] = parse_duration_minutes(poi.recommended_duration) or self.default_minutes
+        return minutes
+
+    def leg(self, previous: Optional[PointOfInterest], poi: PointOfInterest) -> Tuple[Optional[float], float]:
+        """上一站（为None时为中心位置）到poi的 (直线距离公里, 耗时分钟)；坐标缺失时只计固定耗时"""
+        key = (id(previous), id(poi))
+        cached = self._legs.get(key)
+        if cached is not None:
+            return cached
+        if previous is None:
+            origin = self.center
+        else:
+            origin = (previous.latitude, previous.longitude) if _located(previous) else None
+        if origin is None or not _located(poi):
+            cached = (None, self.profile.leg_overhead_minutes)
+        else:
+            distance_km = _distance_km(origin[0], origin[1], poi.latitude, poi.longitude)
+            cached = (distance_km, self.profile.travel_minutes(distance_km))
+        self._legs[key] = cached
+        return cached
+
+    def finish(self, pois: List[PointOfInterest]) -> float:
+        """按顺序游览完pois的时刻（分钟）"""
+        clock = self.day_start
+        previous = None
+        for poi in pois:
+            clock += self.leg(previous, poi)[1] + self.duration(poi)
+            previous = poi
+        return clock
+
+    def best_insertion(self, pois: List[PointOfInterest], poi: PointOfInterest) -> Tuple[float, int]:
+        """把poi插入pois后最早的结束时刻及插入位置"""
+        return min((self.finish(pois[:i] + [poi] + pois[i:]), i) for i in range(len(pois) + 1))
+
+    def apply(self, plan: DailyPlan) -> None:
+        """写入每个景点的开始、结束时间和每段行程，并更新当天的总距离（含返回中心位置）"""
+        clock = self.day_start
+        previous = None
+        total_km = 0.0
+        for poi in plan.poi_list:
+            distance_km, minutes = self.leg(previous, poi)
+            poi.leg_distance_km = round(distance_km, 2) if distance_km is not None else None
+            poi.leg_travel_minutes = round(minutes)
+            total_km += distance_km or 0.0
+            clock += minutes
+            poi.start_time = format_clock(clock)
+            clock += self.duration(poi)
+            poi.end_time = format_clock(clock)
+            previous = poi
+        if previous is not None and self.center is not None and _located(previous):
+            total_km += _distance_km(previous.latitude, previous.longitude, self.center[0], self.center[1])
+        if plan.poi_list:
+            plan.total_distance_km = round(total_km, 2)
+
+
+def schedule_plan(
+        daily_plans: List[DailyPlan],
+        travel_mode: str,
+        center: Optional[Tuple[float, float]] = None,
+        day_start: str = "09:00",
+        day_end: str = "18:00",
+        default_minutes: int = 90
+) -> List[str]:
+    """
+    在本地为每天排出时间线
+
+    建议游览时长解析为分钟数（无法解析时使用default_minutes），每段行程按出行方式由坐标估算，
+    从day_start开始依次排定每个景点的开始和结束时间。某天在day_end前游览不完时，
+    把当天路线末尾的景点移到插入后结束最早、且仍能在day_end前完成的其他天，
+    插入位置取使该天结束最早的位置；没有这样的天时保留在原来的天并给出提示。
+
+    Args:
+        daily_plans: 日计划列表，原地修改
+        travel_mode: 出行方式
+        center: 中心位置坐标 (纬度, 经度)，为空时使用全部景点的几何中心
+        day_start: 每天的开始时刻，"HH:MM"
+        day_end: 每天的结束时刻，"HH:MM"
+        default_minutes: 默认的游览时长（分钟）
+
+    Returns:
+        提示信息列表（移动的景点和超出时段的天）
+    """
+    if center is None:
+        located = [poi for plan in daily_plans for poi in plan.poi_list if _located(poi)]
+        if located:
+            center = (
+                sum(poi.latitude for poi in located) / len(located),
+                sum(poi.longitude for poi in located) / len(located)
+            )
+    scheduler = _DayScheduler(
+        get_travel_mode_profile(travel_mode), center, parse_clock(day_start), parse_clock(day_end), default_minutes
+    )
+
+    warnings = []
+    moved: Dict[int, List[str]] = {}
+    for plan in daily_plans:
+        while len(plan.poi_list) > 1 and scheduler.finish(plan.poi_list) > scheduler.day_end:
+            poi = plan.poi_list[-1]
+            candidates = []
+            for other in daily_plans:
+                # 插入后至少增加该景点的游览时长，已放不下时不再逐个位置计算
+                if other is plan or scheduler.finish(other.poi_list) + scheduler.duration(poi) > scheduler.day_end:
+                    continue
+                finish, position = scheduler.best_insertion(other.poi_list, poi)
+                if finish <= scheduler.day_end:
+                    candidates.append((finish, other.day, position, other))
+            if not candidates:
+                break
+            _, _, position, target = min(candidates, key=lambda candidate: candidate[:3])
+            plan.poi_list.pop()
+            target.poi_list.insert(position, poi)
+            moved.setdefault(plan.day, []).append(f"「{poi.name}」移到第{target.day}天")
+
+    for plan in daily_plans:
+        scheduler.apply(plan)
+        if plan.day in moved:
+            warnings.append(f"第{plan.day}天行程超出游览时段，已将{'、'.join(moved[plan.day])}")
+        overflow = scheduler.finish(plan.poi_list) - scheduler.day_end
+        if overflow > 0:
+            warnings.append(f"第{plan.day}天行程预计超出游览时段{round(overflow)}分钟")
+    return warnings
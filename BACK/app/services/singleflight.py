@@ -0,0 +1,71 @@
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    合并相同键的并发调用
+
+    同一时刻相同键只会真正执行一次，其余调用方等待同一个共享任务。
+    共享任务独立于任何调用方运行：发起者断开连接（协程被取消）时，
+    任务不会被取消，其他等待者仍能拿到结果；任务抛出的异常会原样传递给所有等待者。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        执行或加入一次调用
+
+        Args:
+            key: 调用的规范化键
+            fn: 真正执行调用的协程工厂，仅在没有进行中的同键调用时被调用
+
+        Returns:
+            (结果, 是否加入了已有调用)
+        """
+        task = self._inflight.get(key)
+        joined = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.debug(f"合并进行中的相同请求: {key}")
+
+        # shield保证调用方被取消时不会取消共享任务
+        return await asyncio.shield(task), joined
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待者都已离开时，取走异常以免出现"异常未被获取"的警告
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"共享调用失败: {key}: {task.exception()}")
+
+    async def drain(self, timeout: float) -> int:
+        """等待进行中的共享调用结束，返回超时后仍未结束的数量"""
+        tasks = list(self._inflight.values())
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        return len(pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回合并统计"""
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
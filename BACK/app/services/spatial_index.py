@@ -0,0 +1,127 @@
+from app.services.geo import EARTH_RADIUS_M, haversine
+from typing import Optional, Tuple
+import math
+import numpy as np
+
+# 网格坐标偏移量，保证单元格编号为非负数
+_CELL_OFFSET = 1 << 20
+
+
+class GridIndex:
+    """
+    基于排序网格单元的空间索引（类似geohash分桶）
+
+    点按所在网格单元的编号排序后紧凑地存放在数组中，
+    查询时计算目标周围的单元格编号，用二分查找定位每个单元格的点区间，
+    一次批量查询的全部计算都是向量化的。
+    """
+
+    def __init__(
+            self,
+            lats: np.ndarray,
+            lngs: np.ndarray,
+            cell_size_m: float = 250.0,
+            origin: Optional[Tuple[float, float]] = None
+    ):
+        self.cell_size_m = cell_size_m
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        if origin is None:
+            origin = (float(self.lats.mean()), float(self.lngs.mean())) if len(self.lats) else (0.0, 0.0)
+        self.origin_lat, self.origin_lng = origin
+        self._cos_origin = math.cos(math.radians(self.origin_lat))
+
+        keys = self.cell_keys(self.lats, self.lngs)
+        self.order: Optional[np.ndarray] = np.argsort(keys, kind="stable").astype(np.int64)
+        self.sorted_keys = keys[self.order]
+
+    @classmethod
+    def presorted(
+            cls,
+            lats: np.ndarray,
+            lngs: np.ndarray,
+            sorted_keys: np.ndarray,
+            cell_size_m: float,
+            origin: Tuple[float, float]
+    ) -> "GridIndex":
+        """
+        使用已按单元格编号排序的数组创建索引，不复制数据
+
+        用于加载预先构建的索引文件，数组可以是内存映射的只读数组。
+        """
+        index = cls.__new__(cls)
+        index.cell_size_m = cell_size_m
+        index.lats = lats
+        index.lngs = lngs
+        index.origin_lat, index.origin_lng = origin
+        index._cos_origin = math.cos(math.radians(index.origin_lat))
+        index.order = None
+        index.sorted_keys = sorted_keys
+        return index
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _cells(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        x = np.radians(lngs - self.origin_lng) * self._cos_origin * EARTH_RADIUS_M
+        y = np.radians(lats - self.origin_lat) * EARTH_RADIUS_M
+        return (
+            np.floor(x / self.cell_size_m).astype(np.int64) + _CELL_OFFSET,
+            np.floor(y / self.cell_size_m).astype(np.int64) + _CELL_OFFSET
+        )
+
+    @staticmethod
+    def _combine(cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        return (cx << 21) | cy
+
+    def cell_keys(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """计算各点所在网格单元的编号"""
+        return self._combine(*self._cells(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64)))
+
+    def query_radius_batch(
+            self,
+            lats: np.ndarray,
+            lngs: np.ndarray,
+            radius_m: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        批量半径查询
+
+        Args:
+            lats: 查询点纬度数组
+            lngs: 查询点经度数组
+            radius_m: 查询半径（米）
+
+        Returns:
+            (查询点下标, 命中点下标, 距离米) 三个等长数组
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lngs = np.atleast_1d(np.asarray(lngs, dtype=np.float64))
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+        if len(self) == 0 or len(lats) == 0:
+            return empty
+
+        # 覆盖查询圆的全部网格单元
+        span = int(math.ceil(radius_m / self.cell_size_m))
+        offsets = np.arange(-span, span + 1, dtype=np.int64)
+        cx, cy = self._cells(lats, lngs)
+        keys = self._combine(
+            (cx[:, None, None] + offsets[None, :, None]),
+            (cy[:, None, None] + offsets[None, None, :])
+        ).reshape(len(lats), -1)
+
+        starts = np.searchsorted(self.sorted_keys, keys, side="left").ravel()
+        ends = np.searchsorted(self.sorted_keys, keys, side="right").ravel()
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return empty
+
+        # 把各单元格的区间展开为 (查询点, 候选点) 对
+        query_ids = np.repeat(np.repeat(np.arange(len(lats)), keys.shape[1]), lengths)
+        positions = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        point_ids = positions if self.order is None else self.order[positions]
+
+        distances = haversine(lats[query_ids], lngs[query_ids], self.lats[point_ids], self.lngs[point_ids])
+        within = distances <= radius_m
+        return query_ids[within], point_ids[within], distances[within]
@@ -1,6 +1,19 @@
 from app.services.llm_service import LLMService
-from app.models.schemas import ScenicSpot, DailyPlan, PointOfInterest
-from typing import List, Dict, Any
+from app.services.plan_cache import PlanCache, build_plan_key
+from app.services.plan_prewarm import PrewarmedPlans
+from app.services.plan_reuse import PlanReuseIndex
+from app.services.singleflight import SingleFlight
+from app.services.day_planner import assign_spots_to_days
+from app.services.route_optimizer import optimize_plan
+from app.services.scheduler import assign_dates, local_today, plan_date, schedule_plan
+from app.services.poi_catalog import PoiCatalogRegistry
+from app.services.llm_governor import UpstreamUnavailableError
+from app.core.config import settings
+from app.core.metrics import PLAN_GENERATIONS_IN_FLIGHT, stage
+from app.models.schemas import ScenicSpot, DailyPlan
+from pydantic import ValidationError
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+import asyncio
 import logging
 from datetime import date, timedelta
 
@@ -10,16 +23,52 @@ logger = logging.getLogger(__name__)
 class TravelPlan:
     """旅游计划数据类"""
 
-    def __init__(self, daily_plans: List[DailyPlan], overview: str):
+    def __init__(self, daily_plans: List[DailyPlan], overview: str, cache_status: str = "MISS"):
         self.daily_plans = daily_plans
         self.overview = overview
+        self.cache_status = cache_status  # PREWARMED / HIT / REUSED / MISS / COALESCED，用于响应头
+        self.reuse: Optional[Dict[str, Any]] = None  # 复用相近请求的计划时，被复用计划的中心位置、距离和生成时长
+        self.warnings: List[str] = []  # 解析和修复过程中产生的提示
+        self.repaired = False  # 含有修复过的内容，不写入缓存，也不供相近请求复用
+        self.corrected_pois = 0  # 按本地景点目录修正的景点数
+
+    def to_cache_value(self) -> Dict[str, Any]:
+        """转换为可缓存的字典（含日程提示），日期随请求的出发日期变化，不写入缓存"""
+        return {
+            "overview": self.overview,
+            "daily_plans": [plan.model_dump(mode="json", exclude={"date"}) for plan in self.daily_plans],
+            "warnings": list(self.warnings)
+        }
+
+    @classmethod
+    def from_cache_value(cls, value: Dict[str, Any], cache_status: str = "HIT") -> "TravelPlan":
+        """从缓存字典恢复旅游计划，旧缓存和预生成计划中没有提示时为空"""
+        travel_plan = cls(
+            daily_plans=[DailyPlan.model_validate(plan) for plan in value["daily_plans"]],
+            overview=value["overview"],
+            cache_status=cache_status
+        )
+        travel_plan.warnings = list(value.get("warnings", []))
+        return travel_plan
 
 
 class TravelService:
     """旅游计划生成服务"""
 
-    def __init__(self):
-        self.llm_service = LLMService()
+    def __init__(
+            self,
+            llm_service: Optional[LLMService] = None,
+            plan_cache: Optional[PlanCache] = None,
+            poi_catalogs: Optional[PoiCatalogRegistry] = None,
+            prewarmed_plans: Optional[PrewarmedPlans] = None,
+            plan_reuse: Optional[PlanReuseIndex] = None
+    ):
+        self.llm_service = llm_service or LLMService()
+        self.plan_cache = plan_cache
+        self.poi_catalogs = poi_catalogs or PoiCatalogRegistry()
+        self.prewarmed_plans = prewarmed_plans
+        self.plan_reuse = plan_reuse
+        self.single_flight = SingleFlight()
 
     async def generate_plan(
             self,
@@ -27,7 +76,9 @@ class TravelService:
             center_name: str,
             scenic_spots: List[ScenicSpot],
             travel_days: int,
-            travel_mode: str
+            travel_mode: str,
+            generation_mode: Optional[str] = None,
+            start_date: Optional[date] = None
     ) -> TravelPlan:
         """
         生成旅游计划
@@ -38,57 +89,356 @@ class TravelService:
             scenic_spots: 用户选择的景点列表
             travel_days: 旅行天数
             travel_mode: 出行方式
+            generation_mode: "single" 或 "parallel"，为空时根据天数阈值决定
+            start_date: 第1天的日期，为空时为当天
 
         Returns:
             生成的旅游计划
         """
         try:
+            self._log_request(city, center_name, scenic_spots, travel_days, travel_mode)
+            plan_key = build_plan_key(city, center_name, scenic_spots, travel_days, travel_mode)
+
+            # 先查询预生成计划和缓存，再查找相近请求的近期计划，命中时直接返回
+            cached = await self._cached_plan(plan_key)
+            if cached is None:
+                cached = self._reused_plan(city, center_name, scenic_spots, travel_days, travel_mode)
+            if cached is not None:
+                logger.info(f"旅游计划缓存命中({cached.cache_status}): {city} {center_name} {travel_days}天")
+                return self._with_dates(cached, start_date)
+
             # 准备输入数据
-            input_data = {
-                "city": city,
-                "center_name": center_name,
-                "scenic_spots": [spot.model_dump() for spot in scenic_spots] if scenic_spots else [],  # 使用model_dump()替代dict()
-                "travel_days": travel_days,
-                "travel_mode": travel_mode
-            }
-
-            # 调用大模型服务
-            llm_result = await self.llm_service.generate_travel_plan(input_data)
-
-            # 转换大模型输出为应用数据格式
-            daily_plans = []
-
-            for day_plan in llm_result["daily_plans"]:
-                # 转换POI列表
-                poi_list = []
-                for poi in day_plan["poi_list"]:
-                    poi_obj = PointOfInterest(
-                        name=poi["name"],
-                        address=poi["address"],
-                        latitude=poi["latitude"],
-                        longitude=poi["longitude"],
-                        description=poi["description"],
-                        recommended_duration=poi.get("recommended_duration")
-                    )
-                    poi_list.append(poi_obj)
-
-                # 创建日计划对象 - 不再设置date字段值
-                daily_plan = DailyPlan(
-                    day=day_plan["day"],
-                    poi_list=poi_list,
-                    description=day_plan["description"]
-                    # 不再设置date字段，让它保持默认的None值
+            input_data = self._build_input_data(city, center_name, scenic_spots, travel_days, travel_mode)
+
+            parallel = generation_mode == "parallel" or (
+                generation_mode is None
+                and 0 < settings.PLAN_PARALLEL_DAYS_THRESHOLD <= travel_days
+            )
+
+            # 相同输入的并发请求共享同一次大模型调用
+            shared_plan, joined = await self.single_flight.do(
+                plan_key, lambda: self._generate_and_cache(plan_key, input_data, parallel)
+            )
+
+            if not joined and self.plan_reuse is not None and not shared_plan.repaired:
+                self.plan_reuse.remember(
+                    plan_key, city, center_name, scenic_spots, travel_days, travel_mode,
+                    shared_plan.to_cache_value()
                 )
-                daily_plans.append(daily_plan)
 
-            # 创建旅游计划
+            # 每个调用方拿到独立的计划对象，日计划复制后再填入各自的日期
             travel_plan = TravelPlan(
-                daily_plans=daily_plans,
-                overview=llm_result["overview"]
+                daily_plans=list(shared_plan.daily_plans),
+                overview=shared_plan.overview,
+                cache_status="COALESCED" if joined else "MISS"
             )
-
-            return travel_plan
+            travel_plan.warnings = list(shared_plan.warnings)
+            return self._with_dates(travel_plan, start_date)
 
         except Exception as e:
             logger.error(f"生成旅游计划失败: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    async def _generate_and_cache(self, plan_key: str, input_data: Dict[str, Any], parallel: bool = False) -> TravelPlan:
+        """调用大模型生成计划并写入缓存，作为并发合并的共享任务执行"""
+        # 调用大模型服务
+        PLAN_GENERATIONS_IN_FLIGHT.inc()
+        try:
+            if parallel:
+                llm_result = await self._generate_days_in_parallel(input_data)
+            else:
+                llm_result = await self.llm_service.generate_travel_plan(input_data)
+        finally:
+            PLAN_GENERATIONS_IN_FLIGHT.dec()
+
+        # 转换大模型输出为应用数据格式
+        with stage("convert"):
+            daily_plans = [self._to_daily_plan(day_plan) for day_plan in llm_result["daily_plans"]]
+
+        # 按本地景点目录修正坐标，再优化每天的游览顺序
+        corrected = self._snap_pois(input_data["city"], daily_plans)
+        repaired_days = [plan.day for plan in daily_plans if plan.repaired]
+        if settings.ROUTE_OPTIMIZATION_ENABLED:
+            with stage("route"):
+                optimize_plan(daily_plans, input_data["travel_mode"], self._plan_center(input_data))
+
+        # 排出每个景点的时刻，游览不完的景点移到较空闲的天
+        schedule_notes = self._schedule(daily_plans, input_data)
+
+        # 创建旅游计划
+        travel_plan = TravelPlan(
+            daily_plans=daily_plans,
+            overview=llm_result["overview"]
+        )
+        travel_plan.corrected_pois = corrected
+        if repaired_days:
+            travel_plan.repaired = True
+            travel_plan.warnings.append(f"第{'、'.join(map(str, repaired_days))}天响应损坏，已单独重新生成")
+        travel_plan.warnings.extend(schedule_notes)
+
+        # 与流式生成相同，完整且无修复的计划才写入缓存
+        if self.plan_cache is not None and not travel_plan.repaired:
+            await self.plan_cache.set(plan_key, travel_plan.to_cache_value())
+
+        return travel_plan
+
+    async def _generate_days_in_parallel(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按天并行生成计划
+
+        先在本地把用户景点分配到每天，再用一次短调用生成概述和每日主题，
+        然后每天单独发起一次大模型调用（并发数受限），失败的某一天单独重试。
+        """
+        day_spots = input_data["day_assignments"]
+        outline = await self.llm_service.generate_day_outline(input_data, day_spots)
+        semaphore = asyncio.Semaphore(settings.PLAN_PARALLEL_MAX_CONCURRENCY)
+
+        async def generate_day(day: int, theme: str) -> Dict[str, Any]:
+            other_days = [item for item in outline["days"] if item["day"] != day]
+            async with semaphore:
+                for attempt in range(settings.PLAN_DAY_MAX_RETRIES + 1):
+                    try:
+                        day_plan = await self.llm_service.generate_day_plan(
+                            input_data, day, theme, day_spots[day - 1], other_days
+                        )
+                        # 提前校验，字段不完整时也只重试这一天
+                        self._to_daily_plan(day_plan)
+                        return day_plan
+                    except UpstreamUnavailableError:
+                        # 上游不可用时governor已经重试过，不再按天重试
+                        raise
+                    except Exception as e:
+                        if attempt == settings.PLAN_DAY_MAX_RETRIES:
+                            raise
+                        logger.warning(f"第{day}天计划生成失败，第{attempt + 1}次重试: {str(e)}")
+
+        daily_plans = await asyncio.gather(*[
+            generate_day(item["day"], item["theme"]) for item in outline["days"]
+        ])
+
+        return {"overview": outline["overview"], "daily_plans": list(daily_plans)}
+
+    async def stream_plan(
+            self,
+            city: str,
+            center_name: str,
+            scenic_spots: List[ScenicSpot],
+            travel_days: int,
+            travel_mode: str,
+            start_date: Optional[date] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式生成旅游计划
+
+        每天在下发前单独排出时刻，已下发的天不再调整，超出游览时段时在完成时给出提示。
+
+        Yields:
+            ("overview", 概述)、("day", DailyPlan)，最后产出 ("complete", TravelPlan)
+        """
+        self._log_request(city, center_name, scenic_spots, travel_days, travel_mode)
+        plan_key = build_plan_key(city, center_name, scenic_spots, travel_days, travel_mode)
+        start_date = start_date or local_today(settings.SCHEDULE_UTC_OFFSET_HOURS)
+
+        travel_plan = await self._cached_plan(plan_key)
+        if travel_plan is None:
+            travel_plan = self._reused_plan(city, center_name, scenic_spots, travel_days, travel_mode)
+        if travel_plan is not None:
+            yield "overview", travel_plan.overview
+            for daily_plan in travel_plan.daily_plans:
+                daily_plan.date = plan_date(start_date, daily_plan.day)
+                yield "day", daily_plan
+            yield "complete", travel_plan
+            return
+
+        input_data = self._build_input_data(city, center_name, scenic_spots, travel_days, travel_mode)
+        daily_plans = []
+        warnings = []
+        schedule_notes = []
+        corrected = 0
+
+        async for event, value in self.llm_service.stream_travel_plan(input_data):
+            if event == "overview":
+                yield event, value
+            elif event == "day":
+                try:
+                    with stage("convert"):
+                        daily_plan = self._to_daily_plan(value)
+                except (KeyError, TypeError, ValidationError) as e:
+                    warnings.append(f"日计划字段不完整，已跳过: {str(e)}")
+                    continue
+                corrected += self._snap_pois(city, [daily_plan])
+                if settings.ROUTE_OPTIMIZATION_ENABLED:
+                    with stage("route"):
+                        optimize_plan([daily_plan], travel_mode, self._plan_center(input_data))
+                schedule_notes.extend(self._schedule([daily_plan], input_data))
+                daily_plan.date = plan_date(start_date, daily_plan.day)
+                daily_plans.append(daily_plan)
+                yield event, daily_plan
+            else:
+                # 单独重新生成的天在最后下发，完整计划按天排序
+                daily_plans.sort(key=lambda plan: plan.day)
+                travel_plan = TravelPlan(daily_plans=daily_plans, overview=value["overview"])
+                travel_plan.warnings = value["warnings"] + warnings
+                travel_plan.corrected_pois = corrected
+
+                # 完整且无修复的计划才写入缓存；日程提示不影响计划的完整性，不参与判断，随计划一起缓存
+                travel_plan.repaired = bool(travel_plan.warnings)
+                travel_plan.warnings.extend(schedule_notes)
+                if not travel_plan.repaired and (self.plan_cache is not None or self.plan_reuse is not None):
+                    value = travel_plan.to_cache_value()
+                    if self.plan_cache is not None:
+                        await self.plan_cache.set(plan_key, value)
+                    if self.plan_reuse is not None:
+                        self.plan_reuse.remember(
+                            plan_key, city, center_name, scenic_spots, travel_days, travel_mode, value
+                        )
+
+                yield "complete", travel_plan
+
+    def _schedule(self, daily_plans: List[DailyPlan], input_data: Dict[str, Any]) -> List[str]:
+        """按配置的游览时段排出每个景点的时刻，返回日程提示"""
+        if not settings.SCHEDULE_ENABLED:
+            return []
+        with stage("schedule"):
+            notes = schedule_plan(
+                daily_plans,
+                input_data["travel_mode"],
+                self._plan_center(input_data),
+                day_start=settings.SCHEDULE_DAY_START,
+                day_end=settings.SCHEDULE_DAY_END,
+                default_minutes=settings.SCHEDULE_DEFAULT_DURATION_MINUTES
+            )
+        if notes:
+            logger.info(f"日程安排: {'；'.join(notes)}")
+        return notes
+
+    @staticmethod
+    def _with_dates(travel_plan: TravelPlan, start_date: Optional[date]) -> TravelPlan:
+        """为日计划填入日期，日计划为副本，不修改缓存和并发合并中共享的对象"""
+        travel_plan.daily_plans = assign_dates(
+            travel_plan.daily_plans, start_date or local_today(settings.SCHEDULE_UTC_OFFSET_HOURS)
+        )
+        return travel_plan
+
+    async def _cached_plan(self, plan_key: str) -> Optional[TravelPlan]:
+        """依次查询预生成计划和计划缓存，都未命中时返回None"""
+        if self.prewarmed_plans is not None:
+            value = self.prewarmed_plans.get(plan_key)
+            if value is not None:
+                return TravelPlan.from_cache_value(value, cache_status="PREWARMED")
+
+        if self.plan_cache is not None:
+            cached = await self.plan_cache.get(plan_key)
+            if cached is not None:
+                return TravelPlan.from_cache_value(cached)
+        return None
+
+    def _reused_plan(
+            self,
+            city: str,
+            center_name: str,
+            scenic_spots: List[ScenicSpot],
+            travel_days: int,
+            travel_mode: str
+    ) -> Optional[TravelPlan]:
+        """查找中心位置相近、天数和出行方式相同且景点兼容的近期计划"""
+        if self.plan_reuse is None:
+            return None
+        found = self.plan_reuse.find(city, center_name, scenic_spots, travel_days, travel_mode)
+        if found is None:
+            return None
+        value, reuse = found
+        travel_plan = TravelPlan.from_cache_value(value, cache_status="REUSED")
+        travel_plan.reuse = reuse
+        return travel_plan
+
+    @staticmethod
+    def _log_request(
+            city: str,
+            center_name: str,
+            scenic_spots: List[ScenicSpot],
+            travel_days: int,
+            travel_mode: str
+    ) -> None:
+        """记录请求参数，JSON格式日志中的 plan_request 字段供 python -m app.prewarm 统计热门请求"""
+        logger.info(
+            f"旅游计划请求: {city} {center_name} {travel_days}天 {travel_mode}",
+            extra={"plan_request": {
+                "city": city,
+                "center_name": center_name,
+                "travel_days": travel_days,
+                "travel_mode": travel_mode,
+                "spots": len(scenic_spots or [])
+            }}
+        )
+
+    def _build_input_data(
+            self,
+            city: str,
+            center_name: str,
+            scenic_spots: List[ScenicSpot],
+            travel_days: int,
+            travel_mode: str
+    ) -> Dict[str, Any]:
+        """构建传给大模型服务的输入数据"""
+        spots = [spot.model_dump() for spot in scenic_spots] if scenic_spots else []  # 使用model_dump()替代dict()
+
+        # 景点目录中能找到中心位置时使用其坐标
+        catalog = self.poi_catalogs.get(city)
+        center = catalog.resolve(center_name) if catalog is not None else None
+
+        return {
+            "city": city,
+            "center_name": center_name,
+            "center": center,
+            "scenic_spots": spots,
+            # 在本地按地理位置把景点分配到每天，作为固定的日程分组交给模型
+            "day_assignments": assign_spots_to_days(spots, travel_days, center),
+            "travel_days": travel_days,
+            "travel_mode": travel_mode
+        }
+
+    def _snap_pois(self, city: str, daily_plans: List[DailyPlan]) -> int:
+        """按城市的本地景点目录批量校验并修正景点坐标，返回修正数量"""
+        catalog = self.poi_catalogs.get(city)
+        if catalog is None or not settings.POI_SNAP_ENABLED:
+            return 0
+
+        pois = [poi for plan in daily_plans for poi in plan.poi_list]
+        with stage("snap"):
+            corrected = catalog.snap(
+                pois,
+                max_distance_m=settings.POI_SNAP_MAX_DISTANCE,
+                tolerance_m=settings.POI_SNAP_TOLERANCE
+            )
+        if corrected:
+            logger.info(f"按景点目录修正了{corrected}/{len(pois)}个景点坐标: {city}")
+        return corrected
+
+    @staticmethod
+    def _plan_center(input_data: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        """计划的中心坐标：优先使用中心位置的坐标，否则使用用户所选景点的几何中心，都没有时返回None"""
+        if input_data.get("center") is not None:
+            return input_data["center"]
+        spots = input_data["scenic_spots"]
+        if not spots:
+            return None
+        return (
+            sum(spot["latitude"] for spot in spots) / len(spots),
+            sum(spot["longitude"] for spot in spots) / len(spots)
+        )
+
+    @staticmethod
+    def _to_daily_plan(day_plan: Dict[str, Any]) -> DailyPlan:
+        """
+        将大模型输出的单日计划转换为DailyPlan
+
+        整个字典（含景点列表）一次交给pydantic校验，之后构建响应时不再重复校验。
+        只取模型应输出的字段，date等由本服务计算的字段保持默认值。
+        """
+        return DailyPlan.model_validate({
+            "day": day_plan["day"],
+            "poi_list": day_plan["poi_list"],
+            "description": day_plan["description"],
+            "repaired": day_plan.get("repaired", False)
+        })
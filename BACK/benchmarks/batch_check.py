@@ -0,0 +1,131 @@
+"""
+批量生成接口验证：去重、有限并发、逐条流式输出、单项失败不影响批次
+
+在本地端口上以uvicorn运行应用（流式响应需要真实的HTTP服务才能逐行到达），
+大模型替换为确定性的本地桩服务。批次包含重复条目、参数无效的条目和一个生成时抛错的条目。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.batch_check [--unique 16] [--duplicates 8] [--ttft 0.3]
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+
+import httpx
+import uvicorn
+
+from app.core.config import settings
+from benchmarks.fake_moonshot import FakeMoonshot, FakeMoonshotConfig
+
+ENDPOINT = "/api/travel/generate-plans:batch"
+HEADERS = {"signature": "bench", "timestamp": "0", "nonce": "bench"}
+FAILING_CITY = "故障城"
+
+
+def batch_items(unique: int, duplicates: int) -> List[Dict[str, Any]]:
+    items = [
+        {"city": "北京", "centerName": f"天安门#{i}", "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "2"}}
+        for i in range(unique)
+    ]
+    items += [dict(items[i % unique]) for i in range(duplicates)]
+    items.append({"city": "北京", "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "2"}})
+    items.append({"city": "北京", "centerName": "前门", "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "两天"}})
+    items.append({"city": FAILING_CITY, "centerName": "中心", "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "1"}})
+    return items
+
+
+async def run(args: argparse.Namespace) -> bool:
+    from app.main import app
+    from app.services.llm_service import LLMService
+
+    settings.PLAN_STORE_ENABLED = False
+    settings.PLAN_CACHE_ENABLED = False
+    upstream = FakeMoonshot(FakeMoonshotConfig(ttft=args.ttft))
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="error"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    travel_service = app.state.travel_service
+    await travel_service.llm_service.aclose()
+    travel_service.llm_service = LLMService(client=upstream.client())
+    generate_plan = travel_service.generate_plan
+
+    async def generate_or_fail(**kwargs):
+        if kwargs["city"] == FAILING_CITY:
+            raise RuntimeError("模拟的生成失败")
+        return await generate_plan(**kwargs)
+
+    travel_service.generate_plan = generate_or_fail
+
+    items = batch_items(args.unique, args.duplicates)
+    lines, arrivals = [], []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as client:
+        too_many = await client.post(ENDPOINT, json={"items": [items[0]] * (settings.BATCH_MAX_ITEMS + 1)}, headers=HEADERS)
+        started = time.perf_counter()
+        async with client.stream("POST", ENDPOINT, json={"items": items}, headers=HEADERS) as response:
+            content_type = response.headers["content-type"]
+            async for line in response.aiter_lines():
+                if line:
+                    lines.append(json.loads(line))
+                    arrivals.append(time.perf_counter() - started)
+
+    server.should_exit = True
+    await serving
+
+    results = [line for line in lines if line["type"] == "result"]
+    summary = lines[-1]
+    plans = [line for line in results if line["status"] == "ok"]
+    errors = {line["index"]: line["error"] for line in results if line["status"] == "error"}
+    rounds = math.ceil(args.unique / settings.BATCH_MAX_CONCURRENCY)
+    plan_arrivals = [arrival for line, arrival in zip(lines, arrivals) if line.get("status") == "ok"]
+
+    print(f"[批次] {len(items)}条（{args.unique}条不同、{args.duplicates}条重复、3条失败），{content_type}，超限时状态码 {too_many.status_code}")
+    print(f"[输出] 第一个计划 {plan_arrivals[0]:.2f}s 后到达，最后一个 {plan_arrivals[-1]:.2f}s，"
+          f"理论最短 {rounds * args.ttft:.2f}s（并发{settings.BATCH_MAX_CONCURRENCY}，{rounds}轮）")
+    print(f"[上游] 调用{upstream.stats()['calls']}，最大并发{upstream.stats()['peak_concurrency']}")
+    print(f"[错误] {errors}")
+    print(f"[汇总] {summary}")
+
+    ok = True
+    checks = [
+        (too_many.status_code == 413, "超过 BATCH_MAX_ITEMS 时应返回413"),
+        (content_type.startswith("application/x-ndjson"), "响应类型应为NDJSON"),
+        (sorted(line["index"] for line in results) == list(range(len(items))), "每个条目应恰好输出一行"),
+        ([line["completed"] for line in results] == list(range(1, len(items) + 1)), "进度应逐行递增"),
+        (len(plans) == args.unique + args.duplicates and len(errors) == 3, "应有3个失败条目，其余成功"),
+        (upstream.stats()["calls"].get("plan", 0) == args.unique, "重复条目不应再次调用上游"),
+        (upstream.stats()["peak_concurrency"] <= settings.BATCH_MAX_CONCURRENCY, "上游并发不应超过批次并发上限"),
+        (plan_arrivals[0] < plan_arrivals[-1] - args.ttft / 2, "计划应在完成时逐个输出"),
+        (summary["type"] == "summary" and summary["unique"] == args.unique + 1 and summary["failed"] == 3, "汇总行不正确"),
+        (all(len({p["plan"]["plan_id"] for p in plans if p["plan"]["center_name"] == name}) == 1
+             for name in {p["plan"]["center_name"] for p in plans}), "重复条目应共用同一个计划"),
+    ]
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="批量生成接口验证")
+    parser.add_argument("--unique", type=int, default=16)
+    parser.add_argument("--duplicates", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=18766)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    ok = asyncio.run(run(args))
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
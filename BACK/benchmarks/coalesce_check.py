@@ -0,0 +1,170 @@
+"""
+并发合并验证：相同的进行中计划生成只调用一次大模型
+
+在应用中（旅游服务替换为不带缓存、连接本地慢速桩服务的实例）并发发起一批相同请求，
+检查只有一次大模型调用、一个响应为 MISS 其余为 COALESCED 且计划相同；不同请求各自生成；
+完成后再发起相同请求会重新生成。另外直接检查 SingleFlight：发起者被取消时其他等待者仍拿到
+结果，共享调用失败时异常传给全部等待者且下一次调用重新执行。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.coalesce_check [--requests 20] [--delay 0.2]
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.main import app
+from app.services.llm_service import LLMService
+from app.services.singleflight import SingleFlight
+from app.services.travel_service import TravelService
+from benchmarks.concurrency_check import STUB_PLAN
+
+ENDPOINT = "/api/travel/generate-plan"
+
+
+class CountingUpstream:
+    """固定延迟返回计划的桩服务，记录调用次数"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    def build(self) -> FastAPI:
+        stub = FastAPI()
+
+        @stub.post("/v1/chat/completions")
+        async def chat_completions(body: dict):
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            return {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": json.dumps(STUB_PLAN, ensure_ascii=False)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }
+
+        return stub
+
+
+def body(center_name: str) -> Dict[str, Any]:
+    return {
+        "city": "北京",
+        "centerName": center_name,
+        "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "1"}
+    }
+
+
+async def check_api(requests: int, delay: float) -> List[tuple]:
+    settings.DEBUG = True  # 跳过微信签名校验
+    upstream = CountingUpstream(delay)
+    llm_service = LLMService(client=AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(upstream.build()))
+    ))
+
+    # 在应用生命周期内运行，只替换旅游服务（不带缓存，每次未合并的请求都调用大模型）
+    async with app.router.lifespan_context(app):
+        travel_service = TravelService(llm_service)
+        app.state.travel_service = travel_service
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            same = await asyncio.gather(*[client.post(ENDPOINT, json=body("天安门"), timeout=60) for _ in range(requests)])
+            same_calls = upstream.calls
+            mixed = await asyncio.gather(*[
+                client.post(ENDPOINT, json=body(center), timeout=60) for center in ("故宫", "天坛", "故宫", "天坛")
+            ])
+            mixed_calls = upstream.calls - same_calls
+            again = await client.post(ENDPOINT, json=body("天安门"), timeout=60)
+            again_calls = upstream.calls - same_calls - mixed_calls
+        stats = travel_service.single_flight.stats()
+
+    await llm_service.aclose()
+
+    statuses = [response.headers.get("x-cache") for response in same]
+    plans = {response.json()["overview"] + str(response.json()["daily_plans"]) for response in same}
+    print(f"[相同] {requests}个并发请求，大模型调用{same_calls}次，MISS {statuses.count('MISS')}个，"
+          f"COALESCED {statuses.count('COALESCED')}个，不同计划{len(plans)}种")
+    print(f"[不同] 两种请求各两个，大模型调用{mixed_calls}次；完成后再次请求 {again.headers.get('x-cache')}，"
+          f"调用{again_calls}次；统计 {stats}")
+    return [
+        (all(response.status_code == 200 for response in same + mixed), "所有请求都应成功"),
+        (same_calls == 1, "相同的并发请求应只调用一次大模型"),
+        (statuses.count("MISS") == 1 and statuses.count("COALESCED") == requests - 1, "其余请求应标记为COALESCED"),
+        (len(plans) == 1, "合并的请求应得到相同的计划"),
+        (mixed_calls == 2, "不同的请求应各自生成"),
+        (again.headers.get("x-cache") == "MISS" and again_calls == 1 and stats["inflight"] == 0,
+         "完成后的相同请求应重新生成"),
+    ]
+
+
+async def check_single_flight() -> List[tuple]:
+    flight = SingleFlight()
+    calls = 0
+
+    async def slow() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "plan"
+
+    # 发起者被取消，共享调用继续完成
+    leader = asyncio.ensure_future(flight.do("key", slow))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("key", slow))
+    await asyncio.sleep(0.02)
+    leader.cancel()
+    result, joined = await follower
+
+    async def fail() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("上游错误")
+
+    calls_before = calls
+    failures = await asyncio.gather(*[flight.do("broken", fail) for _ in range(3)], return_exceptions=True)
+    retried, _ = await flight.do("broken", slow)
+    print(f"[合并] 发起者取消后等待者得到 {result!r}（合并 {joined}）；失败时 "
+          f"{[type(error).__name__ for error in failures]}，调用{calls - calls_before}次后重试得到 {retried!r}")
+    return [
+        (result == "plan" and joined and leader.cancelled(), "发起者被取消时其他等待者应拿到结果"),
+        (all(isinstance(error, RuntimeError) for error in failures) and calls - calls_before == 2 and retried == "plan",
+         "共享调用的异常应传给全部等待者，之后的调用重新执行"),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="并发合并验证")
+    parser.add_argument("--requests", type=int, default=20, help="相同请求的并发数")
+    parser.add_argument("--delay", type=float, default=0.2, help="桩服务每次调用的延迟（秒）")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    checks = asyncio.run(check_api(args.requests, args.delay)) + asyncio.run(check_single_flight())
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+并发检查：验证大模型调用不会阻塞事件循环
+
+启动一个本地的慢速 OpenAI 兼容桩服务，并发发起 N 个
+/api/travel/generate-plan 请求。如果调用是非阻塞的，总耗时应接近单次调用，
+而不是 N 倍。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.concurrency_check --requests 20 --delay 0.5
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.main import app
+from app.services.llm_service import LLMService
+from app.services.travel_service import TravelService
+
+STUB_PLAN = {
+    "overview": "以天安门为中心的一日游",
+    "daily_plans": [
+        {
+            "day": 1,
+            "description": "参观天安门广场和故宫博物院",
+            "poi_list": [
+                {
+                    "name": "天安门广场",
+                    "address": "北京市东城区东长安街",
+                    "latitude": 39.9054,
+                    "longitude": 116.3976,
+                    "description": "世界上最大的城市中心广场",
+                    "recommended_duration": "1.5小时"
+                },
+                {
+                    "name": "故宫博物院",
+                    "address": "北京市东城区景山前街4号",
+                    "latitude": 39.9163,
+                    "longitude": 116.3972,
+                    "description": "明清两代的皇家宫殿",
+                    "recommended_duration": "4小时"
+                }
+            ]
+        }
+    ]
+}
+
+REQUEST_BODY = {
+    "city": "北京",
+    "centerName": "天安门",
+    "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "1"}
+}
+
+
+def build_slow_stub(delay: float) -> FastAPI:
+    """构建一个固定延迟返回计划的 OpenAI 兼容桩服务"""
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(body: dict):
+        await asyncio.sleep(delay)
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(STUB_PLAN, ensure_ascii=False)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+
+    return stub
+
+
+async def run(requests: int, delay: float) -> float:
+    settings.DEBUG = True  # 跳过微信签名校验
+
+    llm_client = AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(build_slow_stub(delay)))
+    )
+    llm_service = LLMService(client=llm_client)
+
+    # 在应用生命周期内运行，只替换旅游服务；不写入缓存和计划存储
+    settings.PLAN_STORE_ENABLED = False
+    async with app.router.lifespan_context(app):
+        app.state.travel_service = TravelService(llm_service)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.post("/api/travel/generate-plan", json=REQUEST_BODY, timeout=60)
+                for _ in range(requests)
+            ])
+            elapsed = time.perf_counter() - started
+
+    await llm_service.aclose()
+
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{len(failed)} 个请求失败: {failed[0].text}")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="并发生成计划的非阻塞检查")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.5, help="桩服务每次调用的延迟（秒）")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="允许的总耗时 / 单次延迟 倍数")
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(args.requests, args.delay))
+    ratio = elapsed / args.delay
+    print(f"{args.requests} 个并发请求耗时 {elapsed:.3f}s（单次延迟 {args.delay}s，倍数 {ratio:.2f}）")
+
+    if ratio > args.tolerance:
+        print("失败：请求被串行执行，事件循环可能被阻塞")
+        return 1
+    print("通过：并发请求总耗时接近单次调用")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
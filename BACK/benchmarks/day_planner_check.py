@@ -0,0 +1,104 @@
+"""
+景点分天验证：容量均衡、每天都有景点、坐标重复、地理分组和耗时
+
+检查每天的景点数在 floor(n/k) 与 ceil(n/k) 之间、景点不多于天数以外的情况下没有空的天；
+多个景点坐标相同（同一景区的不同入口、用户重复选择等）时同样如此且不产生NaN中心；
+两片相距较远的景点分在不同的天；相同输入的结果相同；最后测量随机景点的分天耗时。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.day_planner_check [--spots 30] [--days 5] [--repeat 500]
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from app.services.day_planner import assign_spots_to_days
+
+CENTER = (39.9087, 116.3975)
+
+
+def spots(coordinates: Sequence[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    return [{"name": f"景点{i}", "latitude": lat, "longitude": lng} for i, (lat, lng) in enumerate(coordinates)]
+
+
+def sizes(days: List[List[Dict[str, Any]]]) -> List[int]:
+    return [len(day) for day in days]
+
+
+def balanced(days: List[List[Dict[str, Any]]], total: int) -> bool:
+    """每天的景点数在 floor(n/k) 与 ceil(n/k) 之间（景点少于天数时为0或1），且景点不重复、不丢失"""
+    low, high = total // len(days), -(-total // len(days))
+    names = [spot["name"] for day in days for spot in day]
+    return all(low <= size <= high for size in sizes(days)) and sorted(names) == sorted(set(names)) and len(names) == total
+
+
+def run(args: argparse.Namespace) -> bool:
+    checks = []
+    rng = np.random.default_rng(7)
+
+    cases = {
+        "随机": (spots(zip(CENTER[0] + rng.normal(0, 0.05, 12), CENTER[1] + rng.normal(0, 0.05, 12))), 4),
+        "两处重复6个景点5天": (spots([(39.90, 116.40)] * 2 + [(39.91, 116.41)] * 2 + [(39.92, 116.39), (39.95, 116.50)]), 5),
+        "三处重复8个景点7天": (spots([(39.90, 116.40)] * 3 + [(39.91, 116.41)] * 3 + [(39.92, 116.39), (39.95, 116.50)]), 7),
+        "全部重复6个景点5天": (spots([(39.90, 116.40)] * 6), 5),
+        "3个景点5天": (spots([(39.90, 116.40), (39.91, 116.41), (39.92, 116.42)]), 5),
+    }
+    for name, (items, travel_days) in cases.items():
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # 空组产生的除零（NaN中心）以RuntimeWarning出现
+            try:
+                days = assign_spots_to_days(items, travel_days, CENTER)
+            except RuntimeWarning as e:
+                print(f"[分天] {name}: {e}")
+                checks.append((False, f"{name}：不应出现数值警告"))
+                continue
+        print(f"[分天] {name}: {sizes(days)}")
+        checks.append((balanced(days, len(items)), f"{name}：每天的景点数应均衡且没有空的天"))
+
+    # 两片相距较远的景点各自成一天
+    west = [(39.99 + 0.002 * i, 116.30 + 0.002 * i) for i in range(4)]
+    east = [(39.85 + 0.002 * i, 116.50 + 0.002 * i) for i in range(4)]
+    items = spots(west + east)
+    days = assign_spots_to_days(items, 2, CENTER)
+    groups = sorted(sorted(int(spot["name"][2:]) for spot in day) for day in days)
+    print(f"[分组] 东西两片 {groups}")
+    checks.append((groups == [[0, 1, 2, 3], [4, 5, 6, 7]], "相距较远的两片景点应分在不同的天"))
+    checks.append((assign_spots_to_days(items, 2, CENTER) == days, "相同输入的结果应相同"))
+
+    # 耗时
+    items = spots(zip(CENTER[0] + rng.normal(0, 0.1, args.spots), CENTER[1] + rng.normal(0, 0.1, args.spots)))
+    samples = np.empty(args.repeat)
+    for i in range(args.repeat):
+        started = time.perf_counter()
+        assign_spots_to_days(items, args.days, CENTER)
+        samples[i] = (time.perf_counter() - started) * 1e3
+    p50, p99 = float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+    print(f"[耗时] {args.spots}个景点分{args.days}天 p50 {p50:.3f}ms / p99 {p99:.3f}ms")
+    checks.append((p99 < 20, "分天耗时应远低于一次大模型调用"))
+
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="景点分天验证")
+    parser.add_argument("--spots", type=int, default=30, help="测量耗时的景点数")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    ok = run(args)
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
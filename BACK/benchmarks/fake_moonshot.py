@@ -0,0 +1,280 @@
+"""
+确定性的本地 Moonshot（OpenAI兼容）桩服务
+
+返回的计划使用 test/main.py 中的天安门预设景点，按提示词类型（完整计划、大纲、单日、重新生成）
+和请求的天数组装。延迟按"首个令牌时间 + 输出令牌数 / 生成速度"模拟，支持流式输出，
+并按比例注入畸形输出（代码块包裹、多余逗号、截断、缺少坐标）。
+是否注入畸形输出由随机种子和提示词内容决定，相同的请求序列得到相同的结果。
+
+进程内使用：
+    upstream = FakeMoonshot(FakeMoonshotConfig(ttft=0.2, malformed_rate=0.1))
+    client = upstream.client()  # 通过ASGI传输直连的 AsyncOpenAI 客户端
+
+独立运行（供真实部署的服务压测，启动服务时设置 LLM_API_URL=http://127.0.0.1:9100/v1）:
+    python -m benchmarks.fake_moonshot --port 9100 --ttft 0.5 --tokens-per-second 80 --malformed-rate 0.05
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+import argparse
+import ast
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI
+
+from app.services.prompt_builder import count_tokens
+
+FIXTURE_SOURCE = Path(__file__).resolve().parent.parent / "test" / "main.py"
+
+# 畸形输出的类型
+MALFORMATIONS = ("fenced", "trailing_comma", "truncated", "missing_coordinates")
+
+
+def load_tiananmen_fixtures(path: Path = FIXTURE_SOURCE) -> Dict[str, Any]:
+    """
+    从 test/main.py 中读取天安门预设数据
+
+    预设数据是函数内的字面量，用语法树定位 poi_data 和 day_descriptions 的赋值并求值，
+    不导入也不执行该模块。
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    fixtures = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in ("poi_data", "day_descriptions"):
+                fixtures[name] = ast.literal_eval(node.value)
+    if set(fixtures) != {"poi_data", "day_descriptions"}:
+        raise ValueError(f"{path} 中缺少天安门预设数据")
+    return fixtures
+
+
+class FakeMoonshotConfig:
+    """桩服务参数"""
+
+    def __init__(
+            self,
+            ttft: float = 0.3,
+            tokens_per_second: float = 0.0,
+            jitter: float = 0.0,
+            malformed_rate: float = 0.0,
+            chunk_chars: int = 24,
+            seed: int = 7
+    ):
+        self.ttft = ttft  # 首个令牌时间（秒）
+        self.tokens_per_second = tokens_per_second  # 输出速度，0表示输出不额外耗时
+        self.jitter = jitter  # 延迟的随机浮动比例
+        self.malformed_rate = malformed_rate  # 完整计划响应中畸形输出的比例
+        self.chunk_chars = chunk_chars  # 流式输出每个分片的字符数
+        self.seed = seed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class FakeMoonshot:
+    """按提示词类型返回天安门预设计划的桩服务"""
+
+    def __init__(self, config: Optional[FakeMoonshotConfig] = None):
+        self.config = config or FakeMoonshotConfig()
+        fixtures = load_tiananmen_fixtures()
+        self.poi_data: List[List[Dict[str, Any]]] = fixtures["poi_data"]
+        self.day_descriptions: List[str] = fixtures["day_descriptions"]
+        self.calls: Counter = Counter()
+        self.malformed: Counter = Counter()
+        self.active = 0
+        self.peak = 0
+
+    # 响应内容
+
+    def day_plan(self, day: int) -> Dict[str, Any]:
+        index = (day - 1) % len(self.poi_data)
+        return {"day": day, "description": self.day_descriptions[index], "poi_list": self.poi_data[index]}
+
+    def respond(self, user: str) -> Dict[str, Any]:
+        """根据提示词生成响应对象，返回 {"kind", "content"}"""
+        if "需要重新生成:" in user:
+            line = user.split("需要重新生成:", 1)[1].split("\n", 1)[0]
+            days = [int(day) for day in re.findall(r"第(\d+)天", line)]
+            return {"kind": "repair", "content": {"daily_plans": [self.day_plan(day) for day in days]}}
+
+        if "每天已分配的用户景点" in user:
+            days = int(re.search(r"旅行天数:(\d+)", user).group(1))
+            return {"kind": "outline", "content": {
+                "overview": f"以天安门为中心的{days}日游",
+                "days": [{"day": day, "theme": self.day_descriptions[(day - 1) % 3][:12]} for day in range(1, days + 1)]
+            }}
+
+        match = re.match(r"第(\d+)天（共", user)
+        if match:
+            return {"kind": "day", "content": self.day_plan(int(match.group(1)))}
+
+        match = re.search(r"旅行天数:(\d+)", user)
+        days = int(match.group(1)) if match else 1
+        return {"kind": "plan", "content": {
+            "overview": f"以天安门为中心的{days}日游，游览故宫、天坛、前门等历史文化景点。",
+            "daily_plans": [self.day_plan(day) for day in range(1, days + 1)]
+        }}
+
+    def render(self, kind: str, content: Dict[str, Any], rng: random.Random) -> str:
+        """序列化响应，按比例对完整计划注入畸形输出"""
+        if kind != "plan" or rng.random() >= self.config.malformed_rate:
+            return json.dumps(content, ensure_ascii=False)
+
+        malformation = rng.choice(MALFORMATIONS)
+        self.malformed[malformation] += 1
+        if malformation == "missing_coordinates":
+            broken = json.loads(json.dumps(content))
+            day_plan = broken["daily_plans"][rng.randrange(len(broken["daily_plans"]))]
+            for poi in day_plan["poi_list"]:
+                poi.pop("latitude", None)
+                poi.pop("longitude", None)
+            return json.dumps(broken, ensure_ascii=False)
+
+        text = json.dumps(content, ensure_ascii=False, indent=2)
+        if malformation == "fenced":
+            return f"好的，以下是为您生成的旅游计划：\n```json\n{text}\n```"
+        if malformation == "trailing_comma":
+            return re.sub(r'"\n(\s*)}', r'",\n\1}', text)
+        # 截断在最后一天的中间，模拟输出长度耗尽
+        last_day = text.rindex('"day": ')
+        return text[:last_day + (len(text) - last_day) // 2]
+
+    # 延迟模拟
+
+    def _rng(self, body: Dict[str, Any]) -> random.Random:
+        digest = hashlib.sha256(json.dumps(body["messages"], ensure_ascii=False).encode("utf-8")).hexdigest()
+        return random.Random(f"{self.config.seed}:{digest}")
+
+    def _delay(self, base: float, rng: random.Random) -> float:
+        if self.config.jitter:
+            base *= 1 + rng.uniform(-self.config.jitter, self.config.jitter)
+        return max(0.0, base)
+
+    def _generation_time(self, text: str) -> float:
+        if self.config.tokens_per_second <= 0:
+            return 0.0
+        return count_tokens(text) / self.config.tokens_per_second
+
+    async def _stream(self, model: str, text: str, rng: random.Random) -> AsyncIterator[str]:
+        chunks = [text[i:i + self.config.chunk_chars] for i in range(0, len(text), self.config.chunk_chars)]
+        per_chunk = self._generation_time(text) / max(len(chunks), 1)
+        try:
+            await asyncio.sleep(self._delay(self.config.ttft, rng))
+            for chunk in chunks:
+                if per_chunk:
+                    await asyncio.sleep(per_chunk)
+                yield "data: " + json.dumps({
+                    "id": "fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+                }, ensure_ascii=False) + "\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            self.active -= 1
+
+    def build(self) -> FastAPI:
+        stub = FastAPI(title="fake moonshot")
+
+        @stub.post("/v1/chat/completions")
+        async def chat_completions(body: dict):
+            messages = body.get("messages") or []
+            if len(messages) < 2:
+                return JSONResponse(status_code=400, content={"error": {"message": "需要system和user消息"}})
+
+            rng = self._rng(body)
+            response = self.respond(messages[-1]["content"])
+            text = self.render(response["kind"], response["content"], rng)
+            self.calls[response["kind"]] += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+            if body.get("stream"):
+                return StreamingResponse(self._stream(body["model"], text, rng), media_type="text/event-stream")
+
+            try:
+                await asyncio.sleep(self._delay(self.config.ttft, rng) + self._generation_time(text))
+            finally:
+                self.active -= 1
+            prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+            completion_tokens = count_tokens(text)
+            return {
+                "id": "fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            }
+
+        @stub.get("/stats")
+        async def stats():
+            return self.stats()
+
+        return stub
+
+    def client(self) -> AsyncOpenAI:
+        """通过ASGI传输直连本桩服务的客户端，不经过网络"""
+        return AsyncOpenAI(
+            api_key="fake",
+            base_url="http://fake-moonshot/v1",
+            http_client=httpx.AsyncClient(transport=httpx.ASGITransport(self.build())),
+            max_retries=0
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "malformed": dict(self.malformed),
+            "peak_concurrency": self.peak,
+            "config": self.config.to_dict()
+        }
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """桩服务参数，供压测脚本复用"""
+    parser.add_argument("--ttft", type=float, default=0.3, help="首个令牌时间（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="输出速度，0表示不模拟")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟随机浮动比例")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="畸形输出比例")
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeMoonshotConfig:
+    return FakeMoonshotConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        jitter=args.jitter,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed
+    )
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="确定性的本地 Moonshot 桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(FakeMoonshot(config_from_args(args)).build(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+大模型调用管控检查
+
+启动一个可注入429、5xx和延迟的本地 OpenAI 兼容桩服务，验证：
+  1. 间歇性429会被带抖动的退避重试吸收，且上游并发不超过全局信号量
+  2. 上游持续故障时熔断器打开，后续请求快速失败并返回503
+  3. 每分钟请求数限额生效
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.governor_check
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.main import app
+from app.services.llm_governor import LLMGovernor
+from app.services.llm_service import LLMService
+from app.services.travel_service import TravelService
+from benchmarks.concurrency_check import REQUEST_BODY, STUB_PLAN
+
+
+class FaultyUpstream:
+    """按比例注入错误的桩服务，记录上游观察到的峰值并发"""
+
+    def __init__(
+            self,
+            error_rate: float = 0.0,
+            status: int = 429,
+            delay: float = 0.05,
+            seed: int = 3,
+            tail_rate: float = 0.0,
+            tail_delay: float = 0.0
+    ):
+        self.error_rate = error_rate
+        self.status = status
+        self.delay = delay
+        self.tail_rate = tail_rate  # 按比例注入长尾延迟
+        self.tail_delay = tail_delay
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.active = 0
+        self.peak = 0
+
+    def build(self) -> FastAPI:
+        stub = FastAPI()
+
+        @stub.post("/v1/chat/completions")
+        async def chat_completions(body: dict):
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                slow = self.random.random() < self.tail_rate
+                await asyncio.sleep(self.tail_delay if slow else self.delay)
+                if self.random.random() < self.error_rate:
+                    self.errors += 1
+                    return JSONResponse(
+                        status_code=self.status,
+                        content={"error": {"message": "injected", "type": "rate_limit_reached_error"}},
+                        headers={"Retry-After": "0"} if self.status == 429 else {}
+                    )
+                return {
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": json.dumps(STUB_PLAN, ensure_ascii=False)},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {"prompt_tokens": 500, "completion_tokens": 500, "total_tokens": 1000}
+                }
+            finally:
+                self.active -= 1
+
+        return stub
+
+
+async def fire(upstream: FaultyUpstream, governor: LLMGovernor, requests: int):
+    llm_client = AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(upstream.build())),
+        max_retries=0
+    )
+    llm_service = LLMService(client=llm_client, governor=governor)
+
+    settings.PLAN_STORE_ENABLED = False
+    async with app.router.lifespan_context(app):
+        app.state.travel_service = TravelService(llm_service)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            started = time.perf_counter()
+            # 每个请求使用不同的中心位置，避免被并发合并成一次上游调用
+            responses = await asyncio.gather(*[
+                client.post("/api/travel/generate-plan", json={**REQUEST_BODY, "centerName": f"天安门{i}"}, timeout=60)
+                for i in range(requests)
+            ])
+            elapsed = time.perf_counter() - started
+
+    await llm_service.aclose()
+    return responses, elapsed
+
+
+async def check_retries() -> bool:
+    upstream = FaultyUpstream(error_rate=0.3)
+    governor = LLMGovernor(max_concurrency=8, max_retries=6, retry_base_delay=0.02, retry_max_delay=0.2)
+    responses, elapsed = await fire(upstream, governor, 60)
+    ok = sum(r.status_code == 200 for r in responses)
+    print(f"[重试] 60个请求成功{ok}个，上游调用{upstream.calls}次（注入429 {upstream.errors}次），"
+          f"重试{governor.retries}次，上游峰值并发{upstream.peak}，耗时{elapsed:.2f}s")
+    return ok == 60 and upstream.peak <= 8 and governor.retries == upstream.errors
+
+
+async def check_breaker() -> bool:
+    upstream = FaultyUpstream(error_rate=1.0, status=500, delay=0.01)
+    governor = LLMGovernor(max_concurrency=4, max_retries=1, retry_base_delay=0.01, failure_threshold=5, reset_timeout=30)
+    responses, elapsed = await fire(upstream, governor, 40)
+    statuses = sorted({r.status_code for r in responses})
+    retry_after = {r.headers.get("retry-after") for r in responses}
+    print(f"[熔断] 40个请求状态码{statuses}，上游只被调用{upstream.calls}次，"
+          f"熔断拒绝{governor.breaker.rejected}次，状态{governor.breaker.state}，Retry-After {sorted(retry_after)}，耗时{elapsed:.2f}s")
+    return statuses == [503] and governor.breaker.state == "open" and upstream.calls < 40
+
+
+async def check_rpm() -> bool:
+    upstream = FaultyUpstream(delay=0.0)
+    governor = LLMGovernor(max_concurrency=64, rpm_limit=600)
+    responses, elapsed = await fire(upstream, governor, 620)
+    ok = sum(r.status_code == 200 for r in responses)
+    print(f"[限额] RPM=600 发起620个请求，成功{ok}个，耗时{elapsed:.2f}s（桶容量为一分钟配额，超出部分按每秒10个放行）")
+    return ok == 620 and elapsed >= 1.0
+
+
+async def run() -> bool:
+    settings.DEBUG = True  # 跳过微信签名校验
+    results = [await check_retries(), await check_breaker(), await check_rpm()]
+    return all(results)
+
+
+def main() -> int:
+    import logging
+    logging.disable(logging.CRITICAL)
+    if asyncio.run(run()):
+        print("通过")
+        return 0
+    print("失败")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+多后端对冲与故障切换检查
+
+使用两个本地桩后端验证：
+  1. 主后端有长尾延迟时，对冲请求把p99降到接近对冲延迟加上备用后端的延迟，落败的请求被取消
+  2. 主后端持续返回5xx时，请求自动切换到备用后端并全部成功，路由逐渐偏向健康的后端
+  3. 流式请求的主后端在输出第一段内容前失败时，切换到备用后端完成整个流，失败记录到主后端的熔断器
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.hedging_check
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import List
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.llm_backends import LLMBackend
+from app.services.llm_governor import LLMGovernor
+from app.services.llm_service import LLMService
+from benchmarks.concurrency_check import REQUEST_BODY, STUB_PLAN
+from benchmarks.governor_check import FaultyUpstream
+from benchmarks.stream_check import build_streaming_stub
+
+
+def stub_backend(name: str, upstream) -> LLMBackend:
+    """upstream 为 FaultyUpstream 或直接给出的桩服务应用"""
+    application = upstream.build() if isinstance(upstream, FaultyUpstream) else upstream
+    client = AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(application)),
+        max_retries=0
+    )
+    governor = LLMGovernor(max_concurrency=256, max_retries=1, retry_base_delay=0.01, failure_threshold=1000)
+    return LLMBackend(name, client, "stub-model", governor)
+
+
+async def latencies(service: LLMService, requests: int) -> List[float]:
+    input_data = {
+        "city": REQUEST_BODY["city"],
+        "center_name": REQUEST_BODY["centerName"],
+        "scenic_spots": [],
+        "travel_days": 1,
+        "travel_mode": "步行"
+    }
+
+    # 限制并发，避免本机CPU排队掩盖上游延迟
+    limit = asyncio.Semaphore(10)
+
+    async def one() -> float:
+        async with limit:
+            started = time.perf_counter()
+            await service.generate_travel_plan(input_data)
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*[one() for _ in range(requests)])
+
+
+async def check_hedging() -> bool:
+    results = {}
+    for hedge_delay in (0, 0.15):
+        settings.LLM_HEDGE_DELAY = hedge_delay
+        primary = FaultyUpstream(delay=0.05, tail_rate=0.1, tail_delay=1.5, seed=5)
+        backup = FaultyUpstream(delay=0.1, seed=6)
+        service = LLMService(backends=[stub_backend("primary", primary), stub_backend("backup", backup)])
+        # 两个后端都先有一次延迟记录，让主后端排在前面
+        service.backend_pool.backends[0].record(True, 0.05)
+        service.backend_pool.backends[1].record(True, 0.1)
+        samples = await latencies(service, 200)
+        results[hedge_delay] = (float(np.percentile(samples, 50)), float(np.percentile(samples, 99)))
+        stats = service.backend_pool.stats()
+        print(f"[对冲 {hedge_delay}s] p50 {results[hedge_delay][0]:.3f}s p99 {results[hedge_delay][1]:.3f}s，"
+              f"对冲{stats['hedges']}次，对冲胜出{stats['hedge_wins']}次，"
+              f"被取消{sum(b['cancelled'] for b in stats['backends'])}次")
+        await service.aclose()
+    return results[0.15][1] < 0.5 < results[0][1]
+
+
+async def check_failover() -> bool:
+    settings.LLM_HEDGE_DELAY = 0
+    broken = FaultyUpstream(error_rate=1.0, status=500, delay=0.01)
+    healthy = FaultyUpstream(delay=0.02)
+    service = LLMService(backends=[stub_backend("broken", broken), stub_backend("healthy", healthy)])
+    outcomes = []
+    for _ in range(30):
+        try:
+            await latencies(service, 1)
+            outcomes.append(True)
+        except Exception:
+            outcomes.append(False)
+    stats = service.backend_pool.stats()
+    print(f"[故障切换] 30个请求成功{sum(outcomes)}个，切换{stats['failovers']}次，"
+          f"故障后端被调用{broken.calls}次，当前首选{stats['backends'][0]['name']}")
+    await service.aclose()
+    return all(outcomes) and stats["backends"][0]["name"] == "healthy" and broken.calls < 10
+
+
+async def check_stream_failover() -> bool:
+    broken = FaultyUpstream(error_rate=1.0, status=500, delay=0.01)
+    healthy = build_streaming_stub(json.dumps(STUB_PLAN, ensure_ascii=False), chunk_chars=32, interval=0.001)
+    service = LLMService(backends=[stub_backend("broken", broken), stub_backend("healthy", healthy)])
+    # 两个后端都先有一次延迟记录，让故障后端排在前面
+    service.backend_pool.backends[0].record(True, 0.01)
+    service.backend_pool.backends[1].record(True, 0.1)
+    input_data = {
+        "city": REQUEST_BODY["city"],
+        "center_name": REQUEST_BODY["centerName"],
+        "scenic_spots": [],
+        "travel_days": 1,
+        "travel_mode": "步行"
+    }
+    events = [event async for event, _ in service.stream_travel_plan(input_data)]
+    stats = service.backend_pool.stats()
+    backends = {backend["name"]: backend for backend in stats["backends"]}
+    breaker = service.backend_pool.backends[0].governor.breaker
+    print(f"[流式故障切换] 事件 {events}，切换{stats['failovers']}次，"
+          f"故障后端失败{backends['broken']['failures']}次（熔断器记录{breaker.failures}次），"
+          f"健康后端成功{backends['healthy']['successes']}次")
+    await service.aclose()
+    return (events == ["overview", "day", "complete"] and stats["failovers"] == 1
+            and backends["broken"]["failures"] == 1 and breaker.failures == 1
+            and backends["healthy"]["successes"] == 2)
+
+
+async def run() -> bool:
+    return all([await check_hedging(), await check_failover(), await check_stream_failover()])
+
+
+def main() -> int:
+    logging.disable(logging.CRITICAL)
+    if asyncio.run(run()):
+        print("通过")
+        return 0
+    print("失败")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
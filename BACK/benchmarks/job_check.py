@@ -0,0 +1,140 @@
+"""
+异步任务验证：202 → 轮询 → 完成，队列已满时返回429
+
+在应用中（旅游服务替换为连接较慢本地桩服务的实例，单个工作协程、很小的队列，任务表使用
+临时SQLite文件）依次提交一批 ?async=1 请求：先被接受的返回202、任务ID和Location，超出队列容量的返回带Retry-After
+的429；不带wait的查询看到queued/running，长轮询等到succeeded并拿到完整计划；未知任务
+返回404。另外直接检查 JobQueue：任务失败时状态为failed并带有错误信息，
+Retry-After按排队任务数和平均处理时间估算。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.job_check [--submit 5] [--queue 2]
+"""
+from typing import List
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.main import app
+from app.services.job_queue import JobQueue, QueueFullError
+from app.services.llm_service import LLMService
+from app.services.travel_service import TravelService
+from benchmarks.concurrency_check import REQUEST_BODY, build_slow_stub
+
+ENDPOINT = "/api/travel/generate-plan?async=1"
+
+
+async def check_api(args: argparse.Namespace, store_path: str) -> List[tuple]:
+    settings.DEBUG = True  # 跳过微信签名校验
+    settings.JOB_WORKERS = 1
+    settings.JOB_QUEUE_SIZE = args.queue
+    settings.JOB_STORE_PATH = store_path
+    settings.PLAN_STORE_ENABLED = False
+    llm_service = LLMService(client=AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(build_slow_stub(0.3)))
+    ))
+
+    async with app.router.lifespan_context(app):
+        app.state.travel_service = TravelService(llm_service)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            submitted = [await client.post(ENDPOINT, json=REQUEST_BODY) for _ in range(args.submit)]
+            accepted = [response for response in submitted if response.status_code == 202]
+            rejected = [response for response in submitted if response.status_code == 429]
+
+            polled = [(await client.get(response.headers["location"])).json()["status"]
+                      for response in accepted]
+            finished = [
+                (await client.get(f"{response.headers['location']}?wait=10")).json()
+                for response in accepted
+            ]
+            missing = await client.get("/api/travel/jobs/unknown")
+            stats = (await client.get("/api/travel/jobs/stats")).json()
+
+    await llm_service.aclose()
+
+    retry_after = [response.headers.get("retry-after") for response in rejected]
+    print(f"[提交] {args.submit}个请求（1个工作协程，队列{args.queue}），202 {len(accepted)}个，429 {len(rejected)}个，"
+          f"Retry-After {retry_after}")
+    print(f"[轮询] 立即查询 {polled}，长轮询 {[job['status'] for job in finished]}；未知任务 {missing.status_code}")
+    print(f"[统计] 提交{stats['submitted']}个，拒绝{stats['rejected']}个，成功{stats['succeeded']}个，"
+          f"任务表 {stats['cluster']}")
+
+    first = accepted[0].json() if accepted else {}
+    return [
+        (len(accepted) == 1 + args.queue and len(rejected) == args.submit - len(accepted),
+         "超出工作协程和队列容量的任务应被拒绝"),
+        (bool(first.get("job_id")) and first.get("status") in ("queued", "running")
+         and accepted[0].headers.get("location") == first.get("status_url"), "接受的任务应返回202、任务ID和Location"),
+        (all(value and value.isdigit() and int(value) >= 1 for value in retry_after), "429应带有Retry-After秒数"),
+        (all(status in ("queued", "running") for status in polled), "完成前的查询应返回queued或running"),
+        (all(job["status"] == "succeeded" and job["result"]["plan_id"] and len(job["result"]["daily_plans"]) == 1
+             for job in finished), "长轮询应等到任务完成并返回完整计划"),
+        (missing.status_code == 404, "未知任务应返回404"),
+        (stats["rejected"] == len(rejected) and stats["succeeded"] == len(accepted)
+         and not any(stats["cluster"].values()), "统计应与提交结果一致，任务表中不应残留未完成的任务"),
+    ]
+
+
+async def check_queue(store_path: str) -> List[tuple]:
+    queue = JobQueue(1, 4, 60, store_path=store_path)
+    queue.start()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("上游错误")
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    failed = await queue.wait(await queue.submit(fail), 5)
+    # 工作协程执行1个、排队4个后队列已满，平均处理时间0.05秒：约需ceil(0.05 * 4 / 1)秒
+    jobs, full = [], None
+    for _ in range(6):
+        try:
+            jobs.append(await queue.submit(slow))
+        except QueueFullError as e:
+            full = e.retry_after
+            break
+    await asyncio.gather(*[queue.wait(job, 5) for job in jobs])
+    await queue.close()
+    print(f"[队列] 失败任务 {failed.to_dict()['status']}（{failed.error}）；队列满时 Retry-After {full}")
+    return [
+        (failed.status == "failed" and failed.error == "上游错误" and "result" not in failed.to_dict(),
+         "失败的任务应返回failed和错误信息"),
+        (len(jobs) == 5 and full == 1, "队列满时应按排队任务数和平均处理时间估算Retry-After"),
+        (all(job.status == "succeeded" and job.result == {"ok": True} for job in jobs), "排队的任务应依次完成"),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="异步任务验证")
+    parser.add_argument("--submit", type=int, default=5, help="依次提交的请求数")
+    parser.add_argument("--queue", type=int, default=2, help="队列容量")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        checks = (asyncio.run(check_api(args, os.path.join(directory, "jobs.db")))
+                  + asyncio.run(check_queue(os.path.join(directory, "queue.db"))))
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+重构前的大模型响应解析实现
+
+原样保留多阶段正则修复逻辑，供 parse_benchmark 对比新旧解析器。
+"""
+from typing import Any, Dict
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_parse_llm_response(content: str) -> Dict[str, Any]:
+    """重构前的 LLMService._parse_llm_response，仅用于基准对比"""
+    try:
+        # 记录原始响应以便调试
+        logger.debug(f"原始响应内容: {content}")
+
+        # 1. 首先尝试直接解析整个内容（如果是纯JSON）
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            logger.debug("直接解析失败，尝试提取JSON部分")
+
+        # 2. 尝试查找JSON代码块
+        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
+        if json_match:
+            try:
+                return json.loads(json_match.group(1).strip())
+            except json.JSONDecodeError:
+                logger.debug("从代码块提取的JSON解析失败")
+
+        # 3. 尝试寻找大括号对
+        json_start = content.find("{")
+        json_end = content.rfind("}")
+
+        if json_start != -1 and json_end != -1 and json_end > json_start:
+            json_str = content[json_start:json_end + 1]
+            try:
+                return json.loads(json_str)
+            except json.JSONDecodeError:
+                logger.debug("从大括号提取的JSON解析失败")
+
+        # 4. 尝试清理和修复常见问题后再解析
+        if json_start != -1 and json_end != -1:
+            json_str = content[json_start:json_end + 1]
+
+            # 尝试修复常见JSON语法错误
+            # 替换单引号为双引号（但不替换已转义的引号）
+            fixed_json = re.sub(r"(?<!\\)'", '"', json_str)
+
+            # 修复错误的转义序列
+            fixed_json = fixed_json.replace('\\"', '"')
+            fixed_json = fixed_json.replace('\\\'', "'")
+
+            # 修复重复的逗号
+            fixed_json = re.sub(r',\s*,', ',', fixed_json)
+            fixed_json = re.sub(r',\s*}', '}', fixed_json)
+            fixed_json = re.sub(r',\s*]', ']', fixed_json)
+
+            # 修复缺失的逗号
+            fixed_json = re.sub(r'"\s*{', '",{', fixed_json)
+            fixed_json = re.sub(r'}\s*"', '},"', fixed_json)
+
+            # 替换误写的分号为逗号
+            fixed_json = fixed_json.replace(';', ',')
+
+            logger.debug(f"修复后的JSON: {fixed_json}")
+
+            try:
+                return json.loads(fixed_json)
+            except json.JSONDecodeError as e:
+                logger.error(f"修复后的JSON仍然解析失败: {str(e)}")
+
+                # 尝试进一步分析错误位置
+                error_msg = str(e)
+                line_match = re.search(r'line (\d+)', error_msg)
+                col_match = re.search(r'column (\d+)', error_msg)
+
+                if line_match and col_match:
+                    line = int(line_match.group(1))
+                    col = int(col_match.group(1))
+
+                    # 获取错误行及其上下文
+                    lines = fixed_json.split('\n')
+                    error_line = lines[line - 1] if line <= len(lines) else ""
+                    error_context = f"问题行: {error_line}\n"
+                    error_context += f"位置: {' ' * (col - 1)}^"
+
+                    logger.error(f"JSON错误位置: {error_context}")
+
+        # 5. 如果所有方法都失败，则进行更激进的修复尝试
+        try:
+            # 尝试使用正则表达式提取JSON结构
+            # 此方法风险较高，可能会产生与原意不符的结果
+            overview_match = re.search(r'"overview"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', content)
+            overview = overview_match.group(1) if overview_match else "未能提取旅游计划概述"
+
+            # 提取daily_plans部分
+            daily_plans = []
+            day_matches = re.finditer(r'"day"\s*:\s*(\d+)', content)
+
+            for day_match in day_matches:
+                day_num = int(day_match.group(1))
+                desc_match = re.search(fr'"day"\s*:\s*{day_num}[^{{]*"description"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"',
+                                       content)
+                description = desc_match.group(1) if desc_match else f"第{day_num}天行程"
+
+                pois = []
+                poi_matches = re.finditer(fr'"day"\s*:\s*{day_num}[^{{]*"poi_list"\s*:\s*\[(.*?)\]', content,
+                                          re.DOTALL)
+
+                for poi_match in poi_matches:
+                    poi_block = poi_match.group(1)
+                    for poi_item in re.finditer(r'{(.*?)}', poi_block, re.DOTALL):
+                        poi_content = poi_item.group(1)
+                        name_match = re.search(r'"name"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
+                        name = name_match.group(1) if name_match else "景点"
+
+                        address_match = re.search(r'"address"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
+                        address = address_match.group(1) if address_match else "地址未提供"
+
+                        lat_match = re.search(r'"latitude"\s*:\s*([\d\.]+)', poi_content)
+                        lat = float(lat_match.group(1)) if lat_match else 0.0
+
+                        lng_match = re.search(r'"longitude"\s*:\s*([\d\.]+)', poi_content)
+                        lng = float(lng_match.group(1)) if lng_match else 0.0
+
+                        desc_match = re.search(r'"description"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
+                        desc = desc_match.group(1) if desc_match else "没有描述"
+
+                        dur_match = re.search(r'"recommended_duration"\s*:\s*"([^"\\]*(\\.[^"\\]*)*)"', poi_content)
+                        duration = dur_match.group(1) if dur_match else "1小时"
+
+                        pois.append({
+                            "name": name,
+                            "address": address,
+                            "latitude": lat,
+                            "longitude": lng,
+                            "description": desc,
+                            "recommended_duration": duration
+                        })
+
+                daily_plans.append({
+                    "day": day_num,
+                    "description": description,
+                    "poi_list": pois
+                })
+
+            if not daily_plans:
+                raise ValueError("无法提取日程计划")
+
+            # 组装最终的旅游计划
+            travel_plan = {
+                "overview": overview,
+                "daily_plans": daily_plans
+            }
+
+            logger.warning("使用正则表达式提取了旅游计划，可能不完整或有误")
+            return travel_plan
+
+        except Exception as regex_error:
+            logger.error(f"正则表达式提取失败: {str(regex_error)}")
+
+        # 如果所有方法都失败，抛出异常
+        raise ValueError("无法解析大模型响应为有效的旅游计划")
+
+    except Exception as e:
+        logger.error(f"解析大模型响应失败: {str(e)}")
+        raise ValueError(f"无法解析大模型响应为有效的旅游计划: {str(e)}")
@@ -0,0 +1,153 @@
+"""
+重构前的提示词构建实现
+
+原样保留带缩进的长模板和逐行展开的景点列表，供 prompt_benchmark 对比提示词大小。
+"""
+from typing import Any, Dict, List
+
+LEGACY_SYSTEM_PROMPT = "你是一个专业的旅游规划助手，能够合理的帮助用户规划具体的旅游方案。你的回答必须是纯JSON格式，不要添加任何额外的解释文字。"
+
+
+def legacy_travel_prompt(input_data: Dict[str, Any]) -> str:
+    """构建旅游计划的提示词"""
+    city = input_data["city"]
+    center_name = input_data["center_name"]
+    travel_days = input_data["travel_days"]
+    travel_mode = input_data["travel_mode"]
+
+    # 处理已有的景点列表
+    scenic_spots_text = ""
+    if input_data.get("day_assignments") and input_data.get("scenic_spots"):
+        # 景点已在本地按地理位置分好天，模型只需按分配安排
+        scenic_spots_text = "用户已选择的景点（已按地理位置分配到每天）:\n"
+        for day, spots in enumerate(input_data["day_assignments"], 1):
+            if not spots:
+                continue
+            scenic_spots_text += f"第{day}天:\n"
+            for i, spot in enumerate(spots, 1):
+                scenic_spots_text += f"{i}. {spot['name']}, 地址: {spot['address']}, 坐标: ({spot['latitude']}, {spot['longitude']})\n"
+    elif input_data.get("scenic_spots") and len(input_data["scenic_spots"]) > 0:
+        scenic_spots_text = "用户已选择的景点:\n"
+        for i, spot in enumerate(input_data["scenic_spots"], 1):
+            # 使用字典访问值并确保正确的 JSON 格式
+            scenic_spots_text += f"{i}. {spot['name']}, 地址: {spot['address']}, 坐标: ({spot['latitude']}, {spot['longitude']})\n"
+
+    # 构建提示词
+    prompt = f"""
+    请为我生成一份详细的旅游计划，遵循以下要求：
+
+    城市: {city}
+    中心位置: {center_name}
+    旅行天数: {travel_days}天
+    出行方式: {travel_mode}
+    {scenic_spots_text}
+
+    请根据以下要求制定一个合理的旅游行程:
+    1. 以中心位置为基础，规划{travel_days}天的行程
+    2. 考虑到用户的出行方式是{travel_mode}，规划合理的游览路线
+    3. 每天安排2-4个景点，考虑景点之间的距离和游览时间
+    4. 若用户已选择景点，请确保将这些景点合理地融入到行程中；已分配到某天的景点必须安排在那一天
+
+    你必须严格按照下面的JSON格式返回完整的旅游计划，不要添加任何额外的解释文本：
+
+    {{
+      "overview": "旅游计划概述",
+      "daily_plans": [
+        {{
+          "day": 1,
+          "description": "第一天概述",
+          "poi_list": [
+            {{
+              "name": "景点名称",
+              "address": "景点地址",
+              "latitude": 39.123456,
+              "longitude": 116.123456,
+              "description": "景点描述",
+              "recommended_duration": "2小时"
+            }}
+          ]
+        }}
+      ]
+    }}
+
+    请确保：
+    1. 返回的是纯JSON格式，不包含```json标记或任何说明文字
+    2. 所有JSON语法必须准确无误（如引号、逗号等）
+    3. 坐标信息尽量准确
+    4. 只返回这个JSON对象，不要有任何其他内容
+    """
+
+    return prompt
+
+
+def legacy_outline_prompt(input_data: Dict[str, Any], day_spots: List[List[Dict[str, Any]]]) -> str:
+    """构建行程大纲（概述和每日主题）的提示词"""
+    days_text = ""
+    for day, spots in enumerate(day_spots, 1):
+        names = "、".join(spot["name"] for spot in spots) if spots else "无指定景点"
+        days_text += f"第{day}天: {names}\n"
+
+    return f"""
+    请为以下旅行规划整体概述和每天的主题：
+
+    城市: {input_data["city"]}
+    中心位置: {input_data["center_name"]}
+    旅行天数: {input_data["travel_days"]}天
+    出行方式: {input_data["travel_mode"]}
+    每天已分配的用户景点:
+    {days_text}
+    请严格按照下面的JSON格式返回，不要添加任何额外的解释文本：
+
+    {{
+      "overview": "旅游计划概述",
+      "days": [
+        {{"day": 1, "theme": "第一天的主题和游览区域"}}
+      ]
+    }}
+    """
+
+
+def legacy_day_prompt(
+        input_data: Dict[str, Any],
+        day: int,
+        theme: str,
+        spots: List[Dict[str, Any]],
+        other_days: List[Dict[str, Any]]
+) -> str:
+    """构建单日计划的提示词"""
+    spots_text = ""
+    if spots:
+        spots_text = "当天必须包含的用户景点:\n"
+        for i, spot in enumerate(spots, 1):
+            spots_text += f"{i}. {spot['name']}, 地址: {spot['address']}, 坐标: ({spot['latitude']}, {spot['longitude']})\n"
+
+    other_text = "；".join(f"第{item['day']}天: {item['theme']}" for item in other_days) or "无"
+
+    return f"""
+    请为一次{input_data["travel_days"]}天旅行中的第{day}天生成详细计划：
+
+    城市: {input_data["city"]}
+    中心位置: {input_data["center_name"]}
+    出行方式: {input_data["travel_mode"]}
+    当天主题: {theme or "自行安排"}
+    {spots_text}
+    其他天的安排（不要重复这些天的景点）: {other_text}
+
+    要求：安排2-4个景点，考虑景点之间的距离和游览时间，坐标信息尽量准确。
+    请严格按照下面的JSON格式返回，不要添加任何额外的解释文本：
+
+    {{
+      "day": {day},
+      "description": "当天概述",
+      "poi_list": [
+        {{
+          "name": "景点名称",
+          "address": "景点地址",
+          "latitude": 39.123456,
+          "longitude": 116.123456,
+          "description": "景点描述",
+          "recommended_duration": "2小时"
+        }}
+      ]
+    }}
+    """
@@ -0,0 +1,61 @@
+"""
+重构前的计划转换和响应构建实现
+
+原样保留逐个构建 PointOfInterest 的转换、带校验的 TravelPlanResponse 构造，
+以及通过 response_model 校验并再次序列化的接口返回方式，供 response_benchmark 对比。
+"""
+from typing import Any, Dict
+
+from fastapi import FastAPI, Response
+
+from app.models.schemas import DailyPlan, PointOfInterest, TravelPlanResponse
+
+
+def legacy_to_daily_plan(day_plan: Dict[str, Any]) -> DailyPlan:
+    """重构前的 TravelService._to_daily_plan"""
+    poi_list = []
+    for poi in day_plan["poi_list"]:
+        poi_obj = PointOfInterest(
+            name=poi["name"],
+            address=poi["address"],
+            latitude=poi["latitude"],
+            longitude=poi["longitude"],
+            description=poi["description"],
+            recommended_duration=poi.get("recommended_duration")
+        )
+        poi_list.append(poi_obj)
+
+    return DailyPlan(
+        day=day_plan["day"],
+        poi_list=poi_list,
+        description=day_plan["description"],
+        repaired=day_plan.get("repaired", False)
+    )
+
+
+def legacy_plan_response(plan_id: str, llm_result: Dict[str, Any], travel_days: int, store: list) -> TravelPlanResponse:
+    """重构前的 _generate_plan_response：构造时校验，保存时序列化一次"""
+    daily_plans = [legacy_to_daily_plan(day_plan) for day_plan in llm_result["daily_plans"]]
+    plan_response = TravelPlanResponse(
+        plan_id=plan_id,
+        city="北京",
+        center_name="天安门",
+        travel_days=travel_days,
+        travel_mode="步行",
+        daily_plans=daily_plans,
+        overview=llm_result["overview"]
+    )
+    store.append(plan_response.model_dump_json())
+    return plan_response
+
+
+def legacy_app(handler) -> FastAPI:
+    """返回模型对象、由 response_model 再次校验和序列化的接口"""
+    app = FastAPI()
+
+    @app.get("/plan", response_model=TravelPlanResponse)
+    async def plan(response: Response):
+        response.headers["X-Cache"] = "MISS"
+        return handler()
+
+    return app
@@ -0,0 +1,170 @@
+"""
+生成接口压测：在不同并发下测量 /api/travel/generate-plan 的吞吐和延迟分位数
+
+默认在进程内运行 app.main:app，大模型替换为确定性的本地桩服务（benchmarks.fake_moonshot），
+测量的是本服务自身的开销加上模拟的上游延迟。每个请求使用不同的中心位置，
+避免被计划缓存或并发合并吸收；--same-body 时所有请求相同，用于观察缓存和合并的效果。
+
+也可以用 --url 压测已经启动的服务（服务需要把 LLM_API_URL 指向独立运行的桩服务）。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.load_test --concurrency 1,8,32,128 --requests 200 --ttft 0.3
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 16,64
+    python -m benchmarks.load_test --json benchmarks/results/load.json --baseline benchmarks/results/load_prev.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+from benchmarks.fake_moonshot import FakeMoonshot, add_config_arguments, config_from_args
+from benchmarks.report import compare_results, write_results
+
+ENDPOINT = "/api/travel/generate-plan"
+# 非调试模式下签名校验只检查这几个请求头是否存在
+HEADERS = {"signature": "bench", "timestamp": "0", "nonce": "bench"}
+
+
+def request_body(index: int, travel_days: int, same_body: bool, mode: Optional[str]) -> Dict[str, Any]:
+    travel_data = {"scenicSpots": [], "travelMode": "步行", "travelDays": str(travel_days)}
+    if mode:
+        travel_data["generationMode"] = mode
+    return {
+        "city": "北京",
+        "centerName": "天安门" if same_body else f"天安门#{index}",
+        "travelData": travel_data
+    }
+
+
+async def sweep_level(
+        client: httpx.AsyncClient,
+        concurrency: int,
+        requests: int,
+        travel_days: int,
+        same_body: bool,
+        mode: Optional[str],
+        offset: int
+) -> Dict[str, Any]:
+    """以固定并发（闭环，每个客户端完成一个请求后立即发起下一个）发送requests个请求"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    cache: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < requests:
+            index = offset + next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    ENDPOINT, json=request_body(index, travel_days, same_body, mode), headers=HEADERS, timeout=300
+                )
+                status = str(response.status_code)
+                x_cache = response.headers.get("x-cache")
+                if x_cache:
+                    cache[x_cache] = cache.get(x_cache, 0) + 1
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    samples = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 2),
+        "p50_ms": round(float(np.percentile(samples, 50)), 1),
+        "p95_ms": round(float(np.percentile(samples, 95)), 1),
+        "p99_ms": round(float(np.percentile(samples, 99)), 1),
+        "max_ms": round(float(samples.max()), 1),
+        "errors": sum(count for status, count in statuses.items() if status != "200"),
+        "statuses": statuses,
+        "cache": cache
+    }
+
+
+async def run_sweep(client: httpx.AsyncClient, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    offset = 0
+    for concurrency in args.concurrency:
+        if args.warmup:
+            # 预热请求使用另一段编号，不会与正式请求的中心位置重复
+            await sweep_level(client, concurrency, args.warmup, args.days, args.same_body, args.mode,
+                              offset=10 ** 6 + offset)
+        level = await sweep_level(client, concurrency, args.requests, args.days, args.same_body, args.mode, offset)
+        offset += args.requests
+        results.append(level)
+        print(f"并发{level['concurrency']:>4}  {level['rps']:>8.2f} req/s  p50 {level['p50_ms']:>8.1f}ms  "
+              f"p95 {level['p95_ms']:>8.1f}ms  p99 {level['p99_ms']:>8.1f}ms  错误{level['errors']}  {level['cache']}")
+    return results
+
+
+async def run_in_process(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.main import app
+    from app.services.llm_service import LLMService
+
+    upstream = FakeMoonshot(config_from_args(args))
+    settings.PLAN_STORE_ENABLED = False  # 不写本地数据库
+    settings.PLAN_CACHE_ENABLED = args.same_body
+    settings.LLM_MAX_CONCURRENCY = max(settings.LLM_MAX_CONCURRENCY, max(args.concurrency))
+
+    async with app.router.lifespan_context(app):
+        travel_service = app.state.travel_service
+        await travel_service.llm_service.aclose()
+        travel_service.llm_service = LLMService(client=upstream.client())
+        transport = httpx.ASGITransport(app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            results = await run_sweep(client, args)
+        await travel_service.llm_service.aclose()
+
+    return {"results": results, "upstream": upstream.stats()}
+
+
+async def run_remote(args: argparse.Namespace) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        results = await run_sweep(client, args)
+    return {"results": results}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="生成接口压测")
+    parser.add_argument("--url", help="压测已启动的服务，为空时在进程内运行")
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="每个并发级别的请求数")
+    parser.add_argument("--warmup", type=int, default=0, help="每个并发级别先发送的预热请求数，不计入结果")
+    parser.add_argument("--days", type=int, default=3, help="旅行天数")
+    parser.add_argument("--mode", choices=["single", "parallel"], help="生成模式")
+    parser.add_argument("--same-body", action="store_true", help="所有请求相同，启用计划缓存")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", help="与之前的结果文件对比")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    report = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+
+    config = {key: value for key, value in vars(args).items() if key not in ("json", "baseline")}
+    if args.json:
+        write_results(args.json, "load_test", config, report)
+    if args.baseline:
+        return 1 if compare_results(args.baseline, report["results"], key="concurrency",
+                                    metrics={"rps": "higher", "p50_ms": "lower", "p99_ms": "lower"}) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+日志管道验证：写入缓慢时不阻塞调用方，超长消息截断，队列满时丢弃并计数，
+接口日志带请求ID并以UTF-8 JSON行写出
+
+用一个每条日志耗时1ms的处理器模拟缓慢的磁盘，分别测量同步写入和队列写入时
+调用方单次 logger.info 的耗时。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.logging_check [--records 2000]
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import logging
+import queue
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from logging_config import BackgroundListener, BoundedQueueHandler, JsonFormatter, RequestIdFilter
+
+
+class SlowHandler(logging.Handler):
+    """每条日志固定耗时的处理器"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.handled = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        time.sleep(self.delay)
+        self.handled += 1
+
+
+def counter_value(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+def caller_latency(logger: logging.Logger, records: int, payload: str) -> np.ndarray:
+    samples = np.empty(records)
+    for i in range(records):
+        started = time.perf_counter()
+        logger.info(f"原始响应内容: {payload}")
+        samples[i] = time.perf_counter() - started
+    return samples * 1e6
+
+
+def isolated_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def check_pipeline(records: int) -> bool:
+    payload = "故宫" * 10000  # 约等于一次完整的大模型响应
+    ok = True
+
+    slow = SlowHandler(0.001)
+    sync_samples = caller_latency(isolated_logger("bench.sync", slow), min(records, 200), payload)
+
+    slow_async = SlowHandler(0.001)
+    handler = BoundedQueueHandler(queue.Queue(records // 4), max_message_chars=4000)
+    listener = BackgroundListener(handler.queue, slow_async)
+    listener.start()
+    dropped_before = counter_value("log_records_dropped_total")
+    truncated_before = counter_value("log_messages_truncated_total")
+    async_samples = caller_latency(isolated_logger("bench.async", handler), records, payload)
+    listener.stop()
+    dropped = counter_value("log_records_dropped_total") - dropped_before
+    truncated = counter_value("log_messages_truncated_total") - truncated_before
+
+    for name, samples in (("同步写入", sync_samples), ("队列写入", async_samples)):
+        print(f"[{name}] 调用方耗时 p50 {np.percentile(samples, 50):.1f}us  p99 {np.percentile(samples, 99):.1f}us  "
+              f"最大 {samples.max():.1f}us")
+    print(f"[队列写入] {records}条日志，后台写出{slow_async.handled}条，丢弃{int(dropped)}条，截断{int(truncated)}条")
+
+    if np.percentile(async_samples, 99) > 500:
+        print("失败：队列写入时调用方p99超过500us")
+        ok = False
+    if truncated != records:
+        print("失败：超长消息没有全部截断")
+        ok = False
+    if dropped == 0 or slow_async.handled + dropped != records:
+        print("失败：队列满时应丢弃并计数，且写出数加丢弃数等于总数")
+        ok = False
+    return ok
+
+
+async def check_request_ids(log_file: Path) -> bool:
+    from app.main import app
+    from app.services.llm_service import LLMService
+    from benchmarks.fake_moonshot import FakeMoonshot, FakeMoonshotConfig
+
+    # 接口日志写入临时文件
+    handler = logging.FileHandler(log_file, encoding="utf-8")
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(RequestIdFilter())
+    logging.getLogger().addHandler(handler)
+
+    upstream = FakeMoonshot(FakeMoonshotConfig(ttft=0.01))
+    settings.PLAN_STORE_ENABLED = False
+    body = {"city": "北京", "centerName": "天安门", "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "2"}}
+    headers = {"signature": "bench", "timestamp": "0", "nonce": "bench"}
+    async with app.router.lifespan_context(app):
+        travel_service = app.state.travel_service
+        await travel_service.llm_service.aclose()
+        travel_service.llm_service = LLMService(client=upstream.client())
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            given = await client.post("/api/travel/generate-plan", json=body, headers={**headers, "X-Request-ID": "trace-1"})
+            generated = await client.post("/api/travel/generate-plan", json={**body, "centerName": "前门"}, headers=headers)
+            invalid = await client.get("/api/travel/plans/x", headers={"X-Request-ID": "bad id!"})
+        await travel_service.llm_service.aclose()
+    logging.getLogger().removeHandler(handler)
+    handler.close()
+
+    lines = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    ids = {line["request_id"] for line in lines}
+    print(f"[请求ID] 响应头 {given.headers['x-request-id']} / {generated.headers['x-request-id']} / "
+          f"{invalid.headers['x-request-id']}，日志{len(lines)}行，出现的ID {sorted(ids)}")
+    print(f"[请求ID] 示例: {json.dumps(lines[-1], ensure_ascii=False)[:160]}")
+
+    ok = given.headers["x-request-id"] == "trace-1"
+    ok = ok and len(generated.headers["x-request-id"]) == 32 and invalid.headers["x-request-id"] != "bad id"
+    ok = ok and "trace-1" in ids and generated.headers["x-request-id"] in ids
+    ok = ok and any(line["message"].startswith("大模型调用") and line["request_id"] == "trace-1" for line in lines)
+    if not ok:
+        print("失败：请求ID没有正确传递到响应头和日志")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="日志管道验证")
+    parser.add_argument("--records", type=int, default=2000)
+    args = parser.parse_args()
+
+    ok = check_pipeline(args.records)
+    with tempfile.TemporaryDirectory() as directory:
+        ok = asyncio.run(check_request_ids(Path(directory) / "app.log")) and ok
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+多工作进程验证：任务状态和Prometheus指标在工作进程之间共享
+
+gunicorn 以多个工作进程运行时，提交任务和查询任务的请求可能落到不同的进程。这里用两个
+共用同一任务表的 JobQueue 模拟两个工作进程：在A提交的任务，B能查到并能长轮询到完成结果，
+不存在的任务B返回空，任务表的读写都不在事件循环线程中执行。指标部分启动若干子进程，在同一 PROMETHEUS_MULTIPROC_DIR 下各自
+记录计数和进行中的请求数，再由另一个进程渲染 /metrics，检查计数为各进程之和、已退出进程的
+进行中类指标不再计入。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.multiworker_check [--processes 3]
+"""
+from typing import List
+import argparse
+import asyncio
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+
+from app.services.job_queue import JobQueue
+
+# 子进程：记录计数和进行中的请求数后退出
+_RECORD = """
+from app.core.metrics import HTTP_IN_FLIGHT, PARSE_STRATEGY
+PARSE_STRATEGY.labels("direct").inc({count})
+HTTP_IN_FLIGHT.inc()
+"""
+
+# 子进程：标记已退出的进程（gunicorn.conf.py 的 child_exit）后渲染汇总的指标
+_RENDER = """
+import sys
+from prometheus_client import multiprocess
+from app.core.metrics import render_metrics
+for pid in sys.argv[1:]:
+    multiprocess.mark_process_dead(int(pid))
+sys.stdout.write(render_metrics().decode("utf-8"))
+"""
+
+
+def trace_threads(queue: JobQueue, threads: set) -> None:
+    """记录任务表各方法执行时所在的线程"""
+    table = queue._table
+
+    def traced(method):
+        def call(*args):
+            threads.add(threading.get_ident())
+            return method(*args)
+        return call
+
+    for name in ("put", "get", "counts", "purge"):
+        setattr(table, name, traced(getattr(table, name)))
+
+
+async def check_jobs(path: str) -> List[tuple]:
+    worker_a = JobQueue(workers=1, max_queue=4, store_path=path, poll_interval=0.05)
+    worker_b = JobQueue(workers=1, max_queue=4, store_path=path, poll_interval=0.05)
+    table_threads = set()
+    trace_threads(worker_a, table_threads)
+    trace_threads(worker_b, table_threads)
+    worker_a.start()
+    worker_b.start()
+
+    async def generate():
+        await asyncio.sleep(0.2)
+        return {"plan_id": "p1", "daily_plans": []}
+
+    job = await worker_a.submit(generate)
+    seen = await worker_b.get(job.job_id)
+    pending_status = seen.status if seen is not None else None
+    cluster = (await worker_b.stats())["cluster"]
+    finished = await worker_b.wait(seen, 2.0) if seen is not None else None
+    missing = await worker_b.get("no-such-job")
+
+    await worker_a.close()
+    await worker_b.close()
+
+    on_loop = threading.get_ident() in table_threads
+    print(f"[任务] A提交后B查询 {pending_status}，全部进程 {cluster}；"
+          f"B长轮询 {finished.status if finished else None} {finished.result if finished else None}；"
+          f"任务表读写{'有' if on_loop else '没有'}在事件循环线程中执行")
+    return [
+        (pending_status in ("queued", "running"), "其他工作进程应能查到刚提交的任务"),
+        (cluster is not None and cluster["queued"] + cluster["running"] == 1, "任务统计应包含全部工作进程"),
+        (finished is not None and finished.status == "succeeded" and finished.result == {"plan_id": "p1", "daily_plans": []},
+         "其他工作进程应能长轮询到任务结果"),
+        (missing is None, "不存在的任务应返回空"),
+        (bool(table_threads) and not on_loop, "任务表的读写不应阻塞事件循环"),
+    ]
+
+
+def check_metrics(processes: int, directory: str) -> List[tuple]:
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+    for i in range(processes):
+        subprocess.run([sys.executable, "-c", _RECORD.format(count=i + 1)], env=env, check=True)
+    # 子进程均已退出，这里只标记其中一个，其余视为仍在运行
+    dead = _recorded_pids(directory)[:1]
+    rendered = subprocess.run(
+        [sys.executable, "-c", _RENDER, *map(str, dead)], env=env, check=True, capture_output=True, text=True
+    ).stdout
+
+    counter = re.search(r'^llm_parse_strategy_total\{strategy="direct"\} (\S+)$', rendered, re.M)
+    in_flight = re.search(r"^http_requests_in_flight (\S+)$", rendered, re.M)
+    total = float(counter.group(1)) if counter else 0.0
+    live = float(in_flight.group(1)) if in_flight else 0.0
+    expected = processes * (processes + 1) / 2
+    print(f"[指标] {processes}个进程计数之和 {total:g}（应为{expected:g}），"
+          f"标记1个进程退出后进行中的请求 {live:g}（应为{processes - 1}）")
+    return [
+        (total == expected, "计数类指标应汇总全部工作进程"),
+        (live == processes - 1, "已退出进程的进行中类指标不应计入"),
+    ]
+
+
+def _recorded_pids(directory: str) -> List[int]:
+    """按文件名（gauge_livesum_<pid>.db）取出记录过进行中类指标的进程"""
+    return sorted(
+        int(name[len("gauge_livesum_"):-len(".db")])
+        for name in os.listdir(directory) if name.startswith("gauge_livesum_")
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="多工作进程验证")
+    parser.add_argument("--processes", type=int, default=3, help="记录指标的子进程数")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        checks = asyncio.run(check_jobs(os.path.join(directory, "jobs.db")))
+        metrics_dir = os.path.join(directory, "metrics")
+        os.makedirs(metrics_dir)
+        checks.extend(check_metrics(args.processes, metrics_dir))
+
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
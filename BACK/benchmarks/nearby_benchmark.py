@@ -0,0 +1,113 @@
+"""
+附近景点索引基准
+
+合成一个城市规模的景点数据文件，构建打包索引并以内存映射方式加载，
+统计半径查询和k近邻查询（含分类过滤）的延迟分位数。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.nearby_benchmark [--pois 300000] [--queries 2000] [--json results.json]
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import argparse
+import csv
+import json
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.nearby_index import NearbyIndexRegistry
+
+CATEGORIES = ["景点", "公园", "博物馆", "购物", "餐饮", "酒店", "寺庙", "古镇"]
+
+
+def write_city(path: Path, count: int, seed: int = 7) -> None:
+    """以北京为中心合成景点：一半集中在城区的热点簇附近，一半均匀分布在约60公里范围内"""
+    rng = random.Random(seed)
+    hotspots = [(39.9 + rng.uniform(-0.15, 0.15), 116.4 + rng.uniform(-0.2, 0.2)) for _ in range(50)]
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "address", "latitude", "longitude", "category"])
+        for i in range(count):
+            if i % 2:
+                lat, lng = rng.choice(hotspots)
+                lat, lng = rng.gauss(lat, 0.01), rng.gauss(lng, 0.012)
+            else:
+                lat, lng = 39.9 + rng.uniform(-0.3, 0.3), 116.4 + rng.uniform(-0.4, 0.4)
+            writer.writerow([f"景点{i}", f"北京市示例路{i}号", f"{lat:.6f}", f"{lng:.6f}", rng.choice(CATEGORIES)])
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+
+def measure(query: Callable[[float, float], Any], points: List[tuple]) -> Dict[str, Any]:
+    samples = []
+    for lat, lng in points:
+        started = time.perf_counter()
+        query(lat, lng)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def run(pois: int, queries: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "poi"
+        data_dir.mkdir()
+        write_city(data_dir / "北京.csv", pois)
+
+        started = time.perf_counter()
+        registry = NearbyIndexRegistry.load(str(data_dir), str(Path(tmp) / "index"))
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        registry = NearbyIndexRegistry.load(str(data_dir), str(Path(tmp) / "index"))
+        load_seconds = time.perf_counter() - started
+        index = registry.get("北京")
+
+        rng = random.Random(11)
+        points = [(39.9 + rng.uniform(-0.2, 0.2), 116.4 + rng.uniform(-0.25, 0.25)) for _ in range(queries)]
+
+        def page(result):
+            return index.describe(result[0][:20], result[1][:20])
+
+        results = {
+            "pois": pois,
+            "build_s": round(build_seconds, 2),
+            "load_ms": round(load_seconds * 1000, 2),
+            "radius_1km": measure(lambda lat, lng: page(index.query_radius(lat, lng, 1000)), points),
+            "radius_5km": measure(lambda lat, lng: page(index.query_radius(lat, lng, 5000)), points),
+            "radius_5km_category": measure(lambda lat, lng: page(index.query_radius(lat, lng, 5000, "博物馆")), points),
+            "knn_20": measure(lambda lat, lng: page(index.query_knn(lat, lng, 20, 50000)), points),
+            "knn_100_category": measure(lambda lat, lng: page(index.query_knn(lat, lng, 100, 50000, "古镇")), points)
+        }
+        registry.close()
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="附近景点索引基准")
+    parser.add_argument("--pois", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = run(args.pois, args.queries)
+    print(f"景点数: {results['pois']}  构建: {results['build_s']}s  加载: {results['load_ms']}ms")
+    for name, stats in results.items():
+        if isinstance(stats, dict):
+            print(f"{name:<22} p50 {stats['p50_ms']:>7.3f}ms  p99 {stats['p99_ms']:>7.3f}ms  max {stats['max_ms']:>7.3f}ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
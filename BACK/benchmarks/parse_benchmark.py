@@ -0,0 +1,114 @@
+"""
+大模型响应解析微基准：容错单遍解析器 vs 重构前的多阶段正则修复
+
+对 corpus/malformed 中的畸形响应样本以及合成的多日长计划（含完全合法的计划，检查快速路径没有退化），
+分别统计两种实现的解析结果（天数、坐标缺失的景点数）和平均耗时。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.parse_benchmark [--repeat 50] [--json results.json]
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import argparse
+import json
+import logging
+import time
+
+from app.services.llm_service import LLMService
+from benchmarks.legacy_parse import legacy_parse_llm_response
+
+CORPUS_DIR = Path(__file__).parent / "corpus" / "malformed"
+
+
+def synthetic_plan(days: int, broken_days: int) -> str:
+    """生成一个多日计划，前 broken_days 天的描述含未转义引号，旧实现只能落到正则兜底"""
+    daily_plans = []
+    for day in range(1, days + 1):
+        quote = "QUOTE" if day <= broken_days else ""
+        pois = [
+            {
+                "name": f"景点{day}-{i}",
+                "address": f"北京市东城区示例路{i}号",
+                "latitude": 39.9 + day * 0.001 + i * 0.0001,
+                "longitude": 116.39 + day * 0.001 + i * 0.0001,
+                "description": f"第{day}天的第{i}个景点，俗称{quote}老北京{quote}。",
+                "recommended_duration": "2小时"
+            }
+            for i in range(1, 5)
+        ]
+        daily_plans.append({"day": day, "description": f"第{day}天行程", "poi_list": pois})
+    text = json.dumps({"overview": f"{days}日游", "daily_plans": daily_plans}, ensure_ascii=False, indent=2)
+    return text.replace("QUOTE", '"')
+
+
+def load_samples() -> Dict[str, str]:
+    samples = {path.stem: path.read_text(encoding="utf-8") for path in sorted(CORPUS_DIR.glob("*.txt"))}
+    for days in (7, 30, 100):
+        samples[f"synthetic_{days}_days_valid"] = synthetic_plan(days, 0)
+        samples[f"synthetic_{days}_days_fenced"] = f"```json\n{synthetic_plan(days, 0)}\n```"
+        samples[f"synthetic_{days}_days_one_broken"] = synthetic_plan(days, 1)
+        samples[f"synthetic_{days}_days_all_broken"] = synthetic_plan(days, days)
+    return samples
+
+
+def measure(parse: Callable[[str], Dict[str, Any]], content: str, repeat: int) -> Dict[str, Any]:
+    try:
+        plan = parse(content)
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:80]}
+
+    daily_plans = plan.get("daily_plans", [])
+    pois = [poi for day in daily_plans for poi in day.get("poi_list", [])]
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse(content)
+    elapsed = (time.perf_counter() - started) / repeat
+
+    return {
+        "ok": True,
+        "days": len(daily_plans),
+        "pois": len(pois),
+        "pois_without_coordinates": sum(1 for poi in pois if not poi.get("latitude")),
+        "ms": round(elapsed * 1000, 3)
+    }
+
+
+def run(repeat: int) -> List[Dict[str, Any]]:
+    service = LLMService(client=object())  # 只使用解析方法，不需要真实客户端
+    results = []
+    for name, content in load_samples().items():
+        results.append({
+            "sample": name,
+            "bytes": len(content.encode("utf-8")),
+            "tolerant": measure(service._parse_llm_response, content, repeat),
+            "legacy": measure(legacy_parse_llm_response, content, repeat)
+        })
+    return results
+
+
+def _format(stats: Dict[str, Any]) -> str:
+    if not stats["ok"]:
+        return f"{'失败':<28}"
+    return f"{stats['days']:>3}天 {stats['pois']:>4}景点 缺坐标{stats['pois_without_coordinates']:>3} {stats['ms']:>8.3f}ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="解析器微基准")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)  # 旧实现会大量输出错误日志
+    results = run(args.repeat)
+
+    print(f"{'样本':<36} {'容错解析器':<34} {'旧实现'}")
+    for row in results:
+        print(f"{row['sample']:<36} {_format(row['tolerant']):<34} {_format(row['legacy'])}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+计划存储验证：保存后立即可查，ETag/304 重新验证，落盘后内容不变
+
+在应用中（旅游服务替换为连接本地桩服务的实例，计划存储使用临时SQLite文件）生成一份计划，
+检查查询接口在写入前后都返回与生成时相同的正文和ETag；带相同ETag（含W/弱形式、多个候选、
+"*"）的If-None-Match返回无正文的304，不同ETag返回200；未知计划返回404。关闭应用后用新的
+PlanStore 打开同一数据库，检查计划和ETag仍然一致；再检查批量保存时合并写入的批次数；
+最后模拟数据库持续写入失败，检查待写队列不超过上限、丢弃的是最早的计划并计入指标。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.plan_store_check [--plans 120]
+"""
+from typing import List
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+
+import httpx
+from openai import AsyncOpenAI
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.main import app
+from app.services.llm_service import LLMService
+from app.services.plan_store import PlanStore, compute_etag, etag_matches
+from app.services.travel_service import TravelService
+from benchmarks.concurrency_check import REQUEST_BODY, build_slow_stub
+
+ENDPOINT = "/api/travel/generate-plan"
+
+
+def check_etag() -> List[tuple]:
+    etag = compute_etag('{"plan_id": "x"}')
+    cases = {
+        etag: True,
+        f"W/{etag}": True,
+        f'"other", {etag}': True,
+        "*": True,
+        '"other"': False,
+        "": False,
+        None: False,
+    }
+    wrong = [header for header, expected in cases.items() if etag_matches(header, etag) != expected]
+    print(f"[ETag] {etag}，判断错误的If-None-Match {wrong}")
+    return [
+        (etag == compute_etag('{"plan_id": "x"}') and etag != compute_etag('{"plan_id": "y"}'),
+         "ETag应由正文确定"),
+        (not wrong, "If-None-Match应按弱比较匹配，支持多个候选和*"),
+    ]
+
+
+async def check_api(database_url: str) -> List[tuple]:
+    settings.DEBUG = True  # 跳过微信签名校验
+    settings.PLAN_STORE_ENABLED = True
+    settings.DATABASE_URL = database_url
+    llm_service = LLMService(client=AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(build_slow_stub(0.01)))
+    ))
+
+    async with app.router.lifespan_context(app):
+        app.state.travel_service = TravelService(llm_service)
+        plan_store = app.state.plan_store
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            generated = await client.post(ENDPOINT, json=REQUEST_BODY)
+            plan_id = generated.json()["plan_id"]
+            url = f"/api/travel/plans/{plan_id}"
+
+            pending = plan_store.stats()["pending"]
+            before_flush = await client.get(url)
+            await plan_store.flush()
+            after_flush = await client.get(url)
+            etag = after_flush.headers.get("etag")
+
+            revalidated = {
+                "相同": await client.get(url, headers={"If-None-Match": etag}),
+                "弱形式": await client.get(url, headers={"If-None-Match": f"W/{etag}"}),
+                "不同": await client.get(url, headers={"If-None-Match": '"stale"'}),
+            }
+            missing = await client.get("/api/travel/plans/unknown")
+
+    await llm_service.aclose()
+
+    print(f"[查询] 写入前 {before_flush.status_code}（待写{pending}个），写入后 {after_flush.status_code}，ETag {etag}")
+    print(f"[重新验证] {({name: response.status_code for name, response in revalidated.items()})}；"
+          f"未知计划 {missing.status_code}")
+
+    reopened = PlanStore(database_url)
+    stored = await reopened.get(plan_id)
+    await reopened.close()
+    print(f"[重新打开] {'找到计划' if stored else '没有找到计划'}")
+
+    return [
+        (generated.status_code == 200, "生成计划应成功"),
+        (pending == 1 and before_flush.status_code == 200 and before_flush.json() == generated.json(),
+         "写入数据库前应能从待写队列查到计划"),
+        (after_flush.status_code == 200 and after_flush.content == before_flush.content
+         and before_flush.headers.get("etag") == etag == compute_etag(after_flush.text),
+         "写入前后的正文和ETag应一致"),
+        (revalidated["相同"].status_code == 304 and revalidated["相同"].content == b""
+         and revalidated["相同"].headers.get("etag") == etag, "相同ETag应返回无正文的304"),
+        (revalidated["弱形式"].status_code == 304, "W/弱形式的ETag也应返回304"),
+        (revalidated["不同"].status_code == 200 and revalidated["不同"].content == after_flush.content,
+         "不同ETag应返回完整计划"),
+        (missing.status_code == 404, "未知计划应返回404"),
+        (stored is not None and stored == (etag, after_flush.text), "重新打开数据库后计划和ETag应不变"),
+    ]
+
+
+async def check_batching(database_url: str, plans: int) -> List[tuple]:
+    store = PlanStore(database_url, batch_size=50, flush_interval=0.05)
+    store.start()
+    for i in range(plans):
+        store.save(f"batch-{i}", f'{{"plan_id": "batch-{i}"}}')
+    await asyncio.sleep(0.5)
+    stats = store.stats()
+    await store.close()
+
+    reopened = PlanStore(database_url)
+    found = sum([await reopened.get(f"batch-{i}") is not None for i in range(plans)])
+    await reopened.close()
+    expected_batches = -(-plans // 50)
+    print(f"[批量] 保存{plans}个计划，{stats}，重新打开后找到{found}个")
+    return [
+        (stats["flushed"] == plans and stats["pending"] == 0 and found == plans, "后台任务应写入全部计划"),
+        (stats["batches"] <= expected_batches + 1, "连续保存的计划应合并为少量批次写入"),
+    ]
+
+
+async def check_overflow(database_url: str) -> List[tuple]:
+    store = PlanStore(database_url, max_pending=5)
+
+    def unavailable(rows):
+        raise RuntimeError("数据库不可用")
+
+    store._backend.put_many = unavailable
+    dropped_before = REGISTRY.get_sample_value("plan_store_dropped_total") or 0.0
+    for i in range(8):
+        store.save(f"overflow-{i}", f'{{"plan_id": "overflow-{i}"}}')
+    flushed = await store.flush()
+    kept = [i for i in range(8) if await store.get(f"overflow-{i}") is not None]
+    stats = store.stats()
+    metric = (REGISTRY.get_sample_value("plan_store_dropped_total") or 0.0) - dropped_before
+    store._pending.clear()
+    await store.close()
+    print(f"[写入失败] 保存8个计划（上限5个），{stats}，仍可查到第{kept}个，丢弃指标增加{metric:g}")
+    return [
+        (not flushed and stats["write_errors"] == 1, "数据库写入失败时应保留待写队列稍后重试"),
+        (stats["pending"] == 5 and kept == [3, 4, 5, 6, 7], "待写队列超过上限时应丢弃最早的计划"),
+        (stats["dropped"] == 3 and metric == 3, "丢弃的计划数应计入统计和指标"),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="计划存储验证")
+    parser.add_argument("--plans", type=int, default=120, help="批量保存的计划数")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = "sqlite:///" + os.path.join(directory, "plans.db")
+        checks = check_etag() + asyncio.run(check_api(database_url)) + asyncio.run(check_batching(database_url, args.plans))
+        checks += asyncio.run(check_overflow(database_url))
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
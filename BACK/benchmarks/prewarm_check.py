@@ -0,0 +1,257 @@
+"""
+热门计划预生成验证：日志统计、低优先级生成、内存映射加载、零大模型调用响应、定时刷新
+
+先按齐夫分布写出一份JSON格式的请求日志（含轮转文件和带景点的请求），用 app.prewarm 的
+build 统计热门请求并生成计划包（大模型替换为确定性的本地桩服务），然后在应用中验证：
+热门请求返回 X-Cache: PREWARMED 且不调用大模型，统计响应耗时；非热门请求和带景点的请求
+照常生成；再次运行时未过期的计划直接沿用，强制刷新后运行中的服务自动切换到新包；
+超过最长使用时间的计划不再使用。最后在反复替换计划包的同时不断检查切换，验证任何时刻
+都有可用的包，包目录被移走时保留已加载的包，以及旧的目录形式的包能升级为链接形式。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.prewarm_check [--requests 3000] [--distinct 80] [--top 20] [--samples 300]
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.models.schemas import ScenicSpot
+from app.prewarm import build, parse_args
+from app.services.llm_service import LLMService
+from app.services.plan_prewarm import PrewarmedPlans, load_pack_entries, mine_popular_requests, write_pack
+from app.services.travel_service import TravelService
+from benchmarks.fake_moonshot import FakeMoonshot, FakeMoonshotConfig
+from logging_config import JsonFormatter
+
+ENDPOINT = "/api/travel/generate-plan"
+HEADERS = {"signature": "bench", "timestamp": "0", "nonce": "bench"}
+CENTERS = ["天安门", "故宫", "颐和园", "天坛", "南锣鼓巷", "798艺术区", "鸟巢", "圆明园", "前门", "什刹海"]
+MODES = ["步行", "公共交通", "驾车"]
+
+
+def popular_requests(distinct: int) -> List[Tuple[str, str, int, str]]:
+    combos = [(center, days, mode) for center in CENTERS for days in range(1, 8) for mode in MODES]
+    random.Random(1).shuffle(combos)
+    return [("北京", center, days, mode) for center, days, mode in combos[:distinct]]
+
+
+def write_request_log(directory: Path, requests: int, distinct: int) -> List[Tuple[str, str, int, str]]:
+    """按齐夫分布写出旅游服务的请求日志，一半写入已轮转的文件；返回按热度排序的请求"""
+    ranked = popular_requests(distinct)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(distinct)]
+    rng = random.Random(2)
+    spot = ScenicSpot(name="景山公园", latitude=39.925, longitude=116.396, address="北京市西城区景山西街44号")
+
+    service_logger = logging.getLogger("app.services.travel_service")
+    service_logger.setLevel(logging.INFO)
+    service_logger.propagate = False
+    for name in ("app.log.1", "app.log"):
+        handler = logging.FileHandler(directory / name, encoding="utf-8")
+        handler.setFormatter(JsonFormatter())
+        service_logger.addHandler(handler)
+        for _ in range(requests // 2):
+            city, center_name, travel_days, travel_mode = rng.choices(ranked, weights)[0]
+            spots = [spot] if rng.random() < 0.1 else []
+            TravelService._log_request(city, center_name, spots, travel_days, travel_mode)
+        service_logger.removeHandler(handler)
+        handler.close()
+    service_logger.propagate = True
+    service_logger.setLevel(logging.NOTSET)
+    return ranked
+
+
+def request_body(request: Tuple[str, str, int, str], spots: List[Dict[str, Any]] = ()) -> Dict[str, Any]:
+    city, center_name, travel_days, travel_mode = request
+    return {
+        "city": city,
+        "centerName": center_name,
+        "travelData": {"scenicSpots": list(spots), "travelMode": travel_mode, "travelDays": str(travel_days)}
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def run(args: argparse.Namespace) -> bool:
+    directory = Path(tempfile.mkdtemp(prefix="prewarm_check."))
+    pack_dir = directory / "prewarm"
+    ranked = write_request_log(directory, args.requests, args.distinct)
+    mined = [request for request, _ in mine_popular_requests(
+        [str(directory / "app.log.1"), str(directory / "app.log")], args.top, 3
+    )]
+
+    upstream = FakeMoonshot(FakeMoonshotConfig(ttft=args.ttft))
+    plan_calls = lambda: upstream.stats()["calls"].get("plan", 0)
+    build_argv = ["build", "--logs", str(directory / "app.log*"), "--top", str(args.top),
+                  "--min-count", "3", "--pack-dir", str(pack_dir)]
+
+    # 首次构建
+    started = time.perf_counter()
+    first = await build(parse_args(build_argv), LLMService(client=upstream.client()))
+    build_seconds = time.perf_counter() - started
+    first_calls = plan_calls()
+
+    # 应用加载计划包，缩短检查间隔以验证自动切换
+    settings.PLAN_STORE_ENABLED = False
+    settings.PLAN_CACHE_ENABLED = False
+    settings.PREWARM_PACK_DIR = str(pack_dir)
+    settings.PREWARM_RELOAD_INTERVAL = 0.2
+    async with app.router.lifespan_context(app):
+        travel_service = app.state.travel_service
+        await travel_service.llm_service.aclose()
+        travel_service.llm_service = LLMService(client=upstream.client())
+        prewarmed = app.state.prewarmed_plans
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            async def post(body: Dict[str, Any]) -> Tuple[httpx.Response, float]:
+                request_started = time.perf_counter()
+                response = await client.post(ENDPOINT, json=body, headers=HEADERS)
+                return response, (time.perf_counter() - request_started) * 1000
+
+            head = [request_body(request) for request in mined]
+            for body in head:  # 预热
+                await post(body)
+            calls_before = plan_calls()
+            results = [await post(head[i % len(head)]) for i in range(args.samples)]
+            latencies = [elapsed for _, elapsed in results]
+            head_statuses = {response.headers.get("x-cache") for response, _ in results}
+            head_calls = plan_calls() - calls_before
+
+            tail, _ = await post(request_body(ranked[-1]))
+            with_spots, _ = await post(request_body(mined[0], [{
+                "name": "景山公园", "latitude": 39.925, "longitude": 116.396, "address": "北京市西城区景山西街44号"
+            }]))
+            served_overview = results[0][0].json()["overview"]
+
+            # 再次运行：计划都未过期，直接沿用
+            calls_before = plan_calls()
+            reuse = await build(parse_args(build_argv), LLMService(client=upstream.client()))
+            reuse_calls = plan_calls() - calls_before
+
+            # 强制刷新：全部重新生成，运行中的服务切换到新包
+            oldest_before = prewarmed.stats()["oldest_generated_at"]
+            reloads_before = prewarmed.reloads
+            refreshed = await build(parse_args(build_argv + ["--refresh-age", "0"]), LLMService(client=upstream.client()))
+            await asyncio.sleep(0.6)
+            oldest_after = prewarmed.stats()["oldest_generated_at"]
+            after_reload, _ = await post(head[0])
+
+            # 超过最长使用时间的计划不再使用
+            prewarmed.max_age = 0
+            stale, _ = await post(head[1])
+            stats = prewarmed.stats()
+
+    swap_checks = check_swap(directory, load_pack_entries(str(pack_dir)))
+
+    expected = len(mined)
+    first_body = next(entry["body"] for entry in load_pack_entries(str(pack_dir)) if entry["request"] == mined[0])
+    print(f"[日志] {args.requests}条请求，{args.distinct}种组合，约10%带景点；{directory}")
+    print(f"[构建] {first}，大模型调用{first_calls}次，耗时{build_seconds:.2f}s，"
+          f"计划包{sum(f.stat().st_size for f in pack_dir.iterdir()) / 1024:.1f}KB")
+    print(f"[命中] {args.samples}次热门请求 X-Cache={head_statuses}，大模型调用{head_calls}次，"
+          f"耗时 p50 {percentile(latencies, 0.5):.2f}ms / p99 {percentile(latencies, 0.99):.2f}ms")
+    print(f"[未命中] 非热门 {tail.headers.get('x-cache')}，带景点 {with_spots.headers.get('x-cache')}")
+    print(f"[刷新] 沿用 {reuse}（调用{reuse_calls}次）；强制刷新 {refreshed}；"
+          f"服务切换{prewarmed.reloads - reloads_before}次，之后 {after_reload.headers.get('x-cache')}")
+    print(f"[过期] {stale.headers.get('x-cache')}，统计 {stats}")
+
+    ok = True
+    checks = [
+        (first["generated"] == expected and first_calls == expected, "首次构建应为每个热门请求生成一次计划"),
+        (head_statuses == {"PREWARMED"} and head_calls == 0, "热门请求应命中预生成计划且不调用大模型"),
+        (percentile(latencies, 0.99) < 10, "预生成计划的响应耗时应低于10ms"),
+        (json.loads(first_body)["overview"] == served_overview, "返回的计划应与计划包一致"),
+        (ranked[-1] not in mined and tail.headers.get("x-cache") == "MISS" and with_spots.headers.get("x-cache") == "MISS",
+         "非热门请求和带景点的请求应照常生成"),
+        (reuse["reused"] == expected and reuse_calls == 0, "未过期的计划应直接沿用"),
+        (refreshed["generated"] == expected, "强制刷新应重新生成全部计划"),
+        (oldest_after > oldest_before and after_reload.headers.get("x-cache") == "PREWARMED", "服务应自动切换到新包"),
+        (stale.headers.get("x-cache") == "MISS" and stats["stale"] == 1, "过期的计划不应再使用"),
+    ] + swap_checks
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    return ok
+
+
+def check_swap(directory: Path, entries: List[Dict[str, Any]], rounds: int = 50) -> List[Tuple[bool, str]]:
+    """反复写出计划包的同时不断检查切换，统计读不到包的次数"""
+    target = directory / "swap" / "pack"
+    write_pack(target, entries)
+    prewarmed = PrewarmedPlans(str(target))
+    writing = True
+
+    def writer() -> None:
+        nonlocal writing
+        for _ in range(rounds):
+            write_pack(target, entries)
+        writing = False
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    checks = empty = 0
+    while writing:
+        prewarmed.reload_if_changed()
+        checks += 1
+        empty += len(prewarmed) == 0
+    thread.join()
+    prewarmed.reload_if_changed()
+    versions = [path.name for path in target.parent.iterdir() if path != target]
+
+    # 包目录被移走时继续使用已加载的包
+    moved = target.with_name("moved")
+    os.replace(target, moved)
+    prewarmed.reload_if_changed()
+    kept = len(prewarmed)
+    os.replace(moved, target)
+    prewarmed.close()
+
+    # 旧的目录形式的包升级为链接形式
+    legacy = directory / "legacy" / "pack"
+    shutil.copytree(target.resolve(), legacy)
+    write_pack(legacy, entries)
+    upgraded = legacy.is_symlink() and len(load_pack_entries(str(legacy))) == len(entries)
+
+    print(f"[替换] 写出{rounds}次，期间检查{checks}次，读不到包{empty}次，剩余版本目录{versions}；"
+          f"包目录移走后保留{kept}个计划；目录形式的包升级为链接 {upgraded}")
+    return [
+        (empty == 0 and len(versions) == 1, "替换计划包期间任何时刻都应有可用的包，旧版本目录应删除"),
+        (kept == len(entries), "包目录被移走时应保留已加载的包"),
+        (upgraded, "目录形式的旧包应升级为链接形式"),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="热门计划预生成验证")
+    parser.add_argument("--requests", type=int, default=3000, help="日志中的请求数")
+    parser.add_argument("--distinct", type=int, default=80, help="不同请求组合数")
+    parser.add_argument("--top", type=int, default=20, help="预生成的热门请求数")
+    parser.add_argument("--samples", type=int, default=300, help="测量响应耗时的请求数")
+    parser.add_argument("--ttft", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    ok = asyncio.run(run(args))
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
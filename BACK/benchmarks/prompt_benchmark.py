@@ -0,0 +1,137 @@
+"""
+提示词大小基准：令牌预算的提示词构建器 vs 重构前的长模板
+
+对不同天数和景点数的请求分别构建一次性生成、大纲和单日提示词，
+统计系统提示词加用户消息的字节数、本地估算的输入令牌数，以及新构建器选择的上下文档位。
+同时检查系统提示词在所有请求间逐字节一致（服务端上下文缓存的前提），以及名称、地址中
+含有竖线或换行的景点仍然各占一行、每行恰好三列。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.prompt_benchmark [--json results.json]
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import argparse
+import json
+
+from app.core.config import settings
+from app.services.llm_backends import LLMBackend
+from app.services.prompt_builder import (
+    Prompt, build_day_prompt, build_outline_prompt, build_repair_prompt, build_travel_prompt, count_tokens
+)
+from benchmarks.legacy_prompt import (
+    LEGACY_SYSTEM_PROMPT, legacy_day_prompt, legacy_outline_prompt, legacy_travel_prompt
+)
+
+# (旅行天数, 用户已选景点数)
+SCENARIOS: List[Tuple[int, int]] = [(1, 0), (3, 6), (5, 15), (7, 40), (14, 120), (30, 400)]
+
+
+def synthetic_spots(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": f"示例景点{i}",
+            "address": f"北京市东城区示例路{i}号",
+            "latitude": round(39.85 + (i % 37) * 0.0041, 6),
+            "longitude": round(116.30 + (i % 53) * 0.0037, 6)
+        }
+        for i in range(count)
+    ]
+
+
+def input_data(days: int, spots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "city": "北京",
+        "center_name": "天安门",
+        "travel_days": days,
+        "travel_mode": "公共交通",
+        "scenic_spots": spots,
+        "day_assignments": [spots[day::days] for day in range(days)] if spots else None
+    }
+
+
+def _sizes(system: str, user: str) -> Dict[str, int]:
+    return {
+        "bytes": len(system.encode("utf-8")) + len(user.encode("utf-8")),
+        "input_tokens": count_tokens(system) + count_tokens(user)
+    }
+
+
+def run() -> Tuple[List[Dict[str, Any]], bool]:
+    backend = LLMBackend("bench", client=None, model=settings.LLM_MODEL, governor=None,
+                         model_tiers=settings.LLM_MODEL_TIERS)
+    results = []
+    system_prompts = {}
+    for days, spot_count in SCENARIOS:
+        data = input_data(days, synthetic_spots(spot_count))
+        day_spots = data["day_assignments"] or [[] for _ in range(days)]
+        themes = [{"day": day, "theme": f"第{day}天的主题"} for day in range(1, days + 1)]
+
+        cases: List[Tuple[str, Prompt, str]] = [
+            ("plan", build_travel_prompt(data), legacy_travel_prompt(data)),
+            ("outline", build_outline_prompt(data, day_spots), legacy_outline_prompt(data, day_spots)),
+            ("day", build_day_prompt(data, 1, themes[0]["theme"], day_spots[0], themes[1:]),
+             legacy_day_prompt(data, 1, themes[0]["theme"], day_spots[0], themes[1:]))
+        ]
+        for kind, prompt, legacy in cases:
+            system_prompts.setdefault(kind, set()).add(prompt.system)
+            new = _sizes(prompt.system, prompt.user)
+            old = _sizes(LEGACY_SYSTEM_PROMPT, legacy)
+            results.append({
+                "days": days,
+                "spots": spot_count,
+                "kind": kind,
+                "legacy": old,
+                "builder": new,
+                "saved": round(1 - new["input_tokens"] / old["input_tokens"], 3),
+                "output_tokens": prompt.output_tokens,
+                "model": backend.select_model(prompt)
+            })
+
+    stable = all(len(prompts) == 1 for prompts in system_prompts.values())
+    return results, stable
+
+
+def rows_intact() -> bool:
+    """名称和地址中的竖线、换行不应打乱景点表的行和列"""
+    spots = [
+        {"name": "南锣鼓巷|北口", "address": "北京市东城区\n南锣鼓巷", "latitude": 39.9405, "longitude": 116.4033},
+        {"name": "798艺术区", "address": "朝阳区酒仙桥路4号|2号门", "latitude": 39.9841, "longitude": 116.4950},
+    ]
+    data = input_data(2, spots)
+    valid = [{"day": 2, "description": "胡同|老城", "poi_list": [{"name": "鼓楼|钟楼"}]}]
+    users = [build_travel_prompt(data).user, build_repair_prompt(data, valid, [1]).user]
+    rows = [line for user in users for line in user.splitlines() if line.endswith(("116.4033", "116.495"))]
+    summary = [line for line in users[1].splitlines() if line.startswith("第2天:")]
+    return (
+        len(rows) == 3 and all(len(row.split("|")) == 3 for row in rows)
+        and len(summary) == 1 and len(summary[0].split("|")) == 2
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="提示词大小基准")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    results, stable = run()
+
+    print(f"{'天数':>4} {'景点':>5} {'类型':<8} {'旧字节':>8} {'旧令牌':>7} {'新字节':>8} {'新令牌':>7} {'节省':>6} "
+          f"{'预计输出':>8}  模型")
+    for row in results:
+        print(f"{row['days']:>4} {row['spots']:>5} {row['kind']:<8} "
+              f"{row['legacy']['bytes']:>8} {row['legacy']['input_tokens']:>7} "
+              f"{row['builder']['bytes']:>8} {row['builder']['input_tokens']:>7} {row['saved']:>6.1%} "
+              f"{row['output_tokens']:>8}  {row['model']}")
+    print(f"系统提示词逐字节稳定: {'是' if stable else '否'}")
+    print(f"含竖线和换行的景点表完整: {'是' if rows_intact() else '否'}")
+
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps({"results": results, "stable_system_prefix": stable}, ensure_ascii=False, indent=2),
+            encoding="utf-8"
+        )
+
+
+if __name__ == "__main__":
+    main()
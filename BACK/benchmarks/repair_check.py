@@ -0,0 +1,208 @@
+"""
+部分损坏响应的单独重新生成检查
+
+本地桩服务返回一个5天的计划，其中第3天的景点缺少坐标、第5天因输出截断而缺失，
+重新生成请求只返回要求的那几天。桩服务按输出的天数模拟生成耗时，验证：
+  1. 非流式和流式生成都只额外发起一次重新生成调用，结果包含全部5天，第3、5天标记为repaired，
+     修复过的计划不写入缓存，也不供相近请求复用
+  2. 重新生成调用只输出损坏的天，耗时远小于整份计划重试（提示词中额外带有已有天的摘要）
+  3. 字段类型不符（如建议游览时长为数字）的天同样判为损坏，而不是在转换为DailyPlan时失败
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.repair_check
+"""
+import asyncio
+import json
+import logging
+import re
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+from openai import AsyncOpenAI
+
+from app.services.llm_service import LLMService, split_daily_plans
+from app.services.plan_cache import PlanCache
+from app.services.plan_reuse import PlanReuseIndex
+from app.services.poi_catalog import PoiCatalogRegistry
+from app.services.travel_service import TravelService
+
+TRAVEL_DAYS = 5
+# 模拟生成每天计划的耗时（秒）
+SECONDS_PER_DAY = 0.1
+
+
+def day_plan(day: int) -> Dict[str, Any]:
+    return {
+        "day": day,
+        "description": f"第{day}天行程",
+        "poi_list": [
+            {
+                "name": f"景点{day}-{i}",
+                "address": f"北京市东城区示例路{i}号",
+                "latitude": 39.90 + day * 0.01 + i * 0.001,
+                "longitude": 116.39 + day * 0.01 + i * 0.001,
+                "description": "示例景点",
+                "recommended_duration": "2小时"
+            }
+            for i in range(1, 4)
+        ]
+    }
+
+
+def broken_plan() -> str:
+    """第3天景点缺少坐标，第5天被截断"""
+    daily_plans = [day_plan(day) for day in range(1, 5)]
+    for poi in daily_plans[2]["poi_list"]:
+        del poi["latitude"], poi["longitude"]
+    text = json.dumps({"overview": "五日游", "daily_plans": daily_plans + [day_plan(5)]}, ensure_ascii=False)
+    return text[:text.rindex('{"day": 5')] + '{"day": 5, "description": "第5天'
+
+
+class RepairUpstream:
+    def __init__(self):
+        self.prompts: List[Dict[str, Any]] = []
+
+    def build(self) -> FastAPI:
+        stub = FastAPI()
+
+        @stub.post("/v1/chat/completions")
+        async def chat_completions(body: dict):
+            system, user = body["messages"][0]["content"], body["messages"][1]["content"]
+            match = re.search(r"需要重新生成:(.*)", user)
+            if match:
+                days = [int(day) for day in re.findall(r"第(\d+)天", match.group(1))]
+                content = json.dumps({"daily_plans": [day_plan(day) for day in days]}, ensure_ascii=False)
+            else:
+                days = list(range(1, TRAVEL_DAYS + 1))
+                content = broken_plan()
+
+            started = time.perf_counter()
+            await asyncio.sleep(SECONDS_PER_DAY * len(days))
+            self.prompts.append({
+                "kind": "repair" if match else "plan",
+                "bytes": len((system + user).encode("utf-8")),
+                "seconds": time.perf_counter() - started
+            })
+
+            if body.get("stream"):
+                return _sse(body["model"], content)
+            return {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 100, "total_tokens": 200}
+            }
+
+        return stub
+
+
+def _sse(model: str, content: str) -> Response:
+    chunks = [content[i:i + 40] for i in range(0, len(content), 40)]
+    lines = []
+    for chunk in chunks:
+        lines.append("data: " + json.dumps({
+            "id": "stub",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+        }, ensure_ascii=False) + "\n\n")
+    lines.append("data: [DONE]\n\n")
+    return Response("".join(lines), media_type="text/event-stream")
+
+
+def _service(upstream: RepairUpstream) -> TravelService:
+    client = AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(upstream.build())),
+        max_retries=0
+    )
+    poi_catalogs = PoiCatalogRegistry()
+    return TravelService(
+        LLMService(client=client),
+        plan_cache=PlanCache(),
+        poi_catalogs=poi_catalogs,
+        plan_reuse=PlanReuseIndex(poi_catalogs)
+    )
+
+
+def _not_stored(label: str, service: TravelService) -> bool:
+    cached, remembered = service.plan_cache.stats()["entries"], service.plan_reuse.stats()["entries"]
+    print(f"[{label}] 缓存{cached}个计划，复用索引{remembered}个计划")
+    return cached == 0 and remembered == 0
+
+
+def _report(label: str, upstream: RepairUpstream, daily_plans, elapsed: float) -> bool:
+    days = [plan.day for plan in daily_plans]
+    repaired = [plan.day for plan in daily_plans if plan.repaired]
+    full, repair = upstream.prompts[0], upstream.prompts[-1]
+    print(f"[{label}] 上游调用{len(upstream.prompts)}次，返回第{days}天，重新生成第{repaired}天，总耗时{elapsed:.2f}s；"
+          f"完整请求{full['bytes']}字节/{full['seconds']:.2f}s，重新生成请求{repair['bytes']}字节/{repair['seconds']:.2f}s")
+    return (
+        days == list(range(1, TRAVEL_DAYS + 1))
+        and repaired == [3, 5]
+        and len(upstream.prompts) == 2
+        and repair["seconds"] < full["seconds"] / 2
+    )
+
+
+async def check_generate() -> bool:
+    upstream = RepairUpstream()
+    service = _service(upstream)
+    started = time.perf_counter()
+    plan = await service.generate_plan("北京", "天安门", [], TRAVEL_DAYS, "步行", generation_mode="single")
+    elapsed = time.perf_counter() - started
+    await service.llm_service.aclose()
+    return _report("非流式", upstream, plan.daily_plans, elapsed) and _not_stored("非流式", service)
+
+
+async def check_stream() -> bool:
+    upstream = RepairUpstream()
+    service = _service(upstream)
+    started = time.perf_counter()
+    streamed = []
+    async for event, value in service.stream_plan("北京", "天安门", [], TRAVEL_DAYS, "步行"):
+        if event == "day":
+            streamed.append(value.day)
+        elif event == "complete":
+            plan = value
+    elapsed = time.perf_counter() - started
+    await service.llm_service.aclose()
+    print(f"[流式] 下发顺序{streamed}，提示{plan.warnings}")
+    return (_report("流式", upstream, plan.daily_plans, elapsed) and streamed == [1, 2, 4, 3, 5]
+            and _not_stored("流式", service))
+
+
+def check_validation() -> bool:
+    """建议游览时长为数字、开始时刻为对象的天应判为损坏"""
+    daily_plans = [day_plan(day) for day in range(1, 4)]
+    daily_plans[0]["poi_list"][0]["recommended_duration"] = 2
+    daily_plans[2]["poi_list"][1]["start_time"] = {"hour": 9}
+    valid, broken = split_daily_plans(daily_plans, 3)
+    converted = [TravelService._to_daily_plan(plan).day for plan in valid]
+    print(f"[校验] 有效第{converted}天，需重新生成第{broken}天")
+    return converted == [2] and broken == [1, 3]
+
+
+async def run() -> bool:
+    return all([check_validation(), await check_generate(), await check_stream()])
+
+
+def main() -> int:
+    logging.disable(logging.CRITICAL)
+    if asyncio.run(run()):
+        print("通过")
+        return 0
+    print("失败")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+基准结果的JSON输出和回归对比
+
+每个结果文件记录基准名称、运行时间、代码版本、运行参数和结果列表，
+--baseline 与之前的结果文件按行对比，指标变差超过容差时视为回归。
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+import json
+import platform
+import subprocess
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def write_results(path: str, benchmark: str, config: Dict[str, Any], report: Dict[str, Any]) -> None:
+    """把结果写入JSON文件，report中至少包含 results 列表"""
+    document = {
+        "benchmark": benchmark,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": config,
+        **report
+    }
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(json.dumps(document, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已写入 {target}")
+
+
+def compare_results(
+        baseline_path: str,
+        results: List[Dict[str, Any]],
+        key: str,
+        metrics: Dict[str, str],
+        tolerance: float = 0.1
+) -> List[str]:
+    """
+    与基线结果对比
+
+    Args:
+        baseline_path: 之前写出的结果文件
+        results: 本次结果列表
+        key: 用于对齐两次结果中各行的字段
+        metrics: 指标名到方向（"higher" 越大越好 / "lower" 越小越好）的映射
+        tolerance: 允许变差的比例
+
+    Returns:
+        回归描述列表，为空表示没有回归
+    """
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    previous = {row[key]: row for row in baseline["results"]}
+    regressions = []
+
+    for row in results:
+        before = previous.get(row[key])
+        if before is None:
+            continue
+        for metric, direction in metrics.items():
+            old, new = before.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if direction == "higher" else change
+            flag = "回归" if worse > tolerance else ""
+            print(f"{key}={row[key]} {metric}: {old} -> {new} ({change:+.1%}) {flag}")
+            if flag:
+                regressions.append(f"{key}={row[key]} {metric} {old} -> {new}")
+
+    print(f"与基线对比: {'发现' + str(len(regressions)) + '项回归' if regressions else '没有回归'}")
+    return regressions
@@ -0,0 +1,206 @@
+"""
+生成接口响应路径基准：单次校验 + 单次序列化 vs 重构前的逐层构建和 response_model 再校验
+
+以7天、每天4个景点（共28个）的天安门计划为输入，从解析后的大模型字典开始，
+经过日计划转换、响应构建、保存用序列化，到接口返回的响应正文为止。
+两条路径都挂在最小的FastAPI应用上直接以ASGI调用，分轮交替测量每个请求的CPU时间，
+并用 tracemalloc 统计每个请求的内存分配峰值。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.response_benchmark [--requests 3000] [--days 7] [--pois 4] [--rounds 6] [--json results.json]
+"""
+from typing import Any, Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import tracemalloc
+import uuid
+
+from fastapi import FastAPI, Response
+
+from app.api.endpoints.travel_plan import _cache_headers, _generate_plan_response
+from app.core.responses import FastJSONResponse
+from app.models.schemas import TravelData, TravelPlanRequest
+from app.services.travel_service import TravelPlan, TravelService
+from benchmarks.fake_moonshot import FakeMoonshot
+from benchmarks.legacy_response import legacy_app, legacy_plan_response
+from benchmarks.report import write_results
+
+
+def build_llm_result(days: int, pois_per_day: int) -> Dict[str, Any]:
+    """用天安门预设景点循环拼出指定规模的计划"""
+    upstream = FakeMoonshot()
+    pois = [poi for day in upstream.poi_data for poi in day]
+    return {
+        "overview": f"以天安门为中心的{days}日游，游览故宫、天坛、前门等历史文化景点。",
+        "daily_plans": [
+            {
+                "day": day,
+                "description": upstream.day_descriptions[(day - 1) % len(upstream.day_descriptions)],
+                "poi_list": [dict(pois[(day * pois_per_day + i) % len(pois)]) for i in range(pois_per_day)]
+            }
+            for day in range(1, days + 1)
+        ]
+    }
+
+
+class _Store:
+    """只记录正文的计划存储"""
+
+    def __init__(self):
+        self.bodies: List[str] = []
+
+    def save(self, plan_id: str, body: str) -> None:
+        self.bodies.append(body)
+        if len(self.bodies) > 100:
+            self.bodies.clear()
+
+
+class _StubTravelService:
+    """直接返回已解析计划的旅游服务，只保留日计划转换这一步"""
+
+    def __init__(self, llm_result: Dict[str, Any]):
+        self.llm_result = llm_result
+
+    async def generate_plan(self, **kwargs) -> TravelPlan:
+        return TravelPlan(
+            daily_plans=[TravelService._to_daily_plan(day_plan) for day_plan in self.llm_result["daily_plans"]],
+            overview=self.llm_result["overview"]
+        )
+
+
+def fast_app(llm_result: Dict[str, Any], travel_days: int, store: _Store) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    service = _StubTravelService(llm_result)
+    request = TravelPlanRequest(
+        city="北京",
+        centerName="天安门",
+        travelData=TravelData(scenicSpots=[], travelMode="步行", travelDays=str(travel_days))
+    )
+
+    @app.get("/plan")
+    async def plan():
+        _, body, travel_plan = await _generate_plan_response(request, travel_days, service, store)
+        return Response(content=body, media_type="application/json", headers=_cache_headers(travel_plan))
+
+    return app
+
+
+async def call(app: FastAPI) -> bytes:
+    """不经过网络直接以ASGI调用一次 GET /plan，返回响应正文"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/plan", "raw_path": b"/plan", "root_path": "", "query_string": b"", "headers": [],
+        "server": ("bench", 80), "client": ("bench", 1)
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def measure_cpu(app: FastAPI, requests: int) -> Tuple[float, float]:
+    """返回每个请求的CPU时间和耗时（微秒）"""
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app)
+    return (time.process_time() - started_cpu) / requests * 1e6, (time.perf_counter() - started) / requests * 1e6
+
+
+async def measure_alloc(app: FastAPI, requests: int) -> float:
+    """每个请求的内存分配峰值（KB，取中位数）；分配统计会显著拖慢执行，单独测量"""
+    tracemalloc.start()
+    peaks = []
+    for _ in range(requests):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await call(app)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return sorted(peaks)[len(peaks) // 2] / 1024
+
+
+async def measure(apps: Dict[str, FastAPI], requests: int, rounds: int) -> List[Dict[str, Any]]:
+    """两条路径分轮交替测量，各取最快的一轮，减少机器负载波动的影响"""
+    for app in apps.values():
+        for _ in range(50):  # 预热
+            await call(app)
+
+    timings: Dict[str, List[Tuple[float, float]]] = {name: [] for name in apps}
+    for _ in range(rounds):
+        for name, app in apps.items():
+            timings[name].append(await measure_cpu(app, max(requests // rounds, 1)))
+
+    results = []
+    for name, app in apps.items():
+        cpu_us, wall_us = min(timings[name])
+        results.append({
+            "path": name,
+            "requests": requests,
+            "cpu_us": round(cpu_us, 1),
+            "wall_us": round(wall_us, 1),
+            "peak_alloc_kb": round(await measure_alloc(app, min(requests, 200)), 1)
+        })
+    return results
+
+
+def same_plan(fast_body: bytes, legacy_body: bytes) -> bool:
+    fast, legacy = json.loads(fast_body), json.loads(legacy_body)
+    fast.pop("plan_id")
+    legacy.pop("plan_id")
+    return fast == legacy
+
+
+async def run(requests: int, days: int, pois_per_day: int, rounds: int) -> List[Dict[str, Any]]:
+    llm_result = build_llm_result(days, pois_per_day)
+    legacy_store: list = []
+
+    def legacy_handler():
+        if len(legacy_store) > 100:
+            legacy_store.clear()
+        return legacy_plan_response(str(uuid.uuid4()), llm_result, days, legacy_store)
+
+    apps = {"legacy": legacy_app(legacy_handler), "fast": fast_app(llm_result, days, _Store())}
+    if not same_plan(await call(apps["fast"]), await call(apps["legacy"])):
+        raise AssertionError("两条路径的响应内容不一致")
+
+    return await measure(apps, requests, rounds)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="生成接口响应路径基准")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--pois", type=int, default=4, help="每天的景点数")
+    parser.add_argument("--rounds", type=int, default=6, help="交替测量的轮数")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = asyncio.run(run(args.requests, args.days, args.pois, args.rounds))
+
+    print(f"{args.days}天 x {args.pois}个景点，{args.requests}个请求")
+    print(f"{'路径':<10} {'CPU/请求':>12} {'耗时/请求':>12} {'分配峰值':>12}")
+    for row in results:
+        print(f"{row['path']:<10} {row['cpu_us']:>10.1f}us {row['wall_us']:>10.1f}us {row['peak_alloc_kb']:>10.1f}KB")
+    legacy, fast = results
+    print(f"CPU {fast['cpu_us'] / legacy['cpu_us'] - 1:+.1%}，分配峰值 {fast['peak_alloc_kb'] / legacy['peak_alloc_kb'] - 1:+.1%}")
+
+    if args.json:
+        write_results(args.json, "response_benchmark", vars(args), {"results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
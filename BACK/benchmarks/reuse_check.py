@@ -0,0 +1,125 @@
+"""
+相近请求复用验证：别名规范化、按geohash分桶的半径匹配、景点兼容、时效和响应中的复用信息
+
+在应用中（大模型替换为确定性的本地桩服务）依次发起一组请求，检查每个请求的 X-Cache、
+复用距离和上游调用次数：相距约370米的"天安门"与"天安门广场"共用一个计划，别名"紫禁城"
+复用"故宫"的计划，天数、出行方式不同或景点不兼容时照常生成，超过时效或半径时不再复用。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.reuse_check
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import sys
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services.llm_service import LLMService
+from benchmarks.fake_moonshot import FakeMoonshot, FakeMoonshotConfig
+
+ENDPOINT = "/api/travel/generate-plan"
+HEADERS = {"signature": "bench", "timestamp": "0", "nonce": "bench"}
+SPOTS = {
+    "故宫博物院": {"name": "故宫博物院", "latitude": 39.9163, "longitude": 116.3972, "address": "北京市东城区景山前街4号"},
+    "什刹海": {"name": "什刹海", "latitude": 39.9402, "longitude": 116.3849, "address": "北京市西城区什刹海"},
+}
+
+# (说明, 中心位置, 天数, 出行方式, 所选景点, 期望的X-Cache)
+CASES: List[Tuple[str, str, int, str, List[str], str]] = [
+    ("首次请求", "天安门", 2, "步行", [], "MISS"),
+    ("约370米外的另一个名称", "天安门广场", 2, "步行", [], "REUSED"),
+    ("名称带空白和标点", " 天安门·广场 ", 2, "步行", [], "REUSED"),
+    ("天数不同", "天安门广场", 3, "步行", [], "MISS"),
+    ("出行方式不同", "天安门广场", 2, "驾车", [], "MISS"),
+    ("所选景点已包含在计划中", "天安门广场", 2, "步行", ["故宫博物院"], "REUSED"),
+    ("所选景点不在计划中", "天安门广场", 2, "步行", ["什刹海"], "MISS"),
+    ("约850米外超出半径", "故宫", 2, "步行", [], "MISS"),
+    ("别名解析到同一地点", "紫禁城", 2, "步行", [], "REUSED"),
+]
+
+
+def request_body(center_name: str, travel_days: int, travel_mode: str, spots: List[str]) -> Dict[str, Any]:
+    return {
+        "city": "北京",
+        "centerName": center_name,
+        "travelData": {
+            "scenicSpots": [SPOTS[name] for name in spots],
+            "travelMode": travel_mode,
+            "travelDays": str(travel_days)
+        }
+    }
+
+
+def stream_done_event(text: str) -> Optional[Dict[str, Any]]:
+    for block in text.split("\n\n"):
+        if block.startswith("event: done"):
+            return json.loads(block.split("data: ", 1)[1])
+    return None
+
+
+async def run() -> bool:
+    upstream = FakeMoonshot(FakeMoonshotConfig(ttft=0.01))
+    plan_calls = lambda: sum(upstream.stats()["calls"].values())
+    settings.PLAN_STORE_ENABLED = False
+    settings.PREWARM_ENABLED = False
+    settings.PLAN_REUSE_RADIUS_M = 500.0
+
+    ok = True
+    async with app.router.lifespan_context(app):
+        travel_service = app.state.travel_service
+        await travel_service.llm_service.aclose()
+        travel_service.llm_service = LLMService(client=upstream.client())
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            print(f"{'请求':<20} {'X-Cache':>9} {'距离':>6} {'上游调用':>8}")
+            for description, center_name, travel_days, travel_mode, spots, expected in CASES:
+                before = plan_calls()
+                response = await client.post(
+                    ENDPOINT, json=request_body(center_name, travel_days, travel_mode, spots), headers=HEADERS
+                )
+                status = response.headers.get("x-cache")
+                calls = plan_calls() - before
+                print(f"{description:<20} {status:>9} {response.headers.get('x-reuse-distance', '-'):>6} {calls:>8}")
+                if response.status_code != 200 or status != expected or (status == "REUSED") != (calls == 0):
+                    print(f"失败：{description} 应为 {expected}")
+                    ok = False
+                if status == "REUSED" and response.json()["center_name"] != center_name:
+                    print(f"失败：{description} 响应中的中心位置应为请求的名称")
+                    ok = False
+
+            # 流式接口在done事件中给出复用信息
+            response = await client.post(
+                f"{ENDPOINT}/stream", json=request_body("天安门城楼", 2, "步行", []), headers=HEADERS
+            )
+            done = stream_done_event(response.text)
+            print(f"[流式] done事件 cache={done and done.get('cache')} reused_from={done and done.get('reused_from')}")
+            if not done or done.get("cache") != "REUSED" or not done.get("reused_from"):
+                print("失败：流式接口应复用计划并在done事件中给出复用信息")
+                ok = False
+
+            # 超过时效不再复用
+            travel_service.plan_reuse.max_age = 0
+            response = await client.post(ENDPOINT, json=request_body("天安门东", 2, "步行", []), headers=HEADERS)
+            print(f"[时效] 超过时效后 {response.headers.get('x-cache')}")
+            if response.headers.get("x-cache") != "MISS":
+                print("失败：超过时效的计划不应复用")
+                ok = False
+
+            stats = (await client.get("/api/travel/cache/stats", headers=HEADERS)).json()["reuse"]
+            print(f"[统计] {stats}")
+    return ok
+
+
+def main() -> int:
+    logging.disable(logging.CRITICAL)
+    ok = asyncio.run(run())
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+路线优化验证：改进后的路线不劣于最近邻、接近最优，计划内容不变
+
+随机生成以中心位置为起终点的小规模路线，检查 2-opt/Or-opt 改进后的路线代价不高于最近邻
+初始路线，并与穷举得到的最优路线比较差距；再对一份含无坐标景点的计划调用 optimize_plan，
+检查景点不增不减、无坐标景点按原顺序排在最后、每段行程和当天总距离都已填写；最后测量
+每天的优化耗时。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.route_check [--instances 300] [--max-pois 7] [--repeat 300]
+"""
+from itertools import permutations
+from typing import List
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from app.models.schemas import DailyPlan, PointOfInterest
+from app.services.geo import distance_matrix
+from app.services.route_optimizer import (
+    _improve_tour, _nearest_neighbour_tour, _tour_cost, get_travel_mode_profile, optimize_plan
+)
+
+CENTER = (39.9087, 116.3975)
+MODES = ["步行", "公共交通", "驾车", "骑行"]
+
+
+def random_costs(rng: random.Random, pois: int, mode: str) -> List[List[float]]:
+    """中心位置（节点0）和pois个随机景点间的代价矩阵"""
+    lats = np.array([CENTER[0]] + [CENTER[0] + rng.uniform(-0.06, 0.06) for _ in range(pois)])
+    lngs = np.array([CENTER[1]] + [CENTER[1] + rng.uniform(-0.08, 0.08) for _ in range(pois)])
+    profile = get_travel_mode_profile(mode)
+    return [[profile.leg_cost(d / 1000) for d in row] for row in distance_matrix(lats, lngs).tolist()]
+
+
+def optimal_cost(costs: List[List[float]]) -> float:
+    return min(_tour_cost([0] + list(order), costs) for order in permutations(range(1, len(costs))))
+
+
+def poi(name: str, latitude: float, longitude: float) -> PointOfInterest:
+    return PointOfInterest(name=name, address=name, latitude=latitude, longitude=longitude, description=name)
+
+
+def run(args: argparse.Namespace) -> bool:
+    checks = []
+    rng = random.Random(11)
+
+    worse = 0
+    gaps, savings = [], []
+    for i in range(args.instances):
+        costs = random_costs(rng, rng.randint(3, args.max_pois), MODES[i % len(MODES)])
+        initial = _nearest_neighbour_tour(costs)
+        improved = _improve_tour(list(initial), costs)
+        initial_cost, improved_cost = _tour_cost(initial, costs), _tour_cost(improved, costs)
+        worse += improved_cost > initial_cost + 1e-9 or improved[0] != 0 or sorted(improved) != list(range(len(costs)))
+        savings.append(1 - improved_cost / initial_cost)
+        gaps.append(improved_cost / optimal_cost(costs) - 1)
+    print(f"[路线] {args.instances}条随机路线（3~{args.max_pois}个景点），劣于最近邻{worse}条；"
+          f"相对最近邻平均节省 {np.mean(savings):.1%}；与最优差距 平均 {np.mean(gaps):.2%} / 最大 {max(gaps):.2%}")
+    checks.append((worse == 0, "改进后的路线不应劣于最近邻，且仍从中心出发、包含全部景点"))
+    checks.append((np.mean(gaps) < 0.01 and max(gaps) < 0.1, "改进后的路线应接近最优"))
+
+    # 整份计划：无坐标景点排在最后，行程字段和总距离已填写
+    pois = [poi(f"景点{i}", CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05)) for i in range(6)]
+    unlocated = [poi("无坐标甲", 0, 0), poi("无坐标乙", 0, 0)]
+    plan = DailyPlan(day=1, description="", poi_list=[pois[0], unlocated[0], *pois[1:4], unlocated[1], *pois[4:]])
+    before = {item.name for item in plan.poi_list}
+    optimize_plan([plan], "步行", CENTER)
+    names = [item.name for item in plan.poi_list]
+    located = plan.poi_list[:len(pois)]
+    legs = sum(item.leg_distance_km for item in located)
+    print(f"[计划] 优化后顺序 {names}，每段 {[item.leg_distance_km for item in located]}，总距离 {plan.total_distance_km}km")
+    checks.append((set(names) == before and len(names) == len(before), "优化后景点不应增减"))
+    checks.append((names[-2:] == ["无坐标甲", "无坐标乙"], "无坐标的景点应按原顺序排在最后"))
+    checks.append((all(item.leg_travel_minutes is not None for item in located)
+                   and plan.total_distance_km > legs, "每段行程和当天总距离（含返回中心）应已填写"))
+
+    # 耗时
+    days = [
+        DailyPlan(day=day, description="", poi_list=[
+            poi(f"{day}-{i}", CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05)) for i in range(8)
+        ])
+        for day in range(1, 6)
+    ]
+    samples = np.empty(args.repeat)
+    for i in range(args.repeat):
+        started = time.perf_counter()
+        optimize_plan(days, "公共交通", CENTER)
+        samples[i] = (time.perf_counter() - started) / len(days) * 1e3
+    p50, p99 = float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+    print(f"[耗时] 每天8个景点，每天 p50 {p50:.2f}ms / p99 {p99:.2f}ms")
+    checks.append((p99 < 2, "每天8个景点的路线优化耗时应在2毫秒以内"))
+
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="路线优化验证")
+    parser.add_argument("--instances", type=int, default=300, help="随机路线数")
+    parser.add_argument("--max-pois", type=int, default=7, help="随机路线的最多景点数（穷举最优解）")
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    ok = run(args)
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
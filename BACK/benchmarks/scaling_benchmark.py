@@ -0,0 +1,163 @@
+"""
+多进程扩展性基准：CPU密集阶段在1..N个fork出的工作进程中的总吞吐
+
+与 gunicorn.conf.py 的部署方式一致：主进程先导入应用、加载只读数据并冻结垃圾回收，
+再fork出工作进程。每个工作进程在固定时长内循环执行一次请求中的CPU密集阶段
+（构建提示词、解析大模型响应（含畸形输出的修复）、转换日计划、序列化响应），
+统计总吞吐、相对单进程的加速比和并行效率，并从 /proc/self/smaps_rollup 读取
+每个工作进程与主进程共享和私有的内存。
+
+进程数超过CPU核数时不会再有加速，结果中会标注。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.scaling_benchmark [--workers 1,2,4] [--duration 3] [--days 7] [--json results.json]
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+
+from app.main import app, load_static_data
+from app.models.schemas import TravelPlanResponse
+from app.services.llm_service import LLMService
+from app.services.prompt_builder import build_travel_prompt
+from app.services.travel_service import TravelService
+from benchmarks.fake_moonshot import MALFORMATIONS, FakeMoonshot
+from benchmarks.report import write_results
+from benchmarks.stage_benchmark import _Choose
+
+
+def prepare(travel_days: int) -> Dict[str, Any]:
+    """在主进程中准备输入：请求数据和正常、各类畸形的大模型响应"""
+    upstream = FakeMoonshot()
+    input_data = {
+        "city": "北京",
+        "center_name": "天安门",
+        "travel_days": travel_days,
+        "travel_mode": "步行",
+        "scenic_spots": [poi for day in upstream.poi_data for poi in day],
+        "day_assignments": upstream.poi_data
+    }
+    content = upstream.respond(build_travel_prompt(input_data).user)["content"]
+    responses = [upstream.render("plan", content, random.Random(0))] * 4
+    responses += [upstream.render("plan", content, _Choose(malformation)) for malformation in MALFORMATIONS]
+    return {"input_data": input_data, "responses": responses}
+
+
+def handle_request(service: LLMService, fixtures: Dict[str, Any], index: int) -> str:
+    """一次请求中的CPU密集部分"""
+    input_data = fixtures["input_data"]
+    travel_days = input_data["travel_days"]
+    build_travel_prompt(input_data)
+    responses = fixtures["responses"]
+    llm_result = service._parse_travel_plan(responses[index % len(responses)], travel_days)
+    daily_plans = [TravelService._to_daily_plan(day_plan) for day_plan in llm_result["daily_plans"]]
+    return TravelPlanResponse.model_construct(
+        plan_id=str(uuid.uuid4()),
+        city=input_data["city"],
+        center_name=input_data["center_name"],
+        travel_days=travel_days,
+        travel_mode=input_data["travel_mode"],
+        daily_plans=daily_plans,
+        overview=llm_result["overview"]
+    ).model_dump_json()
+
+
+def memory_kb() -> Optional[Dict[str, int]]:
+    """当前进程的共享/私有内存（KB），非Linux时返回None"""
+    path = Path("/proc/self/smaps_rollup")
+    if not path.exists():
+        return None
+    fields = {}
+    for line in path.read_text().splitlines()[1:]:
+        name, _, value = line.partition(":")
+        parts = value.split()
+        if parts and parts[-1] == "kB":
+            fields[name] = int(parts[0])
+    return {
+        "shared_kb": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def worker(fixtures: Dict[str, Any], barrier, duration: float, results) -> None:
+    service = LLMService(client=object())  # 只使用解析逻辑，不发起调用
+    handle_request(service, fixtures, 0)  # 预热
+    barrier.wait()
+    started_cpu = time.process_time()
+    deadline = time.perf_counter() + duration
+    count = 0
+    while time.perf_counter() < deadline:
+        handle_request(service, fixtures, count)
+        count += 1
+    results.put({"requests": count, "cpu_seconds": time.process_time() - started_cpu, "memory": memory_kb()})
+
+
+def run_level(context, fixtures: Dict[str, Any], workers: int, duration: float) -> Dict[str, Any]:
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(fixtures, barrier, duration, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    memories = [report["memory"] for report in reports if report["memory"]]
+    return {
+        "workers": workers,
+        "requests": sum(report["requests"] for report in reports),
+        "rps": round(sum(report["requests"] for report in reports) / duration, 1),
+        "cpu_utilization": round(sum(report["cpu_seconds"] for report in reports) / duration, 2),
+        "shared_kb": round(sum(m["shared_kb"] for m in memories) / len(memories)) if memories else None,
+        "private_kb": round(sum(m["private_kb"] for m in memories) / len(memories)) if memories else None
+    }
+
+
+def main() -> int:
+    cores = os.cpu_count() or 1
+    default_levels = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= cores], cores})
+
+    parser = argparse.ArgumentParser(description="多进程扩展性基准")
+    parser.add_argument("--workers", type=lambda value: [int(v) for v in value.split(",")], default=default_levels)
+    parser.add_argument("--duration", type=float, default=3.0, help="每个进程数级别的测量时长（秒）")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    context = multiprocessing.get_context("fork")
+
+    # 与gunicorn预加载一致：fork前加载只读数据并冻结
+    load_static_data(app)
+    fixtures = prepare(args.days)
+    gc.freeze()
+
+    results = []
+    print(f"CPU核数 {cores}，{args.days}天计划，每级 {args.duration}s")
+    print(f"{'进程数':>6} {'吞吐':>12} {'加速比':>8} {'效率':>8} {'CPU利用':>8} {'共享内存':>10} {'私有内存':>10}")
+    for workers in args.workers:
+        level = run_level(context, fixtures, workers, args.duration)
+        base = results[0]["rps"] if results else level["rps"]
+        level["speedup"] = round(level["rps"] / base, 2)
+        level["efficiency"] = round(level["speedup"] / (workers / args.workers[0]), 2)
+        results.append(level)
+        note = "（超过CPU核数）" if workers > cores else ""
+        memory = f"{level['shared_kb']:>8}KB {level['private_kb']:>8}KB" if level["shared_kb"] is not None else ""
+        print(f"{workers:>6} {level['rps']:>8.1f}次/秒 {level['speedup']:>8.2f} {level['efficiency']:>8.0%} "
+              f"{level['cpu_utilization']:>8.2f} {memory} {note}")
+
+    if args.json:
+        write_results(args.json, "scaling_benchmark", {**vars(args), "cores": cores}, {"results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+日程安排验证：建议游览时长解析、时段内排程、超出时段的景点移到较空闲的天、单日耗时和响应中的日期
+
+先检查一组常见的时长写法，再用一份第1天明显排不下的计划验证景点被移到较空闲的天且每天
+都在游览时段内；以桩服务的预设计划测量每天的排程耗时；最后在应用中（大模型替换为确定性的
+本地桩服务）检查响应中的日期和时刻：指定出发日期时从该日期起连续编排，出发日期不同的相同
+请求命中缓存但日期各自不同，流式接口的每天也带有日期和时刻；游览时段很短时非流式响应和
+流式的完成事件都带有日程提示。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.schedule_check [--days 7] [--repeat 2000]
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+from app.main import app
+from app.models.schemas import DailyPlan, PointOfInterest
+from app.services.llm_service import LLMService
+from app.services.scheduler import parse_clock, parse_duration_minutes, schedule_plan
+from app.services.travel_service import TravelService
+from benchmarks.fake_moonshot import FakeMoonshot, FakeMoonshotConfig
+
+ENDPOINT = "/api/travel/generate-plan"
+HEADERS = {"signature": "bench", "timestamp": "0", "nonce": "bench"}
+CENTER = (39.9087, 116.3975)
+DURATIONS = {
+    "2小时": 120, "1.5小时": 90, "90分钟": 90, "1小时30分钟": 90, "一个半小时": 90, "两个小时": 120,
+    "半小时": 30, "半天": 240, "全天": 480, "1-2小时": 90, "2～3小时": 150, "约3小时": 180,
+    "3小时左右": 180, "四十五分钟": 45, "2h": 120, "45 min": 45, "2-3 hours": 150, "随意": None, "": None,
+}
+
+
+def poi(name: str, latitude: float, longitude: float, duration: str) -> PointOfInterest:
+    return PointOfInterest(
+        name=name, address=name, latitude=latitude, longitude=longitude, description=name,
+        recommended_duration=duration
+    )
+
+
+def overpacked_plan() -> List[DailyPlan]:
+    """第1天安排了约10小时的游览，第2天只有一个景点"""
+    return [
+        DailyPlan(day=1, description="", poi_list=[
+            poi("天安门广场", 39.9054, 116.3976, "1.5小时"),
+            poi("故宫博物院", 39.9163, 116.3972, "4小时"),
+            poi("景山公园", 39.9224, 116.397, "1小时"),
+            poi("北海公园", 39.9255, 116.3889, "1小时"),
+            poi("什刹海", 39.9402, 116.3849, "2小时"),
+        ]),
+        DailyPlan(day=2, description="", poi_list=[poi("天坛公园", 39.8822, 116.4066, "2.5小时")]),
+    ]
+
+
+def timeline_ok(plan: DailyPlan) -> bool:
+    """每个景点都有时刻、先后不重叠且都在游览时段内"""
+    clock = parse_clock(settings.SCHEDULE_DAY_START)
+    for item in plan.poi_list:
+        if item.start_time is None or item.end_time is None:
+            return False
+        start, end = parse_clock(item.start_time), parse_clock(item.end_time)
+        if start < clock or end < start:
+            return False
+        clock = end
+    return clock <= parse_clock(settings.SCHEDULE_DAY_END)
+
+
+def stream_days(text: str) -> List[Dict[str, Any]]:
+    return [json.loads(block.split("data: ", 1)[1]) for block in text.split("\n\n") if block.startswith("event: day")]
+
+
+async def check_api() -> List[tuple]:
+    upstream = FakeMoonshot(FakeMoonshotConfig(ttft=0.01))
+    settings.PLAN_STORE_ENABLED = False
+    settings.PREWARM_ENABLED = False
+    settings.PLAN_REUSE_ENABLED = False
+
+    def body(start_date: str = None) -> Dict[str, Any]:
+        travel_data = {"scenicSpots": [], "travelMode": "步行", "travelDays": "3"}
+        if start_date is not None:
+            travel_data["startDate"] = start_date
+        return {"city": "北京", "centerName": "天安门", "travelData": travel_data}
+
+    async with app.router.lifespan_context(app):
+        travel_service = app.state.travel_service
+        await travel_service.llm_service.aclose()
+        travel_service.llm_service = LLMService(client=upstream.client())
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+            first = await client.post(ENDPOINT, json=body("2026-10-01"), headers=HEADERS)
+            second = await client.post(ENDPOINT, json=body("2026-12-30"), headers=HEADERS)
+            default = await client.post(ENDPOINT, json=body(), headers=HEADERS)
+            streamed = await client.post(f"{ENDPOINT}/stream", json=body("2027-02-01"), headers=HEADERS)
+
+            # 游览时段只有一小时，每天都会超出
+            day_end, settings.SCHEDULE_DAY_END = settings.SCHEDULE_DAY_END, "10:00"
+            try:
+                short = await client.post(ENDPOINT, json={**body(), "centerName": "前门"}, headers=HEADERS)
+                short_stream = await client.post(
+                    f"{ENDPOINT}/stream", json={**body(), "centerName": "故宫"}, headers=HEADERS
+                )
+                # 再次请求命中缓存，提示应随计划一起缓存
+                short_hit = await client.post(ENDPOINT, json={**body(), "centerName": "前门"}, headers=HEADERS)
+                short_stream_hit = await client.post(
+                    f"{ENDPOINT}/stream", json={**body(), "centerName": "故宫"}, headers=HEADERS
+                )
+            finally:
+                settings.SCHEDULE_DAY_END = day_end
+
+    first_dates = [plan["date"] for plan in first.json()["daily_plans"]]
+    second_dates = [plan["date"] for plan in second.json()["daily_plans"]]
+    default_first = default.json()["daily_plans"][0]["date"]
+    stream_plans = stream_days(streamed.text)
+    first_pois = [item for plan in first.json()["daily_plans"] for item in plan["poi_list"]]
+    print(f"[接口] 出发日期2026-10-01 {first_dates} {first.headers.get('x-cache')}；"
+          f"2026-12-30 {second_dates} {second.headers.get('x-cache')}；未指定 {default_first}")
+    print(f"[接口] 第1天 {[(item['name'], item['start_time'], item['end_time']) for item in first_pois[:3]]}")
+    print(f"[流式] {[(plan['date'], plan['poi_list'][0]['start_time']) for plan in stream_plans]}")
+    short_warnings = short.json().get("warnings")
+    done = json.loads(short_stream.text.split("event: done\ndata: ", 1)[1].split("\n\n", 1)[0])
+    done_hit = json.loads(short_stream_hit.text.split("event: done\ndata: ", 1)[1].split("\n\n", 1)[0])
+    print(f"[提示] 非流式 {short.headers.get('x-cache')} {short_warnings}；流式 {done['warnings']}")
+    print(f"[提示] 命中缓存后 非流式 {short_hit.headers.get('x-cache')} {short_hit.json().get('warnings')}；"
+          f"流式 {done_hit['warnings']}")
+
+    today = date.today()
+    return [
+        (first_dates == ["2026-10-01", "2026-10-02", "2026-10-03"], "应从出发日期起逐天编排日期"),
+        (second_dates == ["2026-12-30", "2026-12-31", "2027-01-01"] and second.headers.get("x-cache") == "HIT",
+         "出发日期不同的相同请求应命中缓存且日期各自不同"),
+        (default_first in (str(today - timedelta(days=1)), str(today), str(today + timedelta(days=1))),
+         "未指定出发日期时第1天应为当天"),
+        (all(item["start_time"] and item["end_time"] for item in first_pois), "响应中每个景点都应有时刻"),
+        ([plan["date"] for plan in stream_plans] == ["2027-02-01", "2027-02-02", "2027-02-03"]
+         and all(plan["poi_list"][0]["start_time"] for plan in stream_plans), "流式接口的每天应带有日期和时刻"),
+        (any("超出游览时段" in note for note in short_warnings or []), "非流式响应应带有日程提示"),
+        (any("超出游览时段" in note for note in done["warnings"]), "流式完成事件应带有日程提示"),
+        (short_hit.headers.get("x-cache") == "HIT" and short_hit.json().get("warnings") == short_warnings
+         and done_hit["warnings"] == done["warnings"], "命中缓存的计划应带有生成时的日程提示"),
+    ]
+
+
+def run(args: argparse.Namespace) -> bool:
+    checks = []
+
+    # 时长解析
+    parsed = {text: parse_duration_minutes(text) for text in DURATIONS}
+    wrong = {text: minutes for text, minutes in parsed.items() if minutes != DURATIONS[text]}
+    print(f"[解析] {len(DURATIONS) - len(wrong)}/{len(DURATIONS)}个写法正确 {wrong or ''}")
+    checks.append((not wrong, "建议游览时长应正确解析"))
+
+    # 超出时段的景点移到较空闲的天
+    plans = overpacked_plan()
+    notes = schedule_plan(plans, "步行", CENTER, settings.SCHEDULE_DAY_START, settings.SCHEDULE_DAY_END)
+    for plan in plans:
+        print(f"[排程] 第{plan.day}天 {[(item.name, item.start_time, item.end_time) for item in plan.poi_list]}")
+    print(f"[排程] 提示 {notes}")
+    checks.append((all(timeline_ok(plan) for plan in plans), "每天都应在游览时段内且时刻不重叠"))
+    checks.append((len(plans[1].poi_list) > 1 and sum(len(plan.poi_list) for plan in plans) == 6,
+                   "超出时段的景点应移到较空闲的天且不丢失"))
+
+    # 单日排程耗时
+    upstream = FakeMoonshot()
+    daily_plans = [TravelService._to_daily_plan(upstream.day_plan(day)) for day in range(1, args.days + 1)]
+    schedule_plan(daily_plans, "步行", CENTER)
+    samples = np.empty(args.repeat)
+    for i in range(args.repeat):
+        started = time.perf_counter()
+        schedule_plan(daily_plans, "步行", CENTER)
+        samples[i] = (time.perf_counter() - started) / args.days * 1e6
+    p50, p99 = float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+    print(f"[耗时] {args.days}天计划，每天 p50 {p50:.1f}us / p99 {p99:.1f}us")
+    checks.append((p99 < 1000, "每天的排程耗时应远低于1ms"))
+
+    checks.extend(asyncio.run(check_api()))
+
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="日程安排验证")
+    parser.add_argument("--days", type=int, default=7, help="测量耗时的计划天数")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    ok = run(args)
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+景点坐标校验验证：按本地景点目录修正偏移的坐标和地址
+
+用数据目录中的北京景点目录逐项检查：名称完全匹配、坐标偏移约800米的景点修正到目录坐标并
+换上目录地址；偏移在容差内的不修改；名称相近（如"故宫"、"北京故宫博物院"）的同样修正；
+名称相同但相距很远（连锁店、同名地点）的不修改；没有坐标时只接受名称完全匹配；目录中
+没有的景点保持原样；城市名带"市"时也能找到目录。最后用合成的大目录测量整份计划的校验耗时。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.snap_check [--catalog 20000] [--pois 40] [--repeat 200]
+"""
+from typing import List
+import argparse
+import logging
+import sys
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.schemas import PointOfInterest
+from app.services.geo import haversine
+from app.services.poi_catalog import PoiCatalog, PoiCatalogRegistry
+
+CENTER = (39.9087, 116.3975)
+
+
+def poi(name: str, latitude: float, longitude: float, address: str = "模型给出的地址") -> PointOfInterest:
+    return PointOfInterest(name=name, address=address, latitude=latitude, longitude=longitude, description=name)
+
+
+def offset_m(item: PointOfInterest, latitude: float, longitude: float) -> float:
+    return float(haversine(item.latitude, item.longitude, latitude, longitude))
+
+
+def run(args: argparse.Namespace) -> bool:
+    checks = []
+    registry = PoiCatalogRegistry.load(settings.POI_DATA_DIR)
+    catalog = registry.get("北京市")
+    if catalog is None:
+        print(f"失败：没有找到北京的景点目录（{settings.POI_DATA_DIR}）")
+        return False
+
+    # 故宫博物院 39.9163,116.3972；天坛公园 39.8822,116.4066；什刹海 39.9402,116.3849
+    cases = {
+        "偏移": poi("故宫博物院", 39.9163 + 0.007, 116.3972),
+        "容差内": poi("天坛公园", 39.8822 + 0.00005, 116.4066, "天坛公园东门"),
+        "简称": poi("故宫", 39.9163 - 0.004, 116.3972 + 0.004),
+        "全称": poi("北京故宫博物院", 39.9163 + 0.003, 116.3972),
+        "同名远处": poi("什刹海", 39.9402 + 0.3, 116.3849),
+        "无坐标": poi("天坛公园", 0, 0),
+        "无坐标简称": poi("天坛", 0, 0),
+        "目录外": poi("某某咖啡馆", 39.9163 + 0.001, 116.3972),
+    }
+    before = {name: (item.latitude, item.longitude, item.address) for name, item in cases.items()}
+    corrected = catalog.snap(
+        list(cases.values()),
+        max_distance_m=settings.POI_SNAP_MAX_DISTANCE,
+        tolerance_m=settings.POI_SNAP_TOLERANCE
+    )
+    moved = {name for name, item in cases.items() if (item.latitude, item.longitude, item.address) != before[name]}
+    for name, item in cases.items():
+        print(f"[校验] {name} {item.name}: ({before[name][0]:.4f}, {before[name][1]:.4f}) -> "
+              f"({item.latitude:.4f}, {item.longitude:.4f}) {item.address}")
+    print(f"[校验] 修正{corrected}个：{sorted(moved)}；统计 {registry.stats()}")
+
+    checks.append((offset_m(cases["偏移"], 39.9163, 116.3972) < 1 and cases["偏移"].address == "北京市东城区景山前街4号",
+                   "偏移的景点应修正到目录坐标并换上目录地址"))
+    checks.append(("容差内" not in moved, "偏移在容差内的景点不应修改"))
+    checks.append((offset_m(cases["简称"], 39.9163, 116.3972) < 1 and offset_m(cases["全称"], 39.9163, 116.3972) < 1,
+                   "名称相近的景点应修正"))
+    checks.append(("同名远处" not in moved, "相距很远的同名地点不应修正"))
+    checks.append((offset_m(cases["无坐标"], 39.8822, 116.4066) < 1 and "无坐标简称" not in moved,
+                   "没有坐标时只接受名称完全匹配"))
+    checks.append(("目录外" not in moved, "目录中没有的景点应保持原样"))
+    checks.append((corrected == len(moved) == 4, "修正数量应与实际修改的景点数一致"))
+
+    # 合成大目录上的校验耗时
+    rng = np.random.default_rng(5)
+    lats = CENTER[0] + rng.uniform(-0.3, 0.3, args.catalog)
+    lngs = CENTER[1] + rng.uniform(-0.4, 0.4, args.catalog)
+    records = [
+        {"name": f"合成景点{i}号", "address": f"合成路{i}号", "latitude": lat, "longitude": lng}
+        for i, (lat, lng) in enumerate(zip(lats.tolist(), lngs.tolist()))
+    ]
+    large = PoiCatalog("合成", records)
+    picks = rng.choice(args.catalog, args.pois, replace=False)
+
+    def plan_pois() -> List[PointOfInterest]:
+        return [poi(f"合成景点{i}号", lats[i] + 0.005, lngs[i]) for i in picks.tolist()]
+
+    samples = np.empty(args.repeat)
+    for i in range(args.repeat):
+        pois = plan_pois()
+        started = time.perf_counter()
+        fixed = large.snap(pois)
+        samples[i] = (time.perf_counter() - started) * 1e3
+    p50, p99 = float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+    print(f"[耗时] {args.catalog}个景点的目录，每份计划{args.pois}个景点，修正{fixed}个，p50 {p50:.2f}ms / p99 {p99:.2f}ms")
+    checks.append((fixed == args.pois, "合成目录中偏移的景点应全部修正"))
+    checks.append((p99 < 50, "整份计划的校验耗时应远低于一次大模型调用"))
+
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="景点坐标校验验证")
+    parser.add_argument("--catalog", type=int, default=20000, help="合成目录的景点数")
+    parser.add_argument("--pois", type=int, default=40, help="每份计划的景点数")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    ok = run(args)
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
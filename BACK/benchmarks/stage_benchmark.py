@@ -0,0 +1,146 @@
+"""
+请求处理各阶段的微基准：提示词构建、响应解析、模型转换、日程安排、响应序列化和指标埋点开销
+
+输入来自确定性桩服务（benchmarks.fake_moonshot）的天安门预设计划，
+解析阶段分别测量正常输出和每种畸形输出。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.stage_benchmark [--repeat 2000] [--days 3] [--json results.json] [--baseline old.json]
+"""
+from typing import Any, Callable, Dict, List
+import argparse
+import logging
+import random
+import sys
+import time
+import uuid
+
+import numpy as np
+
+from app.core import metrics
+from app.models.schemas import TravelPlanResponse
+from app.services.llm_service import LLMService
+from app.services.prompt_builder import build_travel_prompt
+from app.services.scheduler import schedule_plan
+from app.services.travel_service import TravelService
+from benchmarks.fake_moonshot import MALFORMATIONS, FakeMoonshot
+from benchmarks.report import compare_results, write_results
+
+
+class _Choose(random.Random):
+    """固定选择某一种畸形输出"""
+
+    def __init__(self, malformation: str):
+        super().__init__(0)
+        self.malformation = malformation
+
+    def random(self) -> float:
+        return 0.0
+
+    def choice(self, seq):
+        return self.malformation
+
+
+def measure(name: str, fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    fn()  # 预热
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - started
+    samples *= 1e6
+    return {
+        "stage": name,
+        "repeat": repeat,
+        "mean_us": round(float(samples.mean()), 2),
+        "p50_us": round(float(np.percentile(samples, 50)), 2),
+        "p99_us": round(float(np.percentile(samples, 99)), 2)
+    }
+
+
+def run(repeat: int, travel_days: int) -> List[Dict[str, Any]]:
+    upstream = FakeMoonshot()
+    service = LLMService(client=upstream.client())
+    input_data = {
+        "city": "北京",
+        "center_name": "天安门",
+        "travel_days": travel_days,
+        "travel_mode": "步行",
+        "scenic_spots": [poi for day in upstream.poi_data for poi in day],
+        "day_assignments": upstream.poi_data
+    }
+
+    prompt = build_travel_prompt(input_data)
+    content = upstream.respond(prompt.user)["content"]
+    responses = {"clean": upstream.render("plan", content, random.Random(0))}
+    for malformation in MALFORMATIONS:
+        responses[malformation] = upstream.render("plan", content, _Choose(malformation))
+
+    llm_result = service._parse_travel_plan(responses["clean"], travel_days)
+
+    def convert() -> List[Any]:
+        return [TravelService._to_daily_plan(day_plan) for day_plan in llm_result["daily_plans"]]
+
+    daily_plans = convert()
+
+    def serialize() -> str:
+        return TravelPlanResponse(
+            plan_id=str(uuid.uuid4()),
+            city="北京",
+            center_name="天安门",
+            travel_days=travel_days,
+            travel_mode="步行",
+            daily_plans=daily_plans,
+            overview=llm_result["overview"]
+        ).model_dump_json()
+
+    def instrumentation() -> None:
+        # 一次生成请求经过的全部埋点：请求计时、七个处理阶段、解析策略和上游调用
+        metrics.HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        for name in ("auth", "prompt", "parse", "convert", "snap", "route", "schedule"):
+            with metrics.stage(name):
+                pass
+        metrics.PARSE_STRATEGY.labels("direct").inc()
+        metrics.UPSTREAM_IN_FLIGHT.labels("moonshot").inc()
+        metrics.UPSTREAM_IN_FLIGHT.labels("moonshot").dec()
+        metrics.UPSTREAM_SECONDS.labels("moonshot", "success").observe(time.perf_counter() - started)
+        metrics.HTTP_IN_FLIGHT.dec()
+        metrics.HTTP_REQUEST_SECONDS.labels("POST", "/api/travel/generate-plan", "200").observe(
+            time.perf_counter() - started
+        )
+
+    results = [measure("prompt", lambda: build_travel_prompt(input_data), repeat)]
+    for name, text in responses.items():
+        results.append(measure(f"parse_{name}", lambda text=text: service._parse_travel_plan(text, travel_days), repeat))
+    results.append(measure("convert", convert, repeat))
+    results.append(measure("schedule", lambda: schedule_plan(daily_plans, "步行", (39.9087, 116.3975)), repeat))
+    results.append(measure("serialize", serialize, repeat))
+    results.append(measure("metrics_overhead", instrumentation, repeat))
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="请求处理各阶段微基准")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", help="与之前的结果文件对比")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = run(args.repeat, args.days)
+
+    print(f"{'阶段':<30} {'平均':>10} {'p50':>10} {'p99':>10}")
+    for row in results:
+        print(f"{row['stage']:<30} {row['mean_us']:>8.1f}us {row['p50_us']:>8.1f}us {row['p99_us']:>8.1f}us")
+
+    if args.json:
+        write_results(args.json, "stage_benchmark", {"repeat": args.repeat, "days": args.days}, {"results": results})
+    if args.baseline:
+        return 1 if compare_results(args.baseline, results, key="stage", metrics={"p50_us": "lower"}, tolerance=0.2) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+流式生成验证：任意分片边界下的增量解析，以及接口按天下发
+
+先检查 PlanStreamExtractor：一份含有说明文字、代码块标记、字符串中的括号和引号转义、
+Unicode转义的计划，按1到64字符的每种固定分片大小以及随机切分输入，产出的概述和日计划都应与
+一次性解析的结果一致；每天的对象一闭合就产出，不等待整个JSON。再在本地端口上以uvicorn
+运行应用和按固定间隔逐段输出的桩服务（流式响应需要真实的HTTP服务才能逐段到达），请求流式
+接口，检查事件顺序为 overview、day…、done，且第一天在上游输出结束前就已下发。
+
+用法（在 BACK 目录下执行）:
+    python -m benchmarks.stream_check [--splits 200] [--port 8766] [--upstream-port 9166]
+"""
+from typing import Any, Dict, List, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.main import app
+from app.services.llm_service import LLMService
+from app.services.plan_stream import PlanStreamExtractor
+from app.services.travel_service import TravelService
+
+ENDPOINT = "/api/travel/generate-plan/stream"
+
+
+def tricky_plan() -> Dict[str, Any]:
+    """字符串中含有括号、逗号、冒号、引号和反斜杠，以及与键名相同的文字"""
+    return {
+        "overview": '三日游 {"daily_plans": [ ]}，含"引号"与反斜杠\\',
+        "daily_plans": [
+            {
+                "day": day,
+                "description": f"第{day}天：}}]，\"overview\": 不是概述",
+                "poi_list": [
+                    {
+                        "name": f"景点{day}-{i}「{{」",
+                        "address": "北京市\\东城区[1]",
+                        "latitude": 39.9 + day * 0.01,
+                        "longitude": 116.4 + i * 0.01,
+                        "description": "é中\n换行",
+                        "recommended_duration": "2小时"
+                    }
+                    for i in range(1, 3)
+                ]
+            }
+            for day in range(1, 4)
+        ]
+    }
+
+
+def model_output(plan: Dict[str, Any]) -> str:
+    """模拟大模型输出：说明文字 + 代码块，JSON中的非ASCII字符部分以\\u转义"""
+    text = json.dumps(plan, ensure_ascii=False).replace("é", "\\u00e9")
+    return f"好的，以下是计划：\n```json\n{text}\n```\n祝旅途愉快！"
+
+
+def extract(chunks: List[str]) -> List[Tuple[str, Any]]:
+    extractor = PlanStreamExtractor()
+    events = []
+    for chunk in chunks:
+        events.extend(extractor.feed(chunk))
+    return events
+
+
+def check_extractor(splits: int) -> List[tuple]:
+    plan = tricky_plan()
+    text = model_output(plan)
+    expected = [("overview", plan["overview"])] + [("day", day) for day in plan["daily_plans"]]
+
+    mismatched = [
+        size for size in range(1, 65)
+        if extract([text[i:i + size] for i in range(0, len(text), size)]) != expected
+    ]
+    rng = random.Random(3)
+    random_failures = 0
+    for _ in range(splits):
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 40)))
+        chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        random_failures += extract(chunks) != expected
+
+    # 第一天的对象闭合时立即产出
+    first_day_end = text.index('"poi_list"')
+    first_day_end = text.index("]}", first_day_end) + 2
+    extractor = PlanStreamExtractor()
+    early = extractor.feed(text[:first_day_end - 1])
+    on_close = extractor.feed(text[first_day_end - 1:first_day_end])
+
+    print(f"[解析] 固定分片1~64字符不一致{len(mismatched)}种 {mismatched or ''}；"
+          f"随机切分{splits}次不一致{random_failures}次")
+    print(f"[解析] 第一天闭合前 {[event for event, _ in early]}，闭合时 {[event for event, _ in on_close]}")
+    return [
+        (not mismatched and random_failures == 0, "任意分片边界下的解析结果应与一次性解析一致"),
+        ([event for event, _ in early] == ["overview"] and [event for event, _ in on_close] == ["day"],
+         "每天的对象一闭合就应产出"),
+    ]
+
+
+def build_streaming_stub(text: str, chunk_chars: int, interval: float) -> FastAPI:
+    """按固定间隔逐段输出text的 OpenAI 兼容流式桩服务"""
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(body: dict):
+        async def chunks():
+            for start in range(0, len(text), chunk_chars):
+                await asyncio.sleep(interval)
+                chunk = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": text[start:start + chunk_chars]}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return stub
+
+
+async def serve(application, port: int) -> Tuple[uvicorn.Server, asyncio.Task]:
+    server = uvicorn.Server(uvicorn.Config(application, host="127.0.0.1", port=port, log_level="error"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, serving
+
+
+async def check_api(args: argparse.Namespace) -> List[tuple]:
+    settings.DEBUG = True  # 跳过微信签名校验
+    upstream = build_streaming_stub(model_output(tricky_plan()), chunk_chars=16, interval=0.005)
+    body = {"city": "北京", "centerName": "天安门", "travelData": {"scenicSpots": [], "travelMode": "步行", "travelDays": "3"}}
+
+    upstream_server, upstream_serving = await serve(upstream, args.upstream_port)
+    server, serving = await serve(app, args.port)
+    # 只替换旅游服务（不带缓存），大模型连接本地桩服务
+    llm_service = LLMService(client=AsyncOpenAI(
+        api_key="stub", base_url=f"http://127.0.0.1:{args.upstream_port}/v1", max_retries=0
+    ))
+    app.state.travel_service = TravelService(llm_service)
+
+    arrivals: List[Tuple[str, float]] = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+        started = time.perf_counter()
+        async with client.stream("POST", ENDPOINT, json=body) as response:
+            content_type = response.headers.get("content-type", "")
+            buffer = ""
+            async for text in response.aiter_text():
+                buffer += text
+                while "\n\n" in buffer:
+                    block, buffer = buffer.split("\n\n", 1)
+                    if block.startswith("event: "):
+                        arrivals.append((block.split("\n", 1)[0][len("event: "):], time.perf_counter() - started))
+
+    await llm_service.aclose()
+    server.should_exit = True
+    await serving
+    upstream_server.should_exit = True
+    await upstream_serving
+
+    events = [event for event, _ in arrivals]
+    first_day = next((elapsed for event, elapsed in arrivals if event == "day"), None)
+    done = next((elapsed for event, elapsed in arrivals if event == "done"), None)
+    print(f"[接口] 事件 {events}，第一天 {first_day * 1000:.0f}ms，完成 {done * 1000:.0f}ms" if first_day and done
+          else f"[接口] 事件 {events}")
+    return [
+        (content_type.startswith("text/event-stream"), "流式接口应返回text/event-stream"),
+        (events == ["overview", "day", "day", "day", "done"], "事件顺序应为overview、逐天的day、done"),
+        (first_day is not None and done is not None and first_day < done * 0.7, "第一天应在上游输出结束前下发"),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="流式生成验证")
+    parser.add_argument("--splits", type=int, default=200, help="随机切分的次数")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--upstream-port", type=int, default=9166)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    checks = check_extractor(args.splits) + asyncio.run(check_api(args))
+    ok = True
+    for passed, message in checks:
+        if not passed:
+            print(f"失败：{message}")
+            ok = False
+    print("通过" if ok else "失败")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
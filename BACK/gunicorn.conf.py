@@ -0,0 +1,68 @@
+"""
+gunicorn 多进程部署配置
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+主进程先导入应用（提示词模板等随模块加载），再加载只读的景点目录和附近景点索引，
+然后fork出工作进程，这些数据以写时复制方式共享。大模型客户端、计划缓存、计划存储
+和任务队列在每个工作进程的lifespan中各自创建。
+
+关闭（SIGTERM）时每个工作进程停止接受新连接，等待进行中的请求完成，
+再由lifespan等待后台任务和进行中的大模型调用，总时长不超过 graceful_timeout。
+
+多个工作进程之间共享的状态：
+- 异步任务的状态和结果写入共用的任务表（JOB_STORE_PATH），查询可以落到任一工作进程
+- Prometheus指标写入 PROMETHEUS_MULTIPROC_DIR 下的文件，/metrics 汇总全部工作进程
+- 计划缓存的磁盘层（PLAN_CACHE_DB_PATH）未指定时使用 data/plan_cache.db
+相近请求复用索引、大模型后端状态等仍在各工作进程内，相应的统计接口返回 worker_pid 标明来源。
+"""
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# 必须在导入应用（及prometheus_client）之前设置，启动时清空上次运行留下的指标文件
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "travel-metrics"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+for _path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+    os.remove(_path)
+
+from uvicorn_worker import UvicornWorker
+
+from app.core.config import settings
+
+
+class Worker(UvicornWorker):
+    """等待进行中请求的时间与 SHUTDOWN_GRACE_PERIOD 一致的uvicorn工作进程"""
+
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "timeout_graceful_shutdown": settings.SHUTDOWN_GRACE_PERIOD}
+
+
+bind = "0.0.0.0:8000"
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+worker_class = Worker
+preload_app = True
+keepalive = 5
+# 请求排空和后台任务排空各自最多 SHUTDOWN_GRACE_PERIOD 秒，之后主进程强制结束工作进程
+graceful_timeout = int(settings.SHUTDOWN_GRACE_PERIOD * 2) + 5
+
+# 多个工作进程共用计划缓存的磁盘层，一个进程生成的计划其他进程也能命中
+if workers > 1 and not settings.PLAN_CACHE_DB_PATH:
+    settings.PLAN_CACHE_DB_PATH = "data/plan_cache.db"
+
+
+def on_starting(server):
+    """应用已在主进程导入，fork前加载只读数据"""
+    from app.main import preload
+
+    preload()
+    # 冻结现有对象，避免工作进程中的垃圾回收改写这些对象所在的内存页
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    """工作进程退出后，其进行中类指标（livesum等）不再计入汇总"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
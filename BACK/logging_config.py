@@ -1,16 +1,145 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-# 确保logs目录存在
-os.makedirs("logs", exist_ok=True)
+from app.core.config import settings
+from app.core.metrics import LOG_MESSAGES_TRUNCATED, LOG_RECORDS_DROPPED
+from app.core.request_context import get_request_id
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        RotatingFileHandler("logs/app.log", maxBytes=10485760, backupCount=5),
+
+class RequestIdFilter(logging.Filter):
+    """把当前请求ID写入日志记录，需在产生日志的线程中执行"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = get_request_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行JSON"""
+
+    STRUCTURED_FIELDS = ("plan_request",)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        # 通过 extra 传入的结构化字段，如旅游服务记录的 plan_request
+        for field in self.STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    把日志记录放入有界队列，由后台线程写出
+
+    队列满时直接丢弃并计数，不阻塞调用方；超长的消息（如完整的大模型响应）截断后再入队。
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_message_chars: int):
+        super().__init__(log_queue)
+        self.max_message_chars = max_message_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if self.max_message_chars and len(message) > self.max_message_chars:
+            LOG_MESSAGES_TRUNCATED.inc()
+            message = f"{message[:self.max_message_chars]}...(已截断，共{len(message)}字符)"
+
+        # 参数和异常对象可能不可跨线程安全使用，入队前转为字符串
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        record.message = message
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class BackgroundListener(QueueListener):
+    """在后台线程中把队列里的日志交给文件和控制台处理器"""
+
+    def enqueue_sentinel(self) -> None:
+        # 停止标记不能丢，队列满时等待后台线程腾出位置
+        self.queue.put(self._sentinel)
+
+
+def _formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+
+
+def setup_logging() -> None:
+    # 确保日志目录存在
+    directory = os.path.dirname(settings.LOG_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    formatter = _formatter()
+    handlers = [
+        RotatingFileHandler(settings.LOG_FILE, maxBytes=10485760, backupCount=5, encoding="utf-8"),
         logging.StreamHandler()
     ]
-)
\ No newline at end of file
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+
+    if not settings.LOG_ASYNC:
+        for handler in handlers:
+            handler.addFilter(RequestIdFilter())
+            root.addHandler(handler)
+        return
+
+    # 调用方只做格式化和入队，文件和控制台写入在后台线程中进行
+    queue_handler = BoundedQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE), settings.LOG_MAX_MESSAGE_CHARS)
+    queue_handler.addFilter(RequestIdFilter())
+    root.addHandler(queue_handler)
+
+    listeners = []
+
+    def start_listener() -> None:
+        listener = BackgroundListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        listeners[:] = [listener]
+
+    def restart_in_child() -> None:
+        # fork出的工作进程（如gunicorn预加载模式）中没有后台线程，
+        # 旧队列的锁可能处于被持有的状态，换用新队列重新启动
+        queue_handler.queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+        start_listener()
+
+    def stop_listener() -> None:
+        for listener in listeners:
+            listener.stop()
+
+    start_listener()
+    os.register_at_fork(after_in_child=restart_in_child)
+    atexit.register(stop_listener)
+
+setup_logging()